@@ -0,0 +1,258 @@
+# batch_runner.py
+
+import asyncio
+import json
+import os
+import re
+import tempfile
+import time
+
+from clients import get_client
+from get_llm_answer import anthropic_reply_text, anthropic_request, openai_request
+from resilience import call_with_retries_async
+from usage_tracker import current_job, record_usage, track_call
+
+# Providers with an offline batch API; other judges always run interactively
+BATCH_PROVIDERS = ("OpenAI", "Anthropic")
+MAX_REQUESTS_PER_BATCH = {"OpenAI": 50000, "Anthropic": 100000}
+# Serialized size per batch, kept under the providers' 200 MB (OpenAI file) and 256 MB (Anthropic request) limits
+MAX_BYTES_PER_BATCH = {"OpenAI": 190_000_000, "Anthropic": 250_000_000}
+BATCH_POLL_SECONDS = float(os.getenv("BATCH_POLL_SECONDS", "30"))
+BATCH_DIR = os.getenv("BATCH_DIR", os.path.join(tempfile.gettempdir(), "eval-sandbox-batches"))
+
+# Point these at a local stand-in server (e.g. tests/batch_stub_server.py) to exercise batch mode without the real APIs
+OPENAI_BATCH_BASE_URL = os.getenv("OPENAI_BATCH_BASE_URL")
+ANTHROPIC_BATCH_BASE_URL = os.getenv("ANTHROPIC_BATCH_BASE_URL")
+
+OPENAI_TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+def supports_batch(organization):
+    return organization in BATCH_PROVIDERS
+
+
+def _custom_id(position):
+    return f"row-{position}"
+
+
+def _position(custom_id):
+    return int(custom_id.split("-", 1)[1])
+
+
+def _chunks(items, sizes, max_items, max_bytes):
+    """Split items into consecutive chunks of at most `max_items` items and `max_bytes` total size"""
+    chunk = []
+    chunk_bytes = 0
+    for item, size in zip(items, sizes):
+        if chunk and (len(chunk) >= max_items or chunk_bytes + size > max_bytes):
+            yield chunk
+            chunk = []
+            chunk_bytes = 0
+        chunk.append(item)
+        chunk_bytes += size
+    if chunk:
+        yield chunk
+
+
+def _serialize(entry):
+    return json.dumps(entry, ensure_ascii=False) + "\n"
+
+
+def build_openai_batch_lines(api_model, prompts):
+    """OpenAI Batch API input lines for (position, prompt) pairs"""
+    return [
+        {
+            "custom_id": _custom_id(position),
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": openai_request(api_model, prompt),
+        }
+        for position, prompt in prompts
+    ]
+
+
+def build_anthropic_batch_requests(api_model, prompts):
+    """Anthropic Message Batches requests for (position, prompt) pairs"""
+    return [
+        {
+            "custom_id": _custom_id(position),
+            "params": anthropic_request(api_model, prompt),
+        }
+        for position, prompt in prompts
+    ]
+
+
+def write_batch_file(lines, prefix):
+    """Write serialized JSONL batch input to a new, uniquely named file under BATCH_DIR and return its path.
+
+    Names are unique so concurrent runs with the same judge never overwrite
+    each other's input; the caller removes the file once it is uploaded.
+    """
+    os.makedirs(BATCH_DIR, exist_ok=True)
+    with tempfile.NamedTemporaryFile(
+        "w", encoding="utf-8", dir=BATCH_DIR, prefix=re.sub(r"[^\w.-]", "_", prefix) + "-",
+        suffix=".jsonl", delete=False,
+    ) as f:
+        f.writelines(lines)
+    return f.name
+
+
+def _parse_openai_output_line(line):
+    """(custom id, reply, usage block) of an output or error file line; failed requests have no usage"""
+    entry = json.loads(line)
+    response = entry.get("response") or {}
+    if entry.get("error") or response.get("status_code") != 200:
+        error = entry.get("error") or response.get("body", {}).get("error")
+        return entry["custom_id"], f"Error with OpenAI batch request: {error}", None
+    body = response["body"]
+    return entry["custom_id"], body["choices"][0]["message"]["content"], body.get("usage")
+
+
+def _parse_anthropic_result(entry):
+    """(custom id, reply, usage block) of a batch result; failed requests have no usage"""
+    if entry.result.type == "succeeded":
+        message = entry.result.message
+        return entry.custom_id, anthropic_reply_text(message.content), message.usage
+    return entry.custom_id, f"Error with Anthropic batch request: {entry.result.type}", None
+
+
+async def run_openai_batch(api_model, prompts, on_status=None, batch_ids=(), on_submit=None):
+    """Submit prompts through the OpenAI Batch API and return {position: (reply, usage block)}.
+
+    Batches in `batch_ids` were submitted earlier and are only polled;
+    `on_submit(batch_id, positions)` is called as each new batch is created.
+    """
+    client = get_client("OpenAI", use_async=True, base_url=OPENAI_BATCH_BASE_URL)
+    batch_ids = list(batch_ids)
+    lines = [_serialize(line) for line in build_openai_batch_lines(api_model, prompts)]
+    sizes = [len(line.encode("utf-8")) for line in lines]
+    positions = [position for position, _ in prompts]
+    for chunk in _chunks(
+        list(zip(positions, lines)), sizes, MAX_REQUESTS_PER_BATCH["OpenAI"], MAX_BYTES_PER_BATCH["OpenAI"]
+    ):
+        path = write_batch_file([line for _, line in chunk], f"openai-{api_model}")
+        try:
+            with open(path, "rb") as f:
+                input_file = await client.files.create(file=f, purpose="batch")
+        finally:
+            os.remove(path)
+        batch = await call_with_retries_async("OpenAI", lambda: client.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+        ))
+        batch_ids.append(batch.id)
+        if on_submit:
+            on_submit(batch.id, [position for position, _ in chunk])
+
+    replies = {}
+    for batch_id in batch_ids:
+        while True:
+            batch = await call_with_retries_async("OpenAI", lambda: client.batches.retrieve(batch_id))
+            if on_status:
+                counts = batch.request_counts
+                done = (counts.completed + counts.failed) if counts else 0
+                total = counts.total if counts else "?"
+                on_status(f"OpenAI batch {batch_id}: {done}/{total} requests ({batch.status})")
+            if batch.status in OPENAI_TERMINAL_STATUSES:
+                break
+            await asyncio.sleep(BATCH_POLL_SECONDS)
+
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            content = await call_with_retries_async("OpenAI", lambda: client.files.content(file_id))
+            for line in content.text.splitlines():
+                if line.strip():
+                    custom_id, reply, usage = _parse_openai_output_line(line)
+                    replies[_position(custom_id)] = (reply, usage)
+    return replies
+
+
+async def run_anthropic_batch(api_model, prompts, on_status=None, batch_ids=(), on_submit=None):
+    """Submit prompts through the Anthropic Message Batches API and return {position: (reply, usage block)}.
+
+    `batch_ids` and `on_submit` work as in run_openai_batch.
+    """
+    client = get_client("Anthropic", use_async=True, base_url=ANTHROPIC_BATCH_BASE_URL)
+    batch_ids = list(batch_ids)
+    # Requests go inline in the create call, so no input file is written
+    all_requests = build_anthropic_batch_requests(api_model, prompts)
+    sizes = [len(_serialize(request).encode("utf-8")) for request in all_requests]
+    positions = [position for position, _ in prompts]
+    for chunk in _chunks(
+        list(zip(positions, all_requests)), sizes,
+        MAX_REQUESTS_PER_BATCH["Anthropic"], MAX_BYTES_PER_BATCH["Anthropic"],
+    ):
+        requests = [request for _, request in chunk]
+        batch = await call_with_retries_async("Anthropic", lambda: client.messages.batches.create(requests=requests))
+        batch_ids.append(batch.id)
+        if on_submit:
+            on_submit(batch.id, [position for position, _ in chunk])
+
+    replies = {}
+    for batch_id in batch_ids:
+        while True:
+            batch = await call_with_retries_async("Anthropic", lambda: client.messages.batches.retrieve(batch_id))
+            if on_status:
+                counts = batch.request_counts
+                done = counts.succeeded + counts.errored + counts.canceled + counts.expired
+                on_status(
+                    f"Anthropic batch {batch_id}: {done}/{done + counts.processing} requests "
+                    f"({batch.processing_status})"
+                )
+            if batch.processing_status == "ended":
+                break
+            await asyncio.sleep(BATCH_POLL_SECONDS)
+
+        async for entry in await client.messages.batches.results(batch_id):
+            custom_id, reply, usage = _parse_anthropic_result(entry)
+            replies[_position(custom_id)] = (reply, usage)
+    return replies
+
+
+async def run_batch_evaluation(model_info, prompts, on_status=None, submitted=(), on_submit=None, judge=None):
+    """Judge (position, prompt) pairs through the provider's batch API.
+
+    `submitted` lists `(batch_id, positions)` of batches an earlier,
+    interrupted run already submitted; they are polled again and their
+    positions are not resubmitted. `on_submit(batch_id, positions)` is
+    called as soon as each new batch exists, e.g. to journal it.
+
+    Each returned row is recorded as a judge call of `judge` for the run
+    being tracked, if any, priced at the batch rate.
+
+    Returns {position: raw reply}; requests the provider dropped come back as
+    error strings so they surface like any other failed judge call.
+    """
+    organization = model_info["organization"]
+    api_model = model_info["api_model"]
+    covered = {position for _, positions in submitted for position in positions}
+    new_prompts = [(position, prompt) for position, prompt in prompts if position not in covered]
+    batch_ids = [batch_id for batch_id, _ in submitted]
+    started_at = time.perf_counter()
+    if organization == "OpenAI":
+        results = await run_openai_batch(api_model, new_prompts, on_status, batch_ids, on_submit)
+    elif organization == "Anthropic":
+        results = await run_anthropic_batch(api_model, new_prompts, on_status, batch_ids, on_submit)
+    else:
+        raise ValueError(f"Batch mode is not supported for {organization} models")
+
+    # Earlier batches may also hold rows that have been journaled since
+    wanted = {position for position, _ in prompts}
+    replies = {}
+    for position, (reply, usage) in results.items():
+        if position not in wanted:
+            continue
+        replies[position] = reply
+        token = current_job.set((judge, position))
+        try:
+            with track_call(organization, api_model, batch=True, started_at=started_at) as call:
+                call.attempts = 1
+                call.error = usage is None
+                record_usage(usage)
+        finally:
+            current_job.reset(token)
+    for position, _ in prompts:
+        replies.setdefault(position, f"Error with {organization} batch: no result returned")
+    return replies
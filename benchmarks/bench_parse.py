@@ -0,0 +1,76 @@
+# benchmarks/bench_parse.py
+#
+# Runs the judge-reply parser over a corpus of messy replies (fenced JSON,
+# chatty preambles, braces inside strings, nested objects, almost-JSON and
+# unparseable text) and compares it with the previous json.loads + greedy
+# regex parser, for correctness and speed.
+#
+#   python benchmarks/bench_parse.py [--corpus PATH] [--repeat N]
+
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import get_llm_answer  # noqa: E402
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "messy_replies.jsonl")
+
+
+def parse_previous(response):
+    """The parser this replaced, without its per-call debug prints"""
+    try:
+        try:
+            data = json.loads(response)
+            return str(data.get("result", "N/A")), data.get("feedback", "N/A")
+        except json.JSONDecodeError:
+            json_match = re.search(r"{.*}", response)
+            if json_match:
+                data = json.loads(json_match.group(0))
+                return str(data.get("result", "N/A")), data.get("feedback", "N/A")
+            return "Error", f"Failed to parse response: {response}"
+    except Exception:
+        return "Error", f"Failed to parse response: {response}"
+
+
+def parse_current(response):
+    return get_llm_answer.parse_model_response(response)
+
+
+def load_corpus(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    # Failures are expected in the corpus; keep the output to the summary
+    get_llm_answer.logger.setLevel(logging.ERROR)
+
+    for fn in (parse_previous, parse_current):
+        correct = 0
+        for entry in corpus:
+            score, _ = fn(entry["reply"])
+            correct += score == (entry["result"] if entry["result"] is not None else "Error")
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for entry in corpus:
+                fn(entry["reply"])
+        elapsed = time.perf_counter() - start
+        per_reply = elapsed / (args.repeat * len(corpus)) * 1e6
+        print(f"{fn.__name__:15s} {correct}/{len(corpus)} correct  {per_reply:7.1f} µs per reply")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# benchmarks/bench_render.py
+#
+# Compares building a run's prompts the old way (iterrows plus a fresh
+# jinja2.Template per run and render(**context) per row) with the shared
+# prompt_templates module (column-wise contexts, cached compiled template,
+# render_many), and checks both produce identical prompts.
+#
+#   python benchmarks/bench_render.py [--rows N] [--runs N]
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import pandas as pd
+from jinja2 import Template
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from criteria_handler import EVALUATION_TEMPLATE  # noqa: E402
+from prompt_templates import build_contexts, get_template, render_dataframe  # noqa: E402
+
+MAPPINGS = {
+    "model_input": "question",
+    "model_output": "answer",
+    "model_context": "context",
+    "expected_model_output": "None",
+    "evaluation_criteria": "Rate the answer from 1 to 5 for helpfulness.",
+}
+
+
+def make_dataframe(rows):
+    return pd.DataFrame({
+        "question": [f"Question {i}: how would you approach problem {i % 97}?" for i in range(rows)],
+        "answer": [f"Answer {i} " + "with some explanation " * (i % 7 + 1) for i in range(rows)],
+        "context": [f"Context for row {i}" if i % 3 else "" for i in range(rows)],
+        "label": [i % 5 + 1 for i in range(rows)],
+    })
+
+
+def render_baseline(df):
+    criteria = MAPPINGS["evaluation_criteria"]
+    template = Template(EVALUATION_TEMPLATE)
+    prompts = []
+    for _, row in df.iterrows():
+        context = {}
+        for key, column in MAPPINGS.items():
+            if key == "evaluation_criteria":
+                continue
+            elif column and column != "None":
+                context[key] = str(row[column])
+        context["evaluation_criteria"] = criteria
+        prompts.append(template.render(**context))
+    return prompts
+
+
+def render_shared(df):
+    contexts = build_contexts(df, MAPPINGS, {"evaluation_criteria": MAPPINGS["evaluation_criteria"]})
+    return get_template(EVALUATION_TEMPLATE).render_many(contexts)
+
+
+def render_projected(df):
+    return render_dataframe(
+        EVALUATION_TEMPLATE, df, MAPPINGS, {"evaluation_criteria": MAPPINGS["evaluation_criteria"]}
+    )
+
+
+def measure(fn, df, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn(df)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    df = make_dataframe(args.rows)
+    expected = render_baseline(df)
+    for fn in (render_shared, render_projected):
+        if fn(df) != expected:
+            print(f"{fn.__name__} renders different prompts than the baseline")
+            sys.exit(1)
+
+    start = time.perf_counter()
+    Template(EVALUATION_TEMPLATE)
+    compile_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    get_template(EVALUATION_TEMPLATE)
+    cached_ms = (time.perf_counter() - start) * 1000
+    print(f"compile per run: jinja2.Template {compile_ms:.3f} ms, cached get_template {cached_ms:.3f} ms")
+
+    baseline = None
+    for fn in (render_baseline, render_shared, render_projected):
+        median = statistics.median(measure(fn, df, args.runs))
+        baseline = baseline or median
+        print(f"{fn.__name__:18s} {args.rows} rows  median {median * 1000:9.1f} ms  "
+              f"{args.rows / median:10.0f} prompts/s  {baseline / median:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
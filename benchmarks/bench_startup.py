@@ -0,0 +1,68 @@
+# benchmarks/bench_startup.py
+#
+# Measures how long a fresh interpreter takes to import the app's modules and
+# checks that no provider SDK is imported until a judge is actually called.
+#
+#   python benchmarks/bench_startup.py [--runs N]
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = ["get_llm_answer", "random_sample.gen_api_answer", "model_handler", "app"]
+PROVIDER_SDKS = ["openai", "anthropic", "together", "atla"]
+
+PROBE = """
+import sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+loaded = [name for name in {sdks!r} if name in sys.modules]
+print(elapsed, ",".join(loaded))
+"""
+
+
+def time_import(module, runs):
+    timings = []
+    loaded = ""
+    for _ in range(runs):
+        # Provider keys are cleared so a missing key can't break the import either
+        env = {k: v for k, v in os.environ.items() if not k.endswith("_API_KEY")}
+        result = subprocess.run(
+            [sys.executable, "-c", PROBE.format(module=module, sdks=PROVIDER_SDKS)],
+            cwd=REPO_ROOT, env=env, capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip().splitlines()[-1])
+        output = result.stdout.strip().splitlines()[-1]
+        elapsed, loaded = output.split(" ", 1) if " " in output else (output, "")
+        timings.append(float(elapsed))
+    return timings, loaded.strip()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    failed = False
+    for module in MODULES:
+        try:
+            timings, loaded = time_import(module, args.runs)
+        except RuntimeError as e:
+            print(f"{module:32s} import failed: {e}")
+            failed = True
+            continue
+        print(f"{module:32s} median {statistics.median(timings) * 1000:8.1f} ms  "
+              f"min {min(timings) * 1000:8.1f} ms  SDKs loaded: {loaded or 'none'}")
+        failed = failed or bool(loaded)
+    if failed:
+        print("Startup check failed: modules must import without provider keys and load SDKs only on first use")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
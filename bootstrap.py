@@ -0,0 +1,154 @@
+# bootstrap.py
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from metrics import METRICS, contingency_tables, continuous_metrics, is_categorical, pair_cells, table_metrics
+
+DEFAULT_BOOTSTRAP_SAMPLES = int(os.getenv("BOOTSTRAP_SAMPLES", "1000"))
+CONFIDENCE_LEVEL = 0.95
+# Resampled row indices held in memory at once (8 bytes each)
+BLOCK_CELLS = int(os.getenv("BOOTSTRAP_BLOCK_CELLS", "4000000"))
+# Worker processes used once samples × values per replicate exceeds PROCESS_POOL_MIN_CELLS; 0 or 1 keeps it in process
+BOOTSTRAP_PROCESSES = int(os.getenv("BOOTSTRAP_PROCESSES", str(min(4, os.cpu_count() or 1))))
+PROCESS_POOL_MIN_CELLS = int(os.getenv("BOOTSTRAP_PROCESS_POOL_MIN_CELLS", "50000000"))
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        # spawn rather than fork: the app process runs server and worker threads
+        _executor = ProcessPoolExecutor(BOOTSTRAP_PROCESSES, mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+
+def _comparison(x, y, x_factorized, y_factorized):
+    """What a replicate needs to score y against x: table cells if categorical, else the raw scores"""
+    if is_categorical(x_factorized, y_factorized):
+        return ("table", pair_cells(x_factorized, y_factorized), x_factorized[1], y_factorized[1])
+    return ("raw", x, y)
+
+
+def _joint_cells(comparisons):
+    """Distinct combinations of every categorical comparison's cell, and each row's combination code"""
+    cells = [comparison[1] for comparison in comparisons if comparison[0] == "table"]
+    if not cells:
+        return None, None
+    combinations, codes = np.unique(np.column_stack(cells), axis=0, return_inverse=True)
+    return combinations, codes.ravel()
+
+
+def replicate_metrics(comparisons, rows, replicates, seed):
+    """Metric arrays of length `replicates` for every comparison.
+
+    All comparisons share the same resamples, so the replicates are paired
+    across judges. Categorical comparisons only need how often each distinct
+    combination of cells is drawn: when there are no continuous scores those
+    counts come straight from a multinomial draw, which is the same
+    distribution as resampling rows; otherwise each block draws a
+    (replicates × rows) index matrix and counts from it.
+    """
+    rng = np.random.default_rng(seed)
+    combinations, codes = _joint_cells(comparisons)
+    raw = any(comparison[0] == "raw" for comparison in comparisons)
+    if combinations is not None:
+        frequencies = np.bincount(codes, minlength=len(combinations)) / rows
+    per_block = max(1, BLOCK_CELLS // max(rows, 1))
+    results = [{key: [] for key in METRICS.values()} for _ in comparisons]
+    done = 0
+    while done < replicates:
+        block = min(per_block, replicates - done)
+        index = rng.integers(0, rows, size=(block, rows)) if raw else None
+        if combinations is not None:
+            if raw:
+                counts = contingency_tables(codes[index], len(combinations), block)
+            else:
+                counts = rng.multinomial(rows, frequencies, size=block)
+        table_number = 0
+        for result, comparison in zip(results, comparisons):
+            if comparison[0] == "table":
+                _, _, x_values, y_values = comparison
+                cells = np.broadcast_to(combinations[:, table_number], counts.shape)
+                table_number += 1
+                tables = contingency_tables(cells, len(x_values) * len(y_values), block, weights=counts)
+                metrics = table_metrics(tables.reshape(block, len(x_values), len(y_values)), x_values, y_values, rows)
+            else:
+                # Continuous scores have no table form, so these are resampled one replicate at a time
+                _, x, y = comparison
+                replicate = [continuous_metrics(x[row_index], y[row_index]) for row_index in index]
+                metrics = {key: np.array([entry[key] for entry in replicate]) for key in METRICS.values()}
+            for key, values in metrics.items():
+                result[key].append(values)
+        done += block
+    return [{key: np.concatenate(values) for key, values in result.items()} for result in results]
+
+
+def _replicate_cells(comparisons, rows):
+    """Values touched per replicate: every row with continuous scores, else one per distinct cell combination"""
+    if any(comparison[0] == "raw" for comparison in comparisons):
+        return rows
+    combinations, _ = _joint_cells(comparisons)
+    return len(combinations)
+
+
+def _run_replicates(comparisons, rows, samples, seed):
+    workers = BOOTSTRAP_PROCESSES if samples * _replicate_cells(comparisons, rows) >= PROCESS_POOL_MIN_CELLS else 1
+    if workers <= 1:
+        return replicate_metrics(comparisons, rows, samples, seed)
+
+    # Independent streams per worker, each drawing its share of the replicates
+    seeds = np.random.SeedSequence(seed).spawn(workers)
+    shares = [samples // workers + (worker < samples % workers) for worker in range(workers)]
+    futures = [
+        _get_executor().submit(replicate_metrics, comparisons, rows, share, worker_seed)
+        for share, worker_seed in zip(shares, seeds) if share
+    ]
+    parts = [future.result() for future in futures]
+    return [
+        {key: np.concatenate([part[index][key] for part in parts]) for key in METRICS.values()}
+        for index in range(len(comparisons))
+    ]
+
+
+def _interval(values, confidence):
+    values = values[~np.isnan(values)]
+    if len(values) == 0:
+        return (np.nan, np.nan)
+    tail = (1 - confidence) / 2 * 100
+    low, high = np.percentile(values, [tail, 100 - tail])
+    return (float(low), float(high))
+
+
+def bootstrap_metrics(prepared, score_columns, samples=DEFAULT_BOOTSTRAP_SAMPLES, confidence=CONFIDENCE_LEVEL, seed=0):
+    """Percentile bootstrap intervals for every judge's metrics against the true label.
+
+    `prepared` is metrics.prepare_columns' output for [truth, *score_columns].
+    Also returns paired intervals for the difference between each pair of
+    judges, computed from the same resamples:
+    `{"judges": {column: {metric: (low, high)}}, "differences": [(column_a, column_b, {metric: (low, high)})]}`.
+    """
+    values, factorized = prepared
+    rows = len(values)
+    comparisons = [
+        _comparison(values[:, 0], values[:, index], factorized[0], factorized[index])
+        for index in range(1, len(score_columns) + 1)
+    ]
+    replicates = _run_replicates(comparisons, rows, samples, seed) if rows else [
+        {key: np.array([]) for key in METRICS.values()} for _ in comparisons
+    ]
+
+    report = {"judges": {}, "differences": []}
+    for column, replicate in zip(score_columns, replicates):
+        report["judges"][column] = {key: _interval(replicate[key], confidence) for key in METRICS.values()}
+    for index_a, column_a in enumerate(score_columns):
+        for index_b in range(index_a + 1, len(score_columns)):
+            report["differences"].append((column_a, score_columns[index_b], {
+                key: _interval(replicates[index_a][key] - replicates[index_b][key], confidence)
+                for key in METRICS.values()
+            }))
+    return report
@@ -0,0 +1,129 @@
+# clients.py
+
+import importlib.util
+import json
+import os
+import threading
+
+from dotenv import load_dotenv
+
+from usage_tracker import record_first_byte_async, record_first_byte_sync
+
+load_dotenv()
+
+# Used for providers without an entry in http_pools.jsonl. max_connections should
+# be at least the provider's max_concurrency in rate_limits.jsonl so the pool never
+# becomes the bottleneck.
+DEFAULT_POOL_SETTINGS = {
+    "max_connections": 64,
+    "max_keepalive_connections": 32,
+    "keepalive_expiry": 60,
+    "connect_timeout": 10,
+    "read_timeout": 120,
+    "http2": False,
+}
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+def load_http_pools():
+    """Load per-provider connection pool settings from http_pools.jsonl next to models.jsonl"""
+    pools = {}
+    try:
+        script_dir = os.path.dirname(__file__)
+        file_path = os.getenv("HTTP_POOLS_FILE", os.path.join(script_dir, "http_pools.jsonl"))
+        with open(file_path, "r") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    pools[entry.pop("organization")] = entry
+    except FileNotFoundError:
+        print("Warning: http_pools.jsonl not found, using default connection pool settings")
+    return pools
+
+
+HTTP_POOLS = load_http_pools()
+_clients = {}
+_http_clients = {}
+_lock = threading.Lock()
+
+
+def get_pool_settings(provider):
+    settings = {**DEFAULT_POOL_SETTINGS, **HTTP_POOLS.get(provider, {})}
+    if settings["http2"] and not HTTP2_AVAILABLE:
+        # HTTP/2 needs the optional h2 package; fall back to HTTP/1.1 keep-alive
+        settings["http2"] = False
+    return settings
+
+
+# Provider name -> (SDK module, client class name)
+SDKS = {
+    "OpenAI": ("openai", "OpenAI"),
+    "Anthropic": ("anthropic", "Anthropic"),
+    "Together": ("together", "Together"),
+    "Atla": ("atla", "Atla"),
+}
+
+
+def _import_sdk(provider):
+    # SDKs are imported here, the first time a model from that provider is used,
+    # so importing the app doesn't pay for (or fail on) providers it never calls
+    if provider not in SDKS:
+        raise ValueError(f"Unknown provider: {provider}")
+    return importlib.import_module(SDKS[provider][0])
+
+
+def _timeout(sdk, settings):
+    return sdk.Timeout(settings["read_timeout"], connect=settings["connect_timeout"])
+
+
+def _http_client(provider, use_async):
+    """One keep-alive connection pool per provider, shared by all of its SDK clients.
+
+    Built from the SDK's own httpx types, since SDK versions differ in which
+    httpx package they accept.
+    """
+    key = (provider, use_async)
+    if key not in _http_clients:
+        sdk = _import_sdk(provider)
+        settings = get_pool_settings(provider)
+        limits = type(sdk.DEFAULT_CONNECTION_LIMITS)(
+            max_connections=settings["max_connections"],
+            max_keepalive_connections=settings["max_keepalive_connections"],
+            keepalive_expiry=settings["keepalive_expiry"],
+        )
+        client_class = sdk.DefaultAsyncHttpxClient if use_async else sdk.DefaultHttpxClient
+        # Response hooks run as soon as the headers arrive, which times each call's first byte
+        hook = record_first_byte_async if use_async else record_first_byte_sync
+        _http_clients[key] = client_class(
+            limits=limits, timeout=_timeout(sdk, settings), http2=settings["http2"], event_hooks={"response": [hook]}
+        )
+    return _http_clients[key]
+
+
+def get_client(provider, use_async=False, base_url=None):
+    """Return the process-wide SDK client for a provider, creating it on first use.
+
+    Retries are handled by resilience.call_with_retries, so the SDKs' own retry
+    loops are disabled to avoid retrying twice. Clients for the same provider
+    (e.g. the batch API client with its own base_url) share one connection pool.
+    """
+    key = (provider, use_async, base_url)
+    client = _clients.get(key)
+    if client is None:
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                sdk = _import_sdk(provider)
+                kwargs = {
+                    "max_retries": 0,
+                    "timeout": _timeout(sdk, get_pool_settings(provider)),
+                    "http_client": _http_client(provider, use_async),
+                }
+                if base_url:
+                    kwargs["base_url"] = base_url
+                class_name = SDKS[provider][1]
+                client_class = getattr(sdk, "Async" + class_name if use_async else class_name)
+                client = client_class(**kwargs)
+                _clients[key] = client
+    return client
+
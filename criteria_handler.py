@@ -3,6 +3,7 @@
 import gradio as gr
 import re
 from eval_criteria_library import EXAMPLE_METRICS
+from data_loader import load_columns
 
 SYSTEM_PROMPT = """Please act as an impartial judge and evaluate based on the user's instruction. Your output format should strictly adhere to JSON as follows: {"feedback": "<write feedback>", "result": <numerical score>}. Ensure the output is valid JSON, without additional formatting or explanations."""
 
@@ -85,6 +86,12 @@ def select_evaluation_criteria(data_upload_group, df_state, prompt_state):
                     interactive=True, 
                     visible=False
                 )
+                label_mapping = gr.Dropdown(
+                    choices=[],
+                    label="Map true label column (Optional, used in the analysis)",
+                    interactive=True,
+                    visible=False
+                )
         # We'll place the "Back to Data" and "Select Evaluators" within the same row:
         with gr.Row(visible=False) as nav_row:
             back_to_data_button = gr.Button("← Back to Data", visible=False)
@@ -92,12 +99,17 @@ def select_evaluation_criteria(data_upload_group, df_state, prompt_state):
 
         def update_column_choices(df_state):
             df = df_state.value
-            columns = df.columns.tolist() if df is not None else []
+            if df is None:
+                columns = []
+            else:
+                # Columnar uploads only hold the mapped columns once saved, so offer all of the file's
+                columns = list(df.attrs.get("source_columns", df.columns.tolist()))
             return {
                 input_mapping: gr.update(choices=columns, visible=True),
                 output_mapping: gr.update(choices=columns, visible=True),
                 context_mapping: gr.update(choices=['None'] + columns, visible=True),
-                expected_output_mapping: gr.update(choices=['None'] + columns, visible=True)
+                expected_output_mapping: gr.update(choices=['None'] + columns, visible=True),
+                label_mapping: gr.update(choices=['None'] + columns, visible=True)
             }
 
         def update_prompt(selected_criteria, df_state):
@@ -126,7 +138,7 @@ def select_evaluation_criteria(data_upload_group, df_state, prompt_state):
             updates.update(update_column_choices(df_state))
             return updates
 
-        def save_prompt(evaluation_criteria, input_col, output_col, context_col, expected_output_col):
+        def save_prompt(evaluation_criteria, input_col, output_col, context_col, expected_output_col, label_col):
             # Use the actual Jinja template with proper Jinja syntax and raw JSON
             template = EVALUATION_TEMPLATE
             
@@ -148,6 +160,18 @@ def select_evaluation_criteria(data_upload_group, df_state, prompt_state):
                 'mappings': mapping_dict
             }
 
+            df = df_state.value
+            if df is not None and "source_path" in df.attrs:
+                # Re-read the columnar file with only the mapped columns, so unused
+                # (possibly large) columns never reach memory
+                columns = [column for column in (input_col, output_col, context_col, expected_output_col, label_col)
+                           if column and column != 'None']
+                projected = load_columns(df.attrs["source_path"], columns)
+                projected.attrs.update(df.attrs)
+                df = df_state.value = projected
+            if df is not None:
+                df.attrs["label_column"] = label_col if label_col and label_col != 'None' else None
+
         # Update event handlers
         select_eval_criteria_button.click(
             fn=show_criteria_selection,
@@ -164,14 +188,14 @@ def select_evaluation_criteria(data_upload_group, df_state, prompt_state):
                 back_to_data_button,
                 save_prompt_button
             ,
-                input_mapping, output_mapping, context_mapping, expected_output_mapping
+                input_mapping, output_mapping, context_mapping, expected_output_mapping, label_mapping
             ]
         )
 
         criteria_dropdown.change(
             fn=update_prompt,
             inputs=[criteria_dropdown, df_state],
-            outputs=[prompt_editor, input_mapping, output_mapping, context_mapping, expected_output_mapping]
+            outputs=[prompt_editor, input_mapping, output_mapping, context_mapping, expected_output_mapping, label_mapping]
         )
 
         def make_select_button_visible(df_value):
@@ -190,7 +214,7 @@ def select_evaluation_criteria(data_upload_group, df_state, prompt_state):
             fn=save_prompt,
             inputs=[
                 prompt_editor, input_mapping, output_mapping,
-                context_mapping, expected_output_mapping
+                context_mapping, expected_output_mapping, label_mapping
             ],
             outputs=[]
         )
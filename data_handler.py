@@ -3,19 +3,21 @@
 import gradio as gr
 import pandas as pd
 import json
+
+from data_loader import UPLOAD_FILE_TYPES, is_columnar, load_dataframe, preview_columnar
+from paginated_table import PaginatedTable
+from tracing import set_span_attributes, traced
+
+
 def upload_test_data(df_state):
     with gr.Group() as data_upload_group:
         file_upload = gr.File(
-            label="Upload JSON with test data incl. true labels as integers or floats",
-            file_types=[".json"],
+            label="Upload JSON, JSON Lines, Parquet, Arrow or CSV (optionally .gz/.zst compressed) with test data incl. true labels as integers or floats",
+            file_types=UPLOAD_FILE_TYPES,
         )
         import_button = gr.Button("Import Data", visible=False)
-        # Show exactly 5 rows, no scrolling
-        df_display = gr.Dataframe(
-            visible=False,
-            elem_classes=["truncate_cells"],
-            label="Uploaded Data"
-        )
+        # Only one page of truncated cells is sent to the browser at a time
+        data_table = PaginatedTable("Uploaded Data")
         error_display = gr.Textbox(visible=False)
 
     def display_file_info(file):
@@ -27,40 +29,39 @@ def upload_test_data(df_state):
         else:
             return {
                 import_button: gr.update(visible=False),
-                df_display: gr.update(visible=False),
+                **data_table.hide(),
                 error_display: gr.update(visible=False)  # Hide previous errors
             }
 
-    def import_data(file):
+    @traced()
+    def import_data(file, table_view):
         if file is not None:
             try:
-                loaded_json = json.load(open(file.name))
-
-                # Handle various common JSON structures
-                if isinstance(loaded_json, list):
-                    # Top-level list
-                    df = pd.json_normalize(loaded_json, sep=".")
-                elif isinstance(loaded_json, dict):
-                    # Dictionary could contain a "data" key or not
-                    if "data" in loaded_json and isinstance(loaded_json["data"], list):
-                        df = pd.json_normalize(loaded_json["data"], sep=".")
-                    else:
-                        # Flatten the top-level dictionary
-                        df = pd.json_normalize(loaded_json, sep=".")
+                if is_columnar(file.name):
+                    # Only a preview is kept until the columns are mapped; the
+                    # criteria step then re-reads just the mapped columns
+                    df, columns, total_rows = preview_columnar(file.name)
+                    df.attrs["source_path"] = file.name
+                    df.attrs["source_columns"] = columns
+                    label = f"Uploaded Data (first {len(df)} rows)" if total_rows is None else \
+                        f"Uploaded Data (first {len(df)} of {total_rows} rows)"
                 else:
-                    raise ValueError("Unsupported JSON structure. Please provide a list or object.")
+                    # Streams JSON Lines and top-level arrays, normalizing in bounded chunks
+                    df = load_dataframe(file.name)
+                    label = "Uploaded Data"
 
                 df_state.value = df
+                set_span_attributes(rows=len(df), columns=len(df.columns))
 
                 return {
-                    df_display: gr.update(value=df_state.value, visible=True),
+                    **data_table.show(table_view, df_state.value, label=label),
                     import_button: gr.update(visible=False),
                     df_state: df_state,
                     error_display: gr.update(visible=False)  # Hide previous errors
                 }
             except json.JSONDecodeError:
                 return {
-                    df_display: gr.update(visible=False),
+                    **data_table.hide(),
                     error_display: gr.update(
                         value="**Error:** Invalid JSON file. Please upload a valid JSON file.",
                         visible=True
@@ -70,14 +71,14 @@ def upload_test_data(df_state):
                 }
             except Exception as e:
                 return {
-                    df_display: gr.update(visible=False),
+                    **data_table.hide(),
                     error_display: gr.update(value=f"**Error:** {str(e)}", visible=True),
                     import_button: gr.update(visible=True),
                     df_state: None
                 }
         else:
             return {
-                df_display: gr.update(visible=False),
+                **data_table.hide(),
                 import_button: gr.update(visible=True),
                 df_state: None
             }
@@ -85,12 +86,12 @@ def upload_test_data(df_state):
     file_upload.change(
         fn=display_file_info,
         inputs=file_upload,
-        outputs=[import_button, df_display, error_display]
+        outputs=[import_button, *data_table.outputs, error_display]
     )
     import_button.click(
         fn=import_data,
-        inputs=file_upload,
-        outputs=[df_display, import_button, df_state, error_display]
+        inputs=[file_upload, data_table.view],
+        outputs=[*data_table.outputs, import_button, df_state, error_display]
     )
 
     return data_upload_group, df_state
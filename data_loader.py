@@ -0,0 +1,276 @@
+# data_loader.py
+
+import gzip
+import io
+import json
+import os
+
+import pandas as pd
+
+# Records normalized per chunk; parsing never holds more than this many raw rows
+CHUNK_ROWS = int(os.getenv("DATA_IMPORT_CHUNK_ROWS", "10000"))
+READ_BLOCK_CHARS = 1 << 20
+
+# Rows read from a columnar file for the preview shown after upload
+PREVIEW_ROWS = int(os.getenv("DATA_IMPORT_PREVIEW_ROWS", "1000"))
+
+JSON_LINES_EXTENSIONS = (".jsonl", ".ndjson")
+COMPRESSION_EXTENSIONS = (".gz", ".zst")
+PARQUET_EXTENSIONS = (".parquet", ".pq")
+ARROW_EXTENSIONS = (".arrow", ".feather", ".ipc")
+CSV_EXTENSIONS = (".csv",)
+COLUMNAR_EXTENSIONS = PARQUET_EXTENSIONS + ARROW_EXTENSIONS + CSV_EXTENSIONS
+# Formats read through a decompressing stream; Parquet and Arrow compress internally and need random access
+COMPRESSIBLE_EXTENSIONS = (".json", *JSON_LINES_EXTENSIONS, *CSV_EXTENSIONS)
+UPLOAD_FILE_TYPES = [
+    ".json", *JSON_LINES_EXTENSIONS, *COLUMNAR_EXTENSIONS,
+    *(extension + compression for extension in COMPRESSIBLE_EXTENSIONS for compression in COMPRESSION_EXTENSIONS),
+]
+
+
+def split_compression(path):
+    """Return `(path without compression suffix, compression suffix or None)`"""
+    root, extension = os.path.splitext(path)
+    if extension.lower() in COMPRESSION_EXTENSIONS:
+        return root, extension.lower()
+    return path, None
+
+
+def open_text(path):
+    """Open a possibly .gz/.zst compressed file as decompressed UTF-8 text"""
+    _, compression = split_compression(path)
+    if compression == ".gz":
+        return gzip.open(path, "rt", encoding="utf-8-sig")
+    if compression == ".zst":
+        try:
+            import zstandard
+        except ImportError:
+            raise ValueError("Reading .zst files requires the zstandard package (pip install zstandard)")
+        raw = open(path, "rb")
+        return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(raw), encoding="utf-8-sig")
+    return open(path, "r", encoding="utf-8-sig")
+
+
+def iter_json_lines(f):
+    """Yield one record per non-blank line of a JSON Lines stream"""
+    for line in f:
+        if line.strip():
+            yield json.loads(line)
+
+
+def iter_json_array(f):
+    """Yield the elements of a top-level JSON array without loading the whole document.
+
+    The stream must be positioned just after the opening `[`. Elements are
+    decoded one at a time from a sliding buffer of READ_BLOCK_CHARS blocks.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    exhausted = False
+    while True:
+        # Skip whitespace and separators between elements
+        while position < len(buffer) and buffer[position] in " \t\r\n,":
+            position += 1
+        if position < len(buffer) and buffer[position] == "]":
+            return
+        try:
+            element, end = decoder.raw_decode(buffer, position)
+            # A number at the very end of the buffer may continue in the next block
+            complete = end < len(buffer) or exhausted
+        except json.JSONDecodeError:
+            if exhausted:
+                raise
+            complete = False
+        if complete:
+            yield element
+            position = end
+            continue
+        block = f.read(READ_BLOCK_CHARS)
+        if not block:
+            if exhausted:
+                raise json.JSONDecodeError("Unterminated JSON array", buffer, position)
+            exhausted = True
+        buffer = buffer[position:] + block
+        position = 0
+
+
+def _peek_first_char(f):
+    """Read up to the first non-whitespace character and return it ('' for an empty stream)"""
+    while True:
+        char = f.read(1)
+        if not char or not char.isspace():
+            return char
+
+
+def iter_records(path):
+    """Yield the records of a JSON Lines file or a JSON array/object file.
+
+    JSON Lines and top-level arrays are streamed. A top-level object is still
+    read whole: its "data" list if it has one, otherwise the object itself.
+    """
+    base_path, _ = split_compression(path)
+    with open_text(path) as f:
+        if base_path.lower().endswith(JSON_LINES_EXTENSIONS):
+            yield from iter_json_lines(f)
+            return
+
+        first_char = _peek_first_char(f)
+        if first_char == "[":
+            yield from iter_json_array(f)
+            return
+        if first_char != "{":
+            raise ValueError("Unsupported JSON structure. Please provide a list or object.")
+
+        # A .json file starting with an object is either JSON Lines or one document
+        rest = first_char + f.readline()
+        try:
+            first = json.loads(rest)
+        except json.JSONDecodeError:
+            first = None
+        if first is not None:
+            following = f.readline()
+            while following and not following.strip():
+                following = f.readline()
+            if following:
+                # More objects follow on their own lines: JSON Lines
+                yield first
+                yield json.loads(following)
+                yield from iter_json_lines(f)
+            else:
+                yield from _document_records(first)
+            return
+        yield from _document_records(json.loads(rest + f.read()))
+
+
+def _document_records(document):
+    # Dictionary could contain a "data" key or not
+    if "data" in document and isinstance(document["data"], list):
+        yield from document["data"]
+    else:
+        # Flatten the top-level dictionary
+        yield document
+
+
+def load_dataframe(path, chunk_rows=CHUNK_ROWS):
+    """Load an uploaded dataset into a flat DataFrame, normalizing `chunk_rows` records at a time"""
+    frames = []
+    chunk = []
+    for record in iter_records(path):
+        chunk.append(record)
+        if len(chunk) >= chunk_rows:
+            frames.append(pd.json_normalize(chunk, sep="."))
+            chunk = []
+    if chunk or not frames:
+        frames.append(pd.json_normalize(chunk, sep="."))
+    if len(frames) == 1:
+        return frames[0]
+    return pd.concat(frames, ignore_index=True)
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.feather
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise ValueError("Reading Parquet and Arrow files requires the pyarrow package (pip install pyarrow)")
+    return pyarrow
+
+
+def is_columnar(path):
+    base_path, _ = split_compression(path)
+    return base_path.lower().endswith(COLUMNAR_EXTENSIONS)
+
+
+def _columnar_extension(path):
+    """The format extension of a columnar file, rejecting compressed Parquet/Arrow before anything is read"""
+    base_path, compression = split_compression(path)
+    extension = os.path.splitext(base_path)[1].lower()
+    if compression and extension not in COMPRESSIBLE_EXTENSIONS:
+        raise ValueError(
+            f"{os.path.basename(path)}: {extension} files can't be read {compression}-compressed. "
+            f"Upload the {extension} file itself; Parquet and Arrow compress their columns internally."
+        )
+    return extension
+
+
+def _open_arrow(pa, path, options=None):
+    """Memory-map an Arrow IPC file (random access format, falling back to the stream format)"""
+    source = pa.memory_map(path, "r")
+    try:
+        return pa.ipc.open_file(source, options=options)
+    except pa.ArrowInvalid:
+        source.seek(0)
+        return pa.ipc.open_stream(source, options=options)
+
+
+def preview_columnar(path, rows=PREVIEW_ROWS):
+    """Read the first `rows` rows of a Parquet, Arrow IPC or CSV file.
+
+    Returns `(preview DataFrame, all column names, total row count or None)`;
+    the full file is only read later, with just the mapped columns (see load_columns).
+    """
+    extension = _columnar_extension(path)
+    if extension in CSV_EXTENSIONS:
+        preview = pd.read_csv(path, nrows=rows)
+        return preview, preview.columns.tolist(), None
+
+    pa = _import_pyarrow()
+    if extension in PARQUET_EXTENSIONS:
+        parquet_file = pa.parquet.ParquetFile(path)
+        batch = next(parquet_file.iter_batches(batch_size=rows), None)
+        table = pa.Table.from_batches([batch]) if batch is not None else parquet_file.schema_arrow.empty_table()
+        return table.to_pandas(), parquet_file.schema_arrow.names, parquet_file.metadata.num_rows
+
+    # Only the record batches covering the preview are read (and decompressed)
+    reader = _open_arrow(pa, path)
+    batches = []
+    count = 0
+    if isinstance(reader, pa.ipc.RecordBatchFileReader):
+        for index in range(reader.num_record_batches):
+            if count >= rows:
+                break
+            batches.append(reader.get_batch(index))
+            count += batches[-1].num_rows
+        total_rows = reader.count_rows()
+    else:
+        for batch in reader:
+            batches.append(batch)
+            count += batch.num_rows
+            if count >= rows:
+                break
+        total_rows = None
+    table = pa.Table.from_batches(batches, schema=reader.schema)
+    return table.slice(0, rows).to_pandas(), reader.schema.names, total_rows
+
+
+def load_columns(path, columns):
+    """Read only `columns` of a Parquet, Arrow IPC or CSV file into a DataFrame.
+
+    Parquet and CSV skip the other columns while parsing; Arrow IPC files are
+    memory-mapped and read with a field projection, so unselected columns are
+    never paged in or decompressed.
+    """
+    columns = list(dict.fromkeys(columns))
+    extension = _columnar_extension(path)
+    if extension in CSV_EXTENSIONS:
+        return pd.read_csv(path, usecols=columns)[columns]
+
+    pa = _import_pyarrow()
+    if extension in PARQUET_EXTENSIONS:
+        table = pa.parquet.read_table(path, columns=columns, memory_map=True)
+    else:
+        try:
+            table = pa.feather.read_table(path, columns=columns, memory_map=True)
+        except pa.ArrowInvalid:
+            # Stream-format files have no footer for feather to read; project while reading batches
+            schema = _open_arrow(pa, path).schema
+            missing = [column for column in columns if schema.get_field_index(column) < 0]
+            if missing:
+                raise ValueError(f"Columns not found in {os.path.basename(path)}: {', '.join(missing)}")
+            options = pa.ipc.IpcReadOptions(included_fields=[schema.get_field_index(column) for column in columns])
+            table = _open_arrow(pa, path, options).read_all()
+        table = table.select(columns)
+    return table.to_pandas()
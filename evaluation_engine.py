@@ -0,0 +1,177 @@
+# evaluation_engine.py
+
+import asyncio
+import os
+import time
+
+import numpy as np
+
+from usage_tracker import current_job
+
+# Number of judge calls allowed in flight at once for a Custom dataset run
+DEFAULT_MAX_WORKERS = int(os.getenv("EVAL_MAX_WORKERS", "16"))
+MAX_WORKERS_LIMIT = 64
+# Judges in one run, Selene included
+MAX_JUDGES = int(os.getenv("EVAL_MAX_JUDGES", "8"))
+
+
+def to_score(value):
+    """Convert a judge's score to float, using NaN for errors and unparseable scores"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def find_duplicates(keys):
+    """Map the first position of every repeated key to the later positions with the same key"""
+    first_seen = {}
+    duplicates = {}
+    for position, key in enumerate(keys):
+        first = first_seen.setdefault(key, position)
+        if first != position:
+            duplicates.setdefault(first, []).append(position)
+    return duplicates
+
+
+def format_duration(seconds):
+    seconds = int(seconds)
+    hours, remainder = divmod(seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    if hours:
+        return f"{hours}h {minutes}m"
+    if minutes:
+        return f"{minutes}m {seconds}s"
+    return f"{seconds}s"
+
+
+class EvaluationProgress:
+    """Accumulates the results of a run and tracks finished rows so the UI can
+    report throughput while it is going.
+
+    Results are kept columnar: `scores[judge]` is a preallocated float array
+    (NaN for errors) and `critiques[judge]` an object array, both aligned with
+    the rows of the run.
+    """
+
+    def __init__(self, total_rows, judge_names):
+        self.total_rows = total_rows
+        # Rows the run means to judge, when it stops short of all of them (estimate mode)
+        self.planned_rows = total_rows
+        self.scores = {name: np.full(total_rows, np.nan) for name in judge_names}
+        self.critiques = {name: np.full(total_rows, None, dtype=object) for name in judge_names}
+        self.recorded = {name: np.zeros(total_rows, dtype=bool) for name in judge_names}
+        self.completed_rows = 0
+        self.restored_rows = 0
+        self.errors = 0
+        self.saved_calls = 0
+        self.started_at = time.monotonic()
+        self.completed_mask = np.zeros(total_rows, dtype=bool)
+        self._pending_judges = np.full(total_rows, len(self.scores), dtype=np.int32)
+
+    def record(self, name, position, result):
+        score, critique = result
+        score = to_score(score)
+        if np.isnan(score):
+            self.errors += 1
+        self.scores[name][position] = score
+        self.critiques[name][position] = critique
+        self.recorded[name][position] = True
+        self._pending_judges[position] -= 1
+        if self._pending_judges[position] == 0:
+            self.completed_mask[position] = True
+            self.completed_rows += 1
+
+    def fan_out(self, name, position, duplicates, count_saved=True):
+        """Copy a judge's result for `position` to its duplicate rows that don't have one yet.
+
+        Returns the positions filled in, e.g. so they can be journaled.
+        """
+        filled = [duplicate for duplicate in duplicates if not self.recorded[name][duplicate]]
+        result = (self.scores[name][position], self.critiques[name][position])
+        for duplicate in filled:
+            self.record(name, duplicate, result)
+        if count_saved:
+            self.saved_calls += len(filled)
+        return filled
+
+    def mark_restored(self):
+        """Treat everything recorded so far as carried over from an earlier run"""
+        self.restored_rows = self.completed_rows
+        self.started_at = time.monotonic()
+
+    @property
+    def rows_per_second(self):
+        elapsed = time.monotonic() - self.started_at
+        return (self.completed_rows - self.restored_rows) / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def eta_seconds(self):
+        rate = self.rows_per_second
+        return max(self.planned_rows - self.completed_rows, 0) / rate if rate > 0 else None
+
+    def summary(self):
+        eta = self.eta_seconds
+        summary = (
+            f"Evaluated {self.completed_rows}/{self.planned_rows} rows · "
+            f"{self.rows_per_second:.1f} rows/s · "
+            f"ETA {format_duration(eta) if eta is not None else '—'} · "
+            f"{self.errors} errors"
+        )
+        if self.restored_rows:
+            summary += f" · {self.restored_rows} rows resumed from checkpoint"
+        if self.saved_calls:
+            summary += f" · {self.saved_calls} calls saved by deduplication"
+        return summary
+
+
+async def evaluate_rows(row_contexts, judges, max_workers=DEFAULT_MAX_WORKERS, progress=None, on_result=None,
+                        duplicates=None, positions=None):
+    """Evaluate every row with every judge concurrently on the running event loop.
+
+    `row_contexts` is a list of per-row contexts in DataFrame order and `judges`
+    maps a judge name to an async callable taking one context and returning
+    `(score, critique)`. A fixed number of workers pull (row, judge) jobs from a
+    shared queue, so rows and the judges within a row all run concurrently.
+    Results are recorded into `progress` (a new EvaluationProgress if not given)
+    as calls finish, and the progress object is returned. Calls already
+    recorded in `progress` (e.g. restored from a checkpoint) are skipped, and
+    `on_result(name, position, score, critique)` is called after every new one
+    with the score already converted to float. With `duplicates` (see
+    find_duplicates), only the first of each group of identical rows is sent
+    to the judges and its result is copied to the rest. `positions`
+    restricts the run to those rows, in that order.
+    """
+    max_workers = max(1, min(int(max_workers), MAX_WORKERS_LIMIT))
+    if progress is None:
+        progress = EvaluationProgress(len(row_contexts), judges.keys())
+    duplicates = duplicates or {}
+    repeated = np.zeros(len(row_contexts), dtype=bool)
+    for others in duplicates.values():
+        repeated[others] = True
+    jobs = (
+        (name, position)
+        for position in (range(len(row_contexts)) if positions is None else positions)
+        for name in judges
+        if not repeated[position] and not progress.recorded[name][position]
+    )
+
+    def report(name, position):
+        if on_result is not None:
+            on_result(name, position, progress.scores[name][position], progress.critiques[name][position])
+
+    async def worker():
+        for name, position in jobs:
+            # Lets the call's usage be booked against this judge and row
+            current_job.set((name, position))
+            try:
+                result = await judges[name](row_contexts[position])
+            except Exception as e:
+                result = ("Error", f"Error evaluating row: {str(e)}")
+            progress.record(name, position, result)
+            report(name, position)
+            for duplicate in progress.fan_out(name, position, duplicates.get(position, ())):
+                report(name, duplicate)
+
+    await asyncio.gather(*(worker() for _ in range(max_workers)))
+    return progress
@@ -1,96 +1,194 @@
 # get_llm_answer.py
 
-from openai import OpenAI
-import anthropic
-from together import Together
 import json
+import os
 import re
-from atla import Atla
+from clients import get_client
+from rate_limiter import get_rate_limiter, estimate_tokens
+from resilience import call_with_retries, call_with_retries_async
+from judgment_cache import make_cache_key, get_cached, put_cached, get_cached_async, put_cached_async
+from usage_tracker import track_call, start_attempt, record_usage, record_cache_hit
+from tracing import set_span_attributes, span, traced
+from utils import get_logger
 
-from dotenv import load_dotenv
-load_dotenv()
-
-# Initialize clients
-anthropic_client = anthropic.Anthropic()
-openai_client = OpenAI()
-together_client = Together()
-atla_client = Atla()
+logger = get_logger(__name__)
 
 SYSTEM_PROMPT = """Please act as an impartial judge and evaluate based on the user's instruction. Your output format should strictly adhere to JSON as follows: {"feedback": "<write feedback>", "result": <numerical score>}. Ensure the output is valid JSON, without additional formatting or explanations."""
 
-def get_openai_response(model_name, prompt):
+# Ask providers for JSON natively (OpenAI JSON mode, a forced Anthropic tool call); 0 sends plain prompts
+STRUCTURED_OUTPUT = os.getenv("JUDGE_STRUCTURED_OUTPUT", "1") != "0"
+# Follow-up requests asking a judge to restate a reply that could not be parsed
+JUDGE_MAX_REASKS = int(os.getenv("JUDGE_MAX_REASKS", "1"))
+
+JUDGMENT_TOOL = {
+    "name": "submit_judgment",
+    "description": "Submit the feedback and the numerical score for the evaluated response.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "feedback": {"type": "string"},
+            "result": {"type": "number"},
+        },
+        "required": ["feedback", "result"],
+    },
+}
+
+REASK_PROMPT = """Your previous reply could not be read as the required JSON. Reply again with only this JSON object and nothing else: {"feedback": "<write feedback>", "result": <numerical score>}"""
+
+
+def _messages(prompt, history=()):
+    """Chat messages for `prompt` following earlier (prompt, reply) turns"""
+    messages = []
+    for previous_prompt, reply in history:
+        messages.append({"role": "user", "content": previous_prompt})
+        messages.append({"role": "assistant", "content": reply})
+    messages.append({"role": "user", "content": prompt})
+    return messages
+
+
+def openai_request(api_model, prompt, history=()):
+    """Chat Completions arguments for a judge call (also the body of batch requests)"""
+    request = {
+        "model": api_model,
+        "messages": [{"role": "system", "content": SYSTEM_PROMPT}, *_messages(prompt, history)],
+    }
+    if STRUCTURED_OUTPUT:
+        request["response_format"] = {"type": "json_object"}
+    return request
+
+
+def anthropic_request(api_model, prompt, history=()):
+    """Messages API arguments for a judge call (also the params of batch requests)"""
+    request = {
+        "model": api_model,
+        "max_tokens": 1000,
+        "temperature": 0,
+        "system": SYSTEM_PROMPT,
+        "messages": [
+            {"role": message["role"], "content": [{"type": "text", "text": message["content"]}]}
+            for message in _messages(prompt, history)
+        ],
+    }
+    if STRUCTURED_OUTPUT:
+        request["tools"] = [JUDGMENT_TOOL]
+        request["tool_choice"] = {"type": "tool", "name": JUDGMENT_TOOL["name"]}
+    return request
+
+
+def together_request(api_model, prompt, history=()):
+    # JSON mode is only available for some Together models, so replies go through the extractor
+    return {
+        "model": api_model,
+        "messages": [{"role": "system", "content": SYSTEM_PROMPT}, *_messages(prompt, history)],
+        "stream": False,
+    }
+
+
+def anthropic_reply_text(content):
+    """Text of an Anthropic reply; the judgment tool's input comes back as JSON text"""
+    for block in content:
+        if block.type == "tool_use":
+            return json.dumps(block.input)
+    return "".join(block.text for block in content if block.type == "text")
+
+
+def _model_cache_key(organization, api_model, prompt, history=()):
+    # Generation parameters must match the ones sent in the provider functions below
+    params = {"system_prompt": SYSTEM_PROMPT, "structured_output": STRUCTURED_OUTPUT}
+    if organization == "Anthropic":
+        params.update(max_tokens=1000, temperature=0)
+    if history:
+        params["history"] = [list(turn) for turn in history]
+    return make_cache_key(organization, api_model, prompt, params)
+
+
+def _atla_cache_key(model_name, model_input, model_output, model_context, expected_output, evaluation_criteria):
+    payload = {
+        "model_input": model_input,
+        "model_output": model_output,
+        "model_context": model_context,
+        "expected_model_output": expected_output,
+        "evaluation_criteria": evaluation_criteria,
+    }
+    return make_cache_key("Atla", model_name, payload)
+
+
+def _is_error_response(response):
+    """Provider functions report failures as strings; those must never be cached"""
+    return isinstance(response, str) and response.startswith(("Error with ", "Model not found"))
+
+
+def get_openai_response(model_name, prompt, history=()):
     """Get response from OpenAI API"""
     try:
-        response = openai_client.chat.completions.create(
-            model=model_name,
-            messages=[
-                {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "user", "content": prompt},
-            ],
-        )
+        response = call_with_retries("OpenAI", lambda: get_client("OpenAI").chat.completions.create(
+            **openai_request(model_name, prompt, history)
+        ))
         return response.choices[0].message.content
     except Exception as e:
         return f"Error with OpenAI model {model_name}: {str(e)}"
 
 
-def get_anthropic_response(model_name, prompt):
+def get_anthropic_response(model_name, prompt, history=()):
     """Get response from Anthropic API"""
     try:
-        response = anthropic_client.messages.create(
-            model=model_name,
-            max_tokens=1000,
-            temperature=0,
-            system=SYSTEM_PROMPT,
-            messages=[{"role": "user", "content": [{"type": "text", "text": prompt}]}],
-        )
-        return response.content[0].text
+        response = call_with_retries("Anthropic", lambda: get_client("Anthropic").messages.create(
+            **anthropic_request(model_name, prompt, history)
+        ))
+        return anthropic_reply_text(response.content)
     except Exception as e:
         return f"Error with Anthropic model {model_name}: {str(e)}"
 
 
-def get_together_response(model_name, prompt):
+def get_together_response(model_name, prompt, history=()):
     """Get response from Together API"""
     try:
-        response = together_client.chat.completions.create(
-            model=model_name,
-            messages=[
-                {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "user", "content": prompt},
-            ],
-            stream=False,
-        )
+        response = call_with_retries("Together", lambda: get_client("Together").chat.completions.create(
+            **together_request(model_name, prompt, history)
+        ))
         return response.choices[0].message.content
     except Exception as e:
         return f"Error with Together model {model_name}: {str(e)}"
 
 
-def get_atla_response(model_name, model_input, model_output, model_context, expected_output, evaluation_criteria):
+@traced()
+def get_atla_response(model_name, model_input, model_output, model_context, expected_output, evaluation_criteria, use_cache=True):
     """Get response from Atla API"""
+    cache_key = _atla_cache_key(model_name, model_input, model_output, model_context, expected_output, evaluation_criteria)
+    cached = get_cached(cache_key) if use_cache else None
+    if cached is not None:
+        set_span_attributes(cache_hit=True)
+        return cached
     try:
-        response = atla_client.evaluation.create(
+        response = call_with_retries("Atla", lambda: get_client("Atla").evaluation.create(
             model_id=model_name,
             model_input=model_input,
             model_output=model_output,
             model_context=model_context,
             expected_model_output=expected_output,
             evaluation_criteria=evaluation_criteria,
-        )
+        ))
         # Return the score and critique directly from the evaluation result
-        return {
+        result = {
             "score": response.result.evaluation.score,
             "critique": response.result.evaluation.critique
         }
     except Exception as e:
         return f"Error with Atla model {model_name}: {str(e)}"
+    if use_cache:
+        put_cached(cache_key, result)
+    return result
 
 
-def get_model_response(model_name, model_info, prompt=None, **kwargs):
+@traced()
+def get_model_response(model_name, model_info, prompt=None, use_cache=True, history=(), **kwargs):
     """Get response from appropriate API based on model organization"""
     if not model_info:
         return "Model not found or unsupported."
 
     api_model = model_info["api_model"]
     organization = model_info["organization"]
+    set_span_attributes(model=api_model, organization=organization)
 
     try:
         if organization == "Atla":
@@ -100,38 +198,245 @@ def get_model_response(model_name, model_info, prompt=None, **kwargs):
                 kwargs.get('model_output'),
                 kwargs.get('model_context'),
                 kwargs.get('expected_output'),
-                kwargs.get('evaluation_criteria')
+                kwargs.get('evaluation_criteria'),
+                use_cache=use_cache
             )
-        elif organization == "OpenAI":
-            return get_openai_response(api_model, prompt)
+
+        cache_key = _model_cache_key(organization, api_model, prompt, history)
+        cached = get_cached(cache_key) if use_cache else None
+        if cached is not None:
+            set_span_attributes(cache_hit=True)
+            return cached
+
+        if organization == "OpenAI":
+            response = get_openai_response(api_model, prompt, history)
         elif organization == "Anthropic":
-            return get_anthropic_response(api_model, prompt)
+            response = get_anthropic_response(api_model, prompt, history)
         else:
             # All other organizations use Together API
-            return get_together_response(api_model, prompt)
+            response = get_together_response(api_model, prompt, history)
+
+        if use_cache and not _is_error_response(response):
+            put_cached(cache_key, response)
+        return response
     except Exception as e:
         return f"Error with {organization} model {model_name}: {str(e)}"
 
 
-def parse_model_response(response):
+
+async def _send_async(organization, model_name, prompt_text, request, history=(), estimate_usage=None):
+    """Send one provider request through the rate limiter of its organization,
+    retrying transient failures behind the provider's circuit breaker.
+
+    Tokens, timings and retries of the call are recorded for the run being tracked, if any;
+    `estimate_usage(response)` stands in for providers whose responses carry no token counts.
+    """
+    limiter = get_rate_limiter(organization)
+    estimated_tokens = estimate_tokens(SYSTEM_PROMPT, prompt_text, *(text for turn in history for text in turn))
+
+    async def attempt():
+        async with limiter.slot(estimated_tokens):
+            start_attempt()
+            # Inside the call's span, the time before this one is spent waiting on the rate limiter
+            with span("provider_request", organization=organization):
+                return await request()
+
+    with track_call(organization, model_name):
+        response = await call_with_retries_async(limiter.organization, attempt)
+        record_usage(estimate_usage(response) if estimate_usage else response)
+    return response
+
+
+async def get_openai_response_async(model_name, prompt, organization="OpenAI", history=()):
+    """Get response from OpenAI API without blocking the event loop"""
     try:
-        # Debug print
-        print(f"Raw model response: {response}")
+        response = await _send_async(organization, model_name, prompt, lambda: get_client("OpenAI", use_async=True).chat.completions.create(
+            **openai_request(model_name, prompt, history)
+        ), history)
+        return response.choices[0].message.content
+    except Exception as e:
+        return f"Error with OpenAI model {model_name}: {str(e)}"
 
-        # First try to parse the entire response as JSON
-        try:
-            data = json.loads(response)
-            return str(data.get("result", "N/A")), data.get("feedback", "N/A")
-        except json.JSONDecodeError:
-            # If that fails (typically for smaller models), try to find JSON within the response
-            json_match = re.search(r"{.*}", response)
-            if json_match:
-                data = json.loads(json_match.group(0))
-                return str(data.get("result", "N/A")), data.get("feedback", "N/A")
-            else:
-                return "Error", f"Failed to parse response: {response}"
 
+async def get_anthropic_response_async(model_name, prompt, organization="Anthropic", history=()):
+    """Get response from Anthropic API without blocking the event loop"""
+    try:
+        response = await _send_async(organization, model_name, prompt, lambda: get_client("Anthropic", use_async=True).messages.create(
+            **anthropic_request(model_name, prompt, history)
+        ), history)
+        return anthropic_reply_text(response.content)
+    except Exception as e:
+        return f"Error with Anthropic model {model_name}: {str(e)}"
+
+
+async def get_together_response_async(model_name, prompt, organization="Together", history=()):
+    """Get response from Together API without blocking the event loop"""
+    try:
+        response = await _send_async(organization, model_name, prompt, lambda: get_client("Together", use_async=True).chat.completions.create(
+            **together_request(model_name, prompt, history)
+        ), history)
+        return response.choices[0].message.content
     except Exception as e:
-        # Debug print for error case
-        print(f"Failed to parse response: {str(e)}")
-        return "Error", f"Failed to parse response: {response}"
\ No newline at end of file
+        return f"Error with Together model {model_name}: {str(e)}"
+
+
+@traced("get_atla_response")
+async def get_atla_response_async(model_name, model_input, model_output, model_context, expected_output, evaluation_criteria, use_cache=True):
+    """Get response from Atla API without blocking the event loop"""
+    cache_key = _atla_cache_key(model_name, model_input, model_output, model_context, expected_output, evaluation_criteria)
+    cached = await get_cached_async(cache_key) if use_cache else None
+    if cached is not None:
+        record_cache_hit()
+        set_span_attributes(cache_hit=True)
+        return cached
+    try:
+        prompt_text = "".join(
+            text or "" for text in (model_input, model_output, model_context, expected_output, evaluation_criteria)
+        )
+        response = await _send_async("Atla", model_name, prompt_text, lambda: get_client("Atla", use_async=True).evaluation.create(
+            model_id=model_name,
+            model_input=model_input,
+            model_output=model_output,
+            model_context=model_context,
+            expected_model_output=expected_output,
+            evaluation_criteria=evaluation_criteria,
+        ), estimate_usage=lambda response: {
+            # Atla reports no usage, so its calls are priced on token counts estimated from the text
+            "input_tokens": estimate_tokens(prompt_text, completion_tokens=0),
+            "output_tokens": estimate_tokens(response.result.evaluation.critique, completion_tokens=0),
+        })
+        # Return the score and critique directly from the evaluation result
+        result = {
+            "score": response.result.evaluation.score,
+            "critique": response.result.evaluation.critique
+        }
+    except Exception as e:
+        return f"Error with Atla model {model_name}: {str(e)}"
+    if use_cache:
+        await put_cached_async(cache_key, result)
+    return result
+
+
+@traced("get_model_response")
+async def get_model_response_async(model_name, model_info, prompt=None, use_cache=True, history=(), **kwargs):
+    """Async counterpart of get_model_response"""
+    if not model_info:
+        return "Model not found or unsupported."
+
+    api_model = model_info["api_model"]
+    organization = model_info["organization"]
+    set_span_attributes(model=api_model, organization=organization)
+
+    try:
+        if organization == "Atla":
+            return await get_atla_response_async(
+                api_model,
+                kwargs.get('model_input'),
+                kwargs.get('model_output'),
+                kwargs.get('model_context'),
+                kwargs.get('expected_output'),
+                kwargs.get('evaluation_criteria'),
+                use_cache=use_cache
+            )
+
+        cache_key = _model_cache_key(organization, api_model, prompt, history)
+        cached = await get_cached_async(cache_key) if use_cache else None
+        if cached is not None:
+            record_cache_hit()
+            set_span_attributes(cache_hit=True)
+            return cached
+
+        if organization == "OpenAI":
+            response = await get_openai_response_async(api_model, prompt, organization, history)
+        elif organization == "Anthropic":
+            response = await get_anthropic_response_async(api_model, prompt, organization, history)
+        else:
+            # All other organizations use Together API
+            response = await get_together_response_async(api_model, prompt, organization, history)
+
+        if use_cache and not _is_error_response(response):
+            await put_cached_async(cache_key, response)
+        return response
+    except Exception as e:
+        return f"Error with {organization} model {model_name}: {str(e)}"
+
+# Last resort for almost-JSON replies (trailing commas, unescaped quotes in the feedback, ...)
+_RESULT_FIELD = re.compile(r"""["']result["']\s*:\s*["']?(-?\d+(?:\.\d+)?)""")
+_FEEDBACK_FIELD = re.compile(r'"feedback"\s*:\s*"((?:[^"\\]|\\.)*)"', re.DOTALL)
+# Lenient about raw newlines inside strings, which models often emit; reused to avoid per-call setup
+_JSON_DECODER = json.JSONDecoder(strict=False)
+
+
+def _judgment_around(text, key_at):
+    """The innermost JSON object of `text` that holds the "result" key at `key_at`, or None.
+
+    Each "{" before the key is tried from the nearest one back, and the C
+    decoder finds where its object ends; braces in prose or inside strings
+    simply fail to decode and are skipped.
+    """
+    start = text.rfind("{", 0, key_at)
+    while start != -1:
+        try:
+            data, end = _JSON_DECODER.raw_decode(text, start)
+        except ValueError:
+            pass
+        else:
+            if end > key_at and isinstance(data, dict) and "result" in data:
+                return data
+        start = text.rfind("{", 0, start)
+    return None
+
+
+def extract_judgment(response):
+    """The JSON object with the judge's "result" in a reply, or None"""
+    stripped = response.strip()
+    if stripped.startswith("{") and stripped.endswith("}"):
+        # Structured-output replies are exactly the object
+        try:
+            data = _JSON_DECODER.decode(stripped)
+            if isinstance(data, dict) and "result" in data:
+                return data
+        except ValueError:
+            pass
+    # Chatty replies often quote the format first, so the last judgment object wins
+    key_at = response.rfind('"result"')
+    while key_at != -1:
+        judgment = _judgment_around(response, key_at)
+        if judgment is not None:
+            return judgment
+        key_at = response.rfind('"result"', 0, key_at)
+    result = _RESULT_FIELD.search(response)
+    if result:
+        feedback = _FEEDBACK_FIELD.search(response)
+        return {"result": result.group(1), "feedback": feedback.group(1) if feedback else "N/A"}
+    return None
+
+
+@traced()
+def parse_model_response(response):
+    data = extract_judgment(response) if isinstance(response, str) else None
+    if data is None:
+        logger.warning("Failed to parse response: %s", str(response)[:200])
+        return "Error", f"Failed to parse response: {response}"
+    return str(data.get("result", "N/A")), data.get("feedback", "N/A")
+
+
+@traced("get_judgment")
+async def get_judgment_async(model_name, model_info, prompt, use_cache=True, reply=None):
+    """A judge's (score, critique) for `prompt`.
+
+    A reply that can't be parsed is followed up with a request to restate it
+    as the JSON object, up to JUDGE_MAX_REASKS times. Pass `reply` to start
+    from a reply obtained elsewhere, e.g. from a batch.
+    """
+    if reply is None:
+        reply = await get_model_response_async(model_name, model_info, prompt, use_cache=use_cache)
+    history = []
+    for _ in range(JUDGE_MAX_REASKS):
+        if not isinstance(reply, str) or _is_error_response(reply) or extract_judgment(reply) is not None:
+            break
+        history.append((REASK_PROMPT if history else prompt, reply))
+        reply = await get_model_response_async(
+            model_name, model_info, REASK_PROMPT, use_cache=use_cache, history=tuple(history)
+        )
+    return parse_model_response(reply)
@@ -0,0 +1,122 @@
+# judgment_cache.py
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+CACHE_PATH = os.getenv(
+    "JUDGMENT_CACHE_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "eval-sandbox", "judgments.sqlite3"),
+)
+CACHE_ENABLED = os.getenv("JUDGMENT_CACHE", "on").lower() not in ("0", "off", "false", "no")
+CACHE_TTL_SECONDS = float(os.getenv("JUDGMENT_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+CACHE_MAX_ENTRIES = int(os.getenv("JUDGMENT_CACHE_MAX_ENTRIES", "200000"))
+# Eviction runs every this many writes rather than on every write
+EVICTION_INTERVAL = 500
+
+_lock = threading.Lock()
+_connection = None
+_writes_since_eviction = 0
+
+
+def make_cache_key(provider, api_model, payload, params=None):
+    """Content hash of everything that determines a judge's reply"""
+    material = json.dumps(
+        {"provider": provider, "api_model": api_model, "payload": payload, "params": params or {}},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def _get_connection():
+    global _connection
+    if _connection is None:
+        os.makedirs(os.path.dirname(CACHE_PATH), exist_ok=True)
+        _connection = sqlite3.connect(CACHE_PATH, check_same_thread=False, isolation_level=None)
+        _connection.execute("PRAGMA journal_mode=WAL")
+        _connection.execute("PRAGMA synchronous=NORMAL")
+        _connection.execute(
+            "CREATE TABLE IF NOT EXISTS judgments ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        _connection.execute("CREATE INDEX IF NOT EXISTS judgments_accessed_at ON judgments (accessed_at)")
+    return _connection
+
+
+def get_cached(key):
+    """Return the cached judgment for `key`, or None if missing, expired or disabled"""
+    if not CACHE_ENABLED:
+        return None
+    now = time.time()
+    try:
+        with _lock:
+            connection = _get_connection()
+            row = connection.execute(
+                "SELECT value, created_at FROM judgments WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > CACHE_TTL_SECONDS:
+                connection.execute("DELETE FROM judgments WHERE key = ?", (key,))
+                return None
+            connection.execute("UPDATE judgments SET accessed_at = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+    except sqlite3.Error as e:
+        print(f"Warning: judgment cache read failed: {str(e)}")
+        return None
+
+
+def put_cached(key, value):
+    """Store a successful judgment under `key`"""
+    global _writes_since_eviction
+    if not CACHE_ENABLED:
+        return
+    now = time.time()
+    try:
+        with _lock:
+            connection = _get_connection()
+            connection.execute(
+                "INSERT OR REPLACE INTO judgments (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), now, now),
+            )
+            _writes_since_eviction += 1
+            if _writes_since_eviction >= EVICTION_INTERVAL:
+                _writes_since_eviction = 0
+                _evict(connection, now)
+    except sqlite3.Error as e:
+        print(f"Warning: judgment cache write failed: {str(e)}")
+
+
+async def get_cached_async(key):
+    """get_cached for async callers; the SQLite read runs in a worker thread, off the event loop"""
+    if not CACHE_ENABLED:
+        return None
+    return await asyncio.to_thread(get_cached, key)
+
+
+async def put_cached_async(key, value):
+    """put_cached for async callers; the write (and any eviction it triggers) runs in a worker thread"""
+    if not CACHE_ENABLED:
+        return
+    await asyncio.to_thread(put_cached, key, value)
+
+
+def _evict(connection, now):
+    # Drop expired entries, then the least recently used ones beyond the size limit
+    connection.execute("DELETE FROM judgments WHERE created_at < ?", (now - CACHE_TTL_SECONDS,))
+    connection.execute(
+        "DELETE FROM judgments WHERE key IN ("
+        "SELECT key FROM judgments ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+        (CACHE_MAX_ENTRIES,),
+    )
+
+
+def clear_cache():
+    with _lock:
+        _get_connection().execute("DELETE FROM judgments")
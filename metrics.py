@@ -0,0 +1,255 @@
+# metrics.py
+
+import itertools
+
+import numpy as np
+import pandas as pd
+
+# Scores with at most this many distinct values are treated as categories, so
+# every metric comes from one contingency table instead of the raw rows
+MAX_CONTINGENCY_CELLS = 250000
+# Kappa and the confusion matrix are only meaningful for a small label set
+MAX_KAPPA_CATEGORIES = 50
+
+# Display name -> key in the dicts returned by pair_metrics
+METRICS = {
+    "Accuracy": "accuracy",
+    "Pearson Correlation": "pearson",
+    "Spearman Correlation": "spearman",
+    "Kendall's Tau": "kendall_tau",
+    "MAE": "mae",
+    "RMSE": "rmse",
+    "Cohen's Kappa": "cohen_kappa",
+    "Weighted Kappa": "weighted_kappa",
+}
+
+
+def to_numeric(series):
+    """Float array of a column, NaN where a value isn't a number (e.g. "Error" scores)"""
+    if pd.api.types.is_numeric_dtype(series.dtype) and not pd.api.types.is_bool_dtype(series.dtype):
+        return series.to_numpy(dtype=float, na_value=np.nan)
+    # Mixed object columns: convert each distinct value once instead of every row
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    numeric = pd.to_numeric(pd.Series(uniques, dtype=object), errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+    return np.append(numeric, np.nan)[codes]
+
+
+def to_numeric_columns(df, columns):
+    """Float matrix (rows × columns) of the given columns"""
+    if not columns:
+        return np.empty((len(df), 0))
+    return np.column_stack([to_numeric(df[column]) for column in columns])
+
+
+def factorize(values):
+    """Sorted distinct values and per-row codes (-1 for NaN)"""
+    codes, uniques = pd.factorize(values, sort=True, use_na_sentinel=True)
+    return codes, np.asarray(uniques, dtype=float)
+
+
+def _ratio(numerator, denominator):
+    """Elementwise numerator / denominator, NaN where the denominator is not positive"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(denominator > 0, numerator / np.where(denominator > 0, denominator, 1), np.nan)
+
+
+def _weighted_pearson(x, y, tables):
+    """Pearson correlation of the grid x[i] vs y[j] weighted by each table in `tables` (B × k × m)"""
+    n = tables.sum(axis=(1, 2))
+    x_weights, y_weights = tables.sum(axis=2), tables.sum(axis=1)
+    dx = x - _ratio((x_weights * x).sum(axis=1), n)[:, None]
+    dy = y - _ratio((y_weights * y).sum(axis=1), n)[:, None]
+    covariance = np.einsum("bk,bkm,bm->b", dx, tables, dy)
+    return _ratio(covariance, np.sqrt((x_weights * dx ** 2).sum(axis=1) * (y_weights * dy ** 2).sum(axis=1)))
+
+
+def _midranks(counts):
+    """Average rank of each category given the number of observations per category (B × k)"""
+    return np.cumsum(counts, axis=1) - counts + (counts + 1) / 2
+
+
+def _kendall_tau_b(tables):
+    """Kendall's tau-b of each contingency table, rows and columns in value order"""
+    batch, rows, columns = tables.shape
+    n = tables.sum(axis=(1, 2))
+    # Observations strictly below-right (concordant) and below-left (discordant) of each cell
+    below_right = np.zeros((batch, rows + 1, columns + 1))
+    below_right[:, :-1, :-1] = tables[:, ::-1, ::-1].cumsum(axis=1).cumsum(axis=2)[:, ::-1, ::-1]
+    below_left = np.zeros((batch, rows + 1, columns + 1))
+    below_left[:, :-1, 1:] = tables[:, ::-1, :].cumsum(axis=1)[:, ::-1, :].cumsum(axis=2)
+    concordant = (tables * below_right[:, 1:, 1:]).sum(axis=(1, 2))
+    discordant = (tables * below_left[:, 1:, :-1]).sum(axis=(1, 2))
+    pairs = n * (n - 1) / 2
+    row_totals, column_totals = tables.sum(axis=2), tables.sum(axis=1)
+    x_ties = (row_totals * (row_totals - 1) / 2).sum(axis=1)
+    y_ties = (column_totals * (column_totals - 1) / 2).sum(axis=1)
+    return _ratio(concordant - discordant, np.sqrt((pairs - x_ties) * (pairs - y_ties)))
+
+
+def _kappa(confusions, categories, weighted):
+    if len(categories) < 2:
+        return np.full(len(confusions), np.nan)
+    if weighted:
+        # Quadratic weights on the score values themselves
+        span = categories[-1] - categories[0]
+        weights = (categories[:, None] - categories[None, :]) ** 2 / span ** 2
+    else:
+        weights = 1.0 - np.eye(len(categories))
+    n = confusions.sum(axis=(1, 2))
+    expected = _ratio(confusions.sum(axis=2)[:, :, None] * confusions.sum(axis=1)[:, None, :], n[:, None, None])
+    return 1 - _ratio((weights * confusions).sum(axis=(1, 2)), (weights * expected).sum(axis=(1, 2)))
+
+
+def square_confusion(tables, x_values, y_values):
+    """Embed k × m tables into square tables over the union of both value sets"""
+    categories = np.union1d(x_values, y_values)
+    squares = np.zeros((len(tables), len(categories), len(categories)))
+    squares[:, np.searchsorted(categories, x_values)[:, None], np.searchsorted(categories, y_values)[None, :]] = tables
+    return squares, categories
+
+
+def table_metrics(tables, x_values, y_values, rows):
+    """Every metric for a batch of contingency tables (B × k × m) of x codes vs y codes.
+
+    `rows` is the number of rows each table was drawn from, including rows
+    with a missing score, since accuracy counts those as wrong.
+    """
+    n = tables.sum(axis=(1, 2))
+    distance = x_values[:, None] - y_values[None, :]
+    result = {
+        "accuracy": (tables * (distance == 0)).sum(axis=(1, 2)) / rows,
+        "pearson": _weighted_pearson(x_values, y_values, tables),
+        "spearman": _weighted_pearson(_midranks(tables.sum(axis=2)), _midranks(tables.sum(axis=1)), tables),
+        "kendall_tau": _kendall_tau_b(tables),
+        "mae": _ratio((tables * np.abs(distance)).sum(axis=(1, 2)), n),
+        "rmse": np.sqrt(_ratio((tables * distance ** 2).sum(axis=(1, 2)), n)),
+    }
+    if len(np.union1d(x_values, y_values)) <= MAX_KAPPA_CATEGORIES:
+        squares, categories = square_confusion(tables, x_values, y_values)
+        result["cohen_kappa"] = _kappa(squares, categories, weighted=False)
+        result["weighted_kappa"] = _kappa(squares, categories, weighted=True)
+    else:
+        result["cohen_kappa"] = result["weighted_kappa"] = np.full(len(tables), np.nan)
+    return result
+
+
+def contingency_tables(cells, size, replicates=1, weights=None):
+    """Count `cells` (codes into a flattened k × m table, -1 for missing) per replicate row, optionally weighted"""
+    cells = np.atleast_2d(cells)
+    offsets = np.arange(replicates)[:, None] * (size + 1)
+    # Missing rows land in an extra slot per replicate that is dropped afterwards
+    flat = np.where(cells >= 0, cells, size) + offsets
+    counts = np.bincount(flat.ravel(), weights=None if weights is None else np.ravel(weights), minlength=replicates * (size + 1))
+    return counts.reshape(replicates, size + 1)[:, :size]
+
+
+def pair_cells(x_factorized, y_factorized):
+    """Per-row cell index into the x-values × y-values contingency table, -1 where either score is missing"""
+    (x_codes, x_values), (y_codes, y_values) = x_factorized, y_factorized
+    return np.where((x_codes >= 0) & (y_codes >= 0), x_codes * len(y_values) + y_codes, -1)
+
+
+def is_categorical(x_factorized, y_factorized):
+    return len(x_factorized[1]) * len(y_factorized[1]) <= MAX_CONTINGENCY_CELLS
+
+
+def _average_ranks(values):
+    order = np.argsort(values, kind="mergesort")
+    ordered = values[order]
+    starts = np.flatnonzero(np.r_[True, ordered[1:] != ordered[:-1]])
+    counts = np.diff(np.r_[starts, len(ordered)])
+    ranks = np.empty(len(values))
+    ranks[order] = np.repeat(starts + (counts + 1) / 2, counts)
+    return ranks
+
+
+def _pearson(x, y):
+    if len(x) < 2 or x.std() == 0 or y.std() == 0:
+        return np.nan
+    return float(np.corrcoef(x, y)[0, 1])
+
+
+def continuous_metrics(x, y):
+    """Metrics for scores with too many distinct values for a contingency table"""
+    both = ~np.isnan(x) & ~np.isnan(y)
+    x_both, y_both = x[both], y[both]
+    if not both.any():
+        return {key: np.nan for key in METRICS.values()} | {"accuracy": 0.0 if len(x) else np.nan}
+    return {
+        "accuracy": float((x == y).sum() / len(x)),
+        "pearson": _pearson(x_both, y_both),
+        "spearman": _pearson(_average_ranks(x_both), _average_ranks(y_both)),
+        # Tie-aware tau and kappa need a contingency table
+        "kendall_tau": np.nan,
+        "mae": float(np.abs(x_both - y_both).mean()),
+        "rmse": float(np.sqrt(((x_both - y_both) ** 2).mean())),
+        "cohen_kappa": np.nan,
+        "weighted_kappa": np.nan,
+    }
+
+
+def pair_metrics(x, y, x_factorized=None, y_factorized=None):
+    """Every agreement metric between two float score arrays (x is the reference).
+
+    Accuracy is over all rows, so a missing score counts as wrong; the other
+    metrics use the rows where both scores are present. Returns the metrics
+    dict and, for categorical scores, the confusion matrix as a DataFrame.
+    """
+    x_factorized = x_factorized or factorize(x)
+    y_factorized = y_factorized or factorize(y)
+    cells = pair_cells(x_factorized, y_factorized)
+    result = {
+        "rows": len(x),
+        "pairs": int((cells >= 0).sum()),
+        "num_nan": int(np.isnan(y).sum()),
+    }
+    if not is_categorical(x_factorized, y_factorized):
+        result.update(continuous_metrics(x, y))
+        return result, None
+
+    # One bincount over the rows; everything else is computed on the k × m table
+    x_values, y_values = x_factorized[1], y_factorized[1]
+    tables = contingency_tables(cells, len(x_values) * len(y_values)).reshape(1, len(x_values), len(y_values))
+    result.update({key: float(value[0]) for key, value in table_metrics(tables, x_values, y_values, len(x)).items()})
+
+    confusion = None
+    if len(np.union1d(x_values, y_values)) <= MAX_KAPPA_CATEGORIES:
+        squares, categories = square_confusion(tables, x_values, y_values)
+        labels = [f"{value:g}" for value in categories]
+        confusion = pd.DataFrame(squares[0].astype(int), index=labels, columns=labels)
+    return result, confusion
+
+
+def prepare_columns(df, truth_column, score_columns):
+    """Numeric matrix of [truth, *score_columns] and each column factorized, shared by all analyses"""
+    values = to_numeric_columns(df, [truth_column, *score_columns])
+    return values, [factorize(values[:, index]) for index in range(values.shape[1])]
+
+
+def compute_metrics(df, truth_column, score_columns, prepared=None):
+    """Score every judge against the true labels, and every pair of judges against each other.
+
+    All columns are converted to numbers once and factorized once, and each
+    comparison is then one vectorized pass. Returns
+    `{"judges": {column: metrics}, "confusion": {column: DataFrame or None},
+    "agreement": [(column_a, column_b, metrics)]}`.
+    """
+    values, factorized = prepared or prepare_columns(df, truth_column, score_columns)
+    truth, truth_factorized = values[:, 0], factorized[0]
+
+    report = {"judges": {}, "confusion": {}, "agreement": []}
+    for index, column in enumerate(score_columns, start=1):
+        metrics, confusion = pair_metrics(truth, values[:, index], truth_factorized, factorized[index])
+        report["judges"][column] = metrics
+        report["confusion"][column] = confusion
+
+    for (index_a, column_a), (index_b, column_b) in itertools.combinations(enumerate(score_columns, start=1), 2):
+        metrics, _ = pair_metrics(values[:, index_a], values[:, index_b], factorized[index_a], factorized[index_b])
+        report["agreement"].append((column_a, column_b, metrics))
+    return report
+
+
+def format_metric(value):
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return "n/a"
+    return f"{value:.4f}" if isinstance(value, float) else str(value)
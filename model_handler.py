@@ -1,11 +1,88 @@
 # model_handler.py
 
+import asyncio
 import gradio as gr
 import json
+import numpy as np
 import os
 import re
-from get_llm_answer import get_model_response, parse_model_response, get_atla_response
-from jinja2 import Template
+from get_llm_answer import get_judgment_async, get_atla_response_async
+from evaluation_engine import (
+    evaluate_rows, find_duplicates, EvaluationProgress, DEFAULT_MAX_WORKERS, MAX_WORKERS_LIMIT, MAX_JUDGES
+)
+from resilience import get_provider_health
+from batch_runner import supports_batch, run_batch_evaluation
+from run_journal import RunJournal, make_run_key
+from paginated_table import PaginatedTable, TableSource
+from prompt_templates import build_contexts, get_template
+from sequential_sampling import SequentialEstimate, DEFAULT_TARGET_HALF_WIDTH
+from metrics import to_numeric
+from usage_tracker import RunUsage, ROW_FIELDS, current_job, track_run
+from tracing import span, run_in_span
+
+def format_provider_health():
+    """Summarise retries and circuit breaker state for providers that needed them"""
+    lines = []
+    for health in get_provider_health():
+        if health["retries"] or health["rejected"] or health["state"] != "closed":
+            lines.append(
+                f"- {health['organization']}: {health['retries']} retries, "
+                f"{health['failures']} failures, breaker {health['state']}"
+            )
+    return "\n".join(lines)
+
+
+# Minimum time between progress updates pushed to the browser during a run
+PROGRESS_UPDATE_SECONDS = 1.0
+
+
+def attach_result_columns(df, progress, positions=None):
+    """Attach score_<judge>/critique_<judge> columns from a run's columnar results.
+
+    With `positions`, only those rows are returned (as a copy) for live display;
+    otherwise the columns are set on `df` itself in one vectorized step per column.
+    """
+    if positions is not None:
+        df = df.iloc[positions].copy()
+    for name in progress.scores:
+        scores, critiques = progress.scores[name], progress.critiques[name]
+        if positions is not None:
+            scores, critiques = scores[positions], critiques[positions]
+        df[f'score_{name}'] = scores
+        df[f'critique_{name}'] = critiques
+    return df
+
+
+def attach_usage_columns(df, usage):
+    """Attach <field>_<judge> token, latency and cost columns for the calls made in this run"""
+    for column, values in usage.columns().items():
+        df[column] = values
+
+
+def judge_column_name(model_name):
+    """Snake-case suffix of a judge's score_/critique_ columns"""
+    return model_name.lower().replace(' ', '_').replace('-', '_').replace('.', '_')
+
+
+def drop_stale_judge_columns(df, judge_names):
+    """Remove result columns left by an earlier run whose judges aren't in this one"""
+    stale = [name for name in df.attrs.get("judges", []) if name not in judge_names]
+    prefixes = ('score', 'critique', *ROW_FIELDS)
+    df.drop(
+        columns=[
+            f'{prefix}_{name}' for name in stale for prefix in prefixes if f'{prefix}_{name}' in df.columns
+        ],
+        inplace=True,
+    )
+
+
+def consume_cancellation(future):
+    """Retrieve the outcome of an abandoned task so asyncio doesn't log it as unhandled"""
+    try:
+        future.exception()
+    except asyncio.CancelledError:
+        pass
+
 
 def select_evaluators(criteria_group, df_state, prompt_state, save_prompt_button):
     with gr.Group(visible=True) as model_selection_group:
@@ -31,39 +108,73 @@ def select_evaluators(criteria_group, df_state, prompt_state, save_prompt_button
             return model_data
 
         model_data = load_model_data()
-        model_choices = list(model_data.keys())
+        # Selene is always Judge A and answers in its own format, so Atla models aren't offered as other judges
+        model_choices = [name for name, model in model_data.items() if model["organization"] != "Atla"]
 
         with gr.Row(visible=False) as evaluator_row:
                judge_a_dropdown = gr.Dropdown(
                    choices=["Selene"], label="Judge A", value="Selene", interactive=False
                )
-               judge_b_dropdown = gr.Dropdown(
-                   choices=model_choices, label="Judge B", value="Claude 3.5 Sonnet"
+               judge_models_dropdown = gr.Dropdown(
+                   choices=model_choices,
+                   label="Other judges",
+                   value=["Claude 3.5 Sonnet"],
+                   multiselect=True,
+                   max_choices=MAX_JUDGES - 1,
+               )
+               max_workers_slider = gr.Slider(
+                   minimum=1,
+                   maximum=MAX_WORKERS_LIMIT,
+                   value=DEFAULT_MAX_WORKERS,
+                   step=1,
+                   label="Concurrent requests",
+               )
+               use_cache_checkbox = gr.Checkbox(
+                   label="Reuse cached judgments", value=True
+               )
+               deduplicate_checkbox = gr.Checkbox(
+                   label="Judge identical rows once", value=True
+               )
+               batch_mode_checkbox = gr.Checkbox(
+                   label="Batch mode (OpenAI / Anthropic judges, slower but cheaper for large datasets)",
+                   value=False,
+               )
+               estimate_mode_checkbox = gr.Checkbox(
+                   label="Estimate mode (judge a stratified sample until accuracy is precise enough)",
+                   value=False,
+               )
+               target_precision_number = gr.Number(
+                   label="Target precision (± accuracy)",
+                   value=DEFAULT_TARGET_HALF_WIDTH,
+                   minimum=0.001,
+                   maximum=0.5,
+                   step=0.005,
+               )
+               row_budget_number = gr.Number(
+                   label="Row budget (0 = no limit)", value=0, minimum=0, precision=0
                )
 
         loading_spinner = gr.Markdown("Evaluation in progress...", visible=False)
 
-        evaluation_result_df = gr.Dataframe(
-            visible=False,
-            label="Evaluation Results",
-            elem_classes=["truncate_cells"]
-        )
+        results_table = PaginatedTable("Evaluation Results")
 
         with gr.Row(visible=False) as evaluation_nav_row:
             back_to_criteria_button = gr.Button("← Back to Criteria", visible=False)
             run_evaluation_button = gr.Button("Run Evaluation", visible=False)
+            resume_evaluation_button = gr.Button("Resume Evaluation", visible=False)
             analyze_results_button = gr.Button("Analyze Results", visible=False)
 
-        def show_evaluator_selection(current_df):
+        def show_evaluator_selection(current_df, table_view):
             updates = {
                 criteria_group: gr.update(visible=False),
                 save_prompt_button: gr.update(visible=False),
                 evaluator_row: gr.update(visible=True),
                 evaluation_nav_row: gr.update(visible=True),
                 run_evaluation_button: gr.update(visible=True),
+                resume_evaluation_button: gr.update(visible=True),
                 back_to_criteria_button: gr.update(visible=True),
                 analyze_results_button: gr.update(visible=False),
-                evaluation_result_df: gr.update(visible=False),
+                **results_table.hide(),
             }
             if (
                 current_df.value is not None
@@ -71,24 +182,25 @@ def select_evaluators(criteria_group, df_state, prompt_state, save_prompt_button
                 and current_df.value.attrs.get("eval_done")
             ):
                 updates[loading_spinner] = gr.update(value="### Evaluation Complete", visible=True)
-                updates[evaluation_result_df] = gr.update(value=current_df.value, visible=True)
+                updates.update(results_table.show(table_view, current_df.value))
                 updates[analyze_results_button] = gr.update(visible=True)
 
             return updates
 
         save_prompt_button.click(
             fn=show_evaluator_selection,
-            inputs=[df_state],
+            inputs=[df_state, results_table.view],
             outputs=[
                 save_prompt_button,
                 criteria_group,
                 evaluator_row,
                 evaluation_nav_row,
                 run_evaluation_button,
+                resume_evaluation_button,
                 back_to_criteria_button,
                 loading_spinner,
                 analyze_results_button,
-                evaluation_result_df,
+                *results_table.outputs,
             ],
         )
 
@@ -99,9 +211,10 @@ def select_evaluators(criteria_group, df_state, prompt_state, save_prompt_button
                 evaluator_row: gr.update(visible=False),
                 evaluation_nav_row: gr.update(visible=False),
                 run_evaluation_button: gr.update(visible=False),
+                resume_evaluation_button: gr.update(visible=False),
                 loading_spinner: gr.update(visible=False),
                 analyze_results_button: gr.update(visible=False),
-                evaluation_result_df: gr.update(visible=False),
+                **results_table.hide(),
             }
 
         back_to_criteria_button.click(
@@ -113,109 +226,332 @@ def select_evaluators(criteria_group, df_state, prompt_state, save_prompt_button
                 evaluator_row,
                 evaluation_nav_row,
                 run_evaluation_button,
+                resume_evaluation_button,
                 loading_spinner,
                 analyze_results_button,
-                evaluation_result_df
+                *results_table.outputs,
             ],
         )
 
         # Run evaluation
-        def run_evaluation(judge_a, judge_b):
+        async def run_evaluation(judge_a, judge_models, max_workers, use_cache, deduplicate, batch_mode,
+                                 estimate_mode, target_precision, row_budget, table_view, resume=False):
             # 1) Immediately hide old results and disable navigation while running
             yield {
                 loading_spinner: gr.update(value="Evaluation in progress...", visible=True),
-                evaluation_result_df: gr.update(visible=False),
+                **results_table.hide(),
                 analyze_results_button: gr.update(visible=False),
                 run_evaluation_button: gr.update(interactive=False),
+                resume_evaluation_button: gr.update(interactive=False),
                 back_to_criteria_button: gr.update(interactive=False),
             }
 
+            # Estimate mode measures accuracy, so it needs the true label mapped in the criteria step
+            label_column = df_state.value.attrs.get("label_column")
+            if estimate_mode and label_column not in df_state.value.columns:
+                yield {
+                    loading_spinner: gr.update(
+                        value="**Error:** Estimate mode needs a true label column. Map one in the criteria step.",
+                        visible=True,
+                    ),
+                    run_evaluation_button: gr.update(interactive=True),
+                    resume_evaluation_button: gr.update(interactive=True),
+                    back_to_criteria_button: gr.update(interactive=True),
+                }
+                return
+
             # Perform the actual evaluation
             template_str = prompt_state.value['template']
             mappings = prompt_state.value['mappings']
             evaluation_criteria = mappings.get('evaluation_criteria')
 
-            template = Template(template_str)
-
-            for index, row in df_state.value.iterrows():
-                context = {}
-                model_context = None
-                expected_output = None
-
-                for key, column in mappings.items():
-                    if key == 'evaluation_criteria':
-                        continue
-                    elif column and column != 'None':
-                        context[key] = str(row[column])
-                        if column == 'model_context':
-                            model_context = str(row[column])
-                        elif column == 'expected_model_output':
-                            expected_output = str(row[column])
-
-                context['evaluation_criteria'] = evaluation_criteria
-
-                # Render the template for Judge B
-                current_prompt = template.render(**context)
-                print(f"\nDEBUG - Final Prompt sent to Model B:\n{current_prompt}\n")
-                response_a = get_atla_response(
-                    "atla-selene",
-                    model_input=context.get('model_input'),
-                    model_output=context.get('model_output'),
-                    model_context=model_context,
-                    expected_output=expected_output,
-                    evaluation_criteria=evaluation_criteria
-                )
-                response_b = get_model_response(
-                    judge_b,
-                    model_data.get(judge_b),
-                    current_prompt
-                )
-
-                # Parse ATLA response
-                if isinstance(response_a, dict):
-                    score_a, critique_a = response_a['score'], response_a['critique']
+            # Column name -> model name for every selected judge, in selection order
+            judge_models = {judge_column_name(model): model for model in judge_models or []}
+            judge_names = ["selene", *judge_models]
+            run_key = make_run_key(df_state.value, template_str, mappings, judge_names)
+            # Every finished call is journaled so an interrupted run can be resumed. A fresh run always
+            # starts a journal of its own; Resume continues the newest one for the same data, prompt and judges
+            journal = (RunJournal.latest(run_key) if resume else None) or RunJournal.new(run_key)
+            run_id = journal.run_id
+
+            # Spans of this run nest under it. It is ended explicitly since the run yields between steps,
+            # and whatever stops the run ends it too, so none of its child spans are left orphaned
+            run_span = span(
+                "run_evaluation", run_id=run_id, rows=len(df_state.value), judges=len(judge_names),
+                estimate_mode=bool(estimate_mode), batch_mode=bool(batch_mode), resume=bool(resume),
+            )
+
+            try:
+                with span("render_prompts", parent=run_span):
+                    # Compiled once per distinct template and shared with every other run
+                    template = get_template(template_str)
+
+                    row_contexts = build_contexts(
+                        df_state.value, mappings, {'evaluation_criteria': evaluation_criteria}
+                    )
+
+                    # Each row's prompt is rendered once and shared by all judges
+                    prompts = template.render_many(row_contexts) if judge_models else []
+                rows = list(zip(row_contexts, prompts)) if prompts else [(context, None) for context in row_contexts]
+
+                async def judge_with_selene(row):
+                    context, _ = row
+                    response_a = await get_atla_response_async(
+                        "atla-selene",
+                        model_input=context.get('model_input'),
+                        model_output=context.get('model_output'),
+                        model_context=context.get('model_context'),
+                        expected_output=context.get('expected_model_output'),
+                        evaluation_criteria=evaluation_criteria,
+                        use_cache=use_cache
+                    )
+                    # Parse ATLA response
+                    if isinstance(response_a, dict):
+                        return response_a['score'], response_a['critique']
+                    return "Error", response_a
+
+                def make_model_judge(model):
+                    async def judge_with_model(row):
+                        _, prompt = row
+                        # Unparseable replies are re-asked for the JSON object before counting as errors
+                        return await get_judgment_async(model, model_data.get(model), prompt, use_cache=use_cache)
+                    return judge_with_model
+
+                # Batch APIs take hours per submission, too slow for a batch-by-batch estimate
+                batch_judges = [
+                    name for name, model in judge_models.items()
+                    if batch_mode and not estimate_mode and model_data.get(model) and supports_batch(model_data[model]["organization"])
+                ]
+                batch_status = {}
+                if batch_mode and estimate_mode:
+                    batch_status["estimate"] = "Batch mode is not used in estimate mode."
+                elif batch_mode:
+                    for name, model in judge_models.items():
+                        if name not in batch_judges:
+                            batch_status[name] = f"Batch mode is not available for {model}, running it interactively."
+
+                # Rows whose mapped fields (and so their rendered prompt) are identical are judged once
+                keys = [tuple(context.values()) for context in row_contexts] if deduplicate else None
+                duplicates = find_duplicates(keys) if deduplicate and not estimate_mode else {}
+
+                display_names = {"selene": "Selene", **judge_models}
+                progress = EvaluationProgress(len(row_contexts), judge_names)
+                # Tokens, latency and cost of every judge call made by this run
+                usage = RunUsage(len(row_contexts), judge_names)
+
+                estimate = None
+                if estimate_mode:
+                    estimate = SequentialEstimate(
+                        to_numeric(df_state.value[label_column]),
+                        judge_names,
+                        target_half_width=float(target_precision or DEFAULT_TARGET_HALF_WIDTH),
+                        budget=int(row_budget or 0),
+                    )
+                    progress.planned_rows = estimate.budget
+
+                if resume:
+                    for name, position, score, critique in journal.load():
+                        if name in progress.scores and position < len(row_contexts):
+                            progress.record(name, position, (score, critique))
+                    for name in judge_names:
+                        for position, positions in duplicates.items():
+                            if progress.recorded[name][position]:
+                                progress.fan_out(name, position, positions, count_saved=False)
+                    progress.mark_restored()
+                # Provider batches an interrupted run submitted are polled again rather than resubmitted
+                submitted_batches = journal.load_batches() if resume else {}
+                journal.open()
+
+                # Selene has no batch API, so it always runs through the interactive engine.
+                # The engine queues (row, judge) jobs row by row, so every judge of a row runs concurrently.
+                judges = {"selene": judge_with_selene}
+                for name, model in judge_models.items():
+                    if name not in batch_judges:
+                        judges[name] = make_model_judge(model)
+                if estimate is None:
+                    tasks = [evaluate_rows(
+                        rows, judges, max_workers=max_workers, progress=progress, on_result=journal.append,
+                        duplicates=duplicates,
+                    )]
                 else:
-                    score_a, critique_a = "Error", response_a
+                    async def judge_until_precise():
+                        # One stratified batch at a time, re-estimating after each
+                        while not estimate.done:
+                            batch = estimate.next_batch()
+                            batch_duplicates = {
+                                batch[first]: [batch[other] for other in others]
+                                for first, others in find_duplicates(keys[position] for position in batch).items()
+                            } if deduplicate else {}
+                            await evaluate_rows(
+                                rows, judges, max_workers=max_workers, progress=progress, on_result=journal.append,
+                                duplicates=batch_duplicates, positions=batch,
+                            )
+                            estimate.update(progress.scores)
+
+                    tasks = [judge_until_precise()]
 
-                score_b, critique_b = parse_model_response(response_b)
+                repeated = {position for positions in duplicates.values() for position in positions}
 
-                # Convert model name to snake case for column names
-                model_b_snake = judge_b.lower().replace(' ', '_').replace('-', '_').replace('.', '_')
+                async def judge_in_batch(name):
+                    pending = [
+                        (position, prompt)
+                        for position, prompt in enumerate(prompts)
+                        if position not in repeated and not progress.recorded[name][position]
+                    ]
+                    if not pending:
+                        return
+                    batch_ids = [batch_id for batch_id, _ in submitted_batches.get(name, [])]
 
-                df_state.value.loc[index, 'score_selene'] = score_a
-                df_state.value.loc[index, 'critique_selene'] = critique_a
-                df_state.value.loc[index, f'score_{model_b_snake}'] = score_b
-                df_state.value.loc[index, f'critique_{model_b_snake}'] = critique_b
+                    def journal_batch(batch_id, positions):
+                        # Journaled as soon as it exists, so a restart mid-batch doesn't pay for it twice
+                        batch_ids.append(batch_id)
+                        journal.append_batch(name, batch_id, positions)
 
-            import time
-            time.sleep(2)  # simulating time-consuming operations
+                    with span("run_batch_evaluation", judge=name, rows=len(pending)):
+                        replies = await run_batch_evaluation(
+                            model_data[judge_models[name]],
+                            pending,
+                            on_status=lambda text: batch_status.update({name: f"{judge_models[name]}: {text}"}),
+                            submitted=submitted_batches.get(name, ()),
+                            on_submit=journal_batch,
+                            judge=name,
+                        )
+                    prompt_at = dict(pending)
 
-            # 2) Hide spinner
-            yield {loading_spinner: gr.update(visible=False)}
+                    async def judge_reply(position, reply):
+                        # Re-asks of unparseable replies are booked against this judge and row
+                        current_job.set((name, position))
+                        return await get_judgment_async(
+                            judge_models[name], model_data[judge_models[name]], prompt_at[position],
+                            use_cache=use_cache, reply=reply,
+                        )
+
+                    judgments = await asyncio.gather(*(
+                        judge_reply(position, reply) for position, reply in replies.items()
+                    ))
+                    for position, judgment in zip(replies, judgments):
+                        progress.record(name, position, judgment)
+                        for filled in [position, *progress.fan_out(name, position, duplicates.get(position, ()))]:
+                            journal.append(
+                                name, filled, progress.scores[name][filled], progress.critiques[name][filled]
+                            )
+                    for batch_id in batch_ids:
+                        journal.finish_batch(name, batch_id)
+
+                tasks.extend(judge_in_batch(name) for name in batch_judges)
+                evaluation = asyncio.gather(*(run_in_span(run_span, track_run(usage, task)) for task in tasks))
+
+                # Stream throttled progress and the rows finished so far until the run is done
+                try:
+                    while True:
+                        done, _ = await asyncio.wait({evaluation}, timeout=PROGRESS_UPDATE_SECONDS)
+                        if done:
+                            break
+                        yield {
+                            loading_spinner: gr.update(
+                                value="\n\n".join([
+                                    progress.summary(),
+                                    usage.progress_line(),
+                                    *([estimate.summary(display_names)] if estimate else []),
+                                    *batch_status.values(),
+                                ]),
+                                visible=True,
+                            ),
+                            # Only the visible page of finished rows is built and sent
+                            # The session's view is shared with its page buttons, so paging during the run sticks
+                            **results_table.show(table_view, TableSource(
+                                df_state.value,
+                                np.flatnonzero(progress.completed_mask),
+                                lambda positions: attach_result_columns(df_state.value, progress, positions),
+                            ), keep_page=True),
+                        }
+                finally:
+                    # Stop issuing judge calls if the browser goes away mid-run
+                    if not evaluation.done():
+                        evaluation.cancel()
+                        evaluation.add_done_callback(consume_cancellation)
+                    journal.close()
+                evaluation.result()
+
+                with span("write_results", parent=run_span):
+                    # Results are already in the original row order
+                    drop_stale_judge_columns(df_state.value, judge_names)
+                    attach_result_columns(df_state.value, progress)
+                    attach_usage_columns(df_state.value, usage)
+                df_state.value.attrs["usage_summary"] = usage.summary(display_names)
+                # Lets the analysis pick up exactly this run's judges, under their model names
+                df_state.value.attrs["judges"] = judge_names
+                df_state.value.attrs["judge_display_names"] = display_names
+                # The analysis of an estimate covers only the sampled rows
+                if estimate is not None:
+                    df_state.value.attrs["sampled_positions"] = np.sort(estimate.positions)
+                    progress.planned_rows = progress.completed_rows
+                else:
+                    df_state.value.attrs.pop("sampled_positions", None)
+
+                completion_message = f"### Evaluation Complete\n{progress.summary()}\n\n{usage.progress_line()}"
+                if estimate is not None:
+                    completion_message += f"\n\n{estimate.summary(display_names, finished=True)}"
+                provider_health = format_provider_health()
+                if provider_health:
+                    completion_message += f"\n{provider_health}"
+                run_span.set_attributes(completed_rows=progress.completed_rows, errors=progress.errors)
+                run_span.end()
+            except (GeneratorExit, asyncio.CancelledError):
+                # The browser went away mid-run
+                run_span.end(error="cancelled")
+                raise
+            except Exception as e:
+                run_span.end(error=f"{type(e).__name__}: {e}")
+                raise
 
             # 3) Show final results and re-enable buttons
             yield {
-                loading_spinner: gr.update(value="### Evaluation Complete", visible=True),
-                evaluation_result_df: gr.update(value=df_state.value, visible=True),
+                loading_spinner: gr.update(value=completion_message, visible=True),
+                **results_table.show(
+                    table_view, TableSource(df_state.value, df_state.value.attrs.get("sampled_positions")), keep_page=True
+                ),
                 analyze_results_button: gr.update(visible=True),
                 run_evaluation_button: gr.update(interactive=True),
+                resume_evaluation_button: gr.update(interactive=True),
                 back_to_criteria_button: gr.update(interactive=True),
             }
 
             if hasattr(df_state.value, "attrs"):
                 df_state.value.attrs["eval_done"] = True
 
+        # Resume skips every judge call already journaled for the same data, prompt and judges
+        async def resume_evaluation(judge_a, judge_models, max_workers, use_cache, deduplicate, batch_mode,
+                                    estimate_mode, target_precision, row_budget, table_view):
+            async for update in run_evaluation(
+                judge_a, judge_models, max_workers, use_cache, deduplicate, batch_mode,
+                estimate_mode, target_precision, row_budget, table_view, resume=True
+            ):
+                yield update
+
         # Include back_to_criteria_button & run_evaluation_button in outputs so we can update them
+        evaluation_inputs = [
+            judge_a_dropdown, judge_models_dropdown, max_workers_slider, use_cache_checkbox, deduplicate_checkbox,
+            batch_mode_checkbox, estimate_mode_checkbox, target_precision_number, row_budget_number,
+            results_table.view,
+        ]
+        evaluation_outputs = [
+            loading_spinner,
+            *results_table.outputs,
+            analyze_results_button,
+            run_evaluation_button,
+            resume_evaluation_button,
+            back_to_criteria_button,
+        ]
         run_evaluation_button.click(
             fn=run_evaluation,
-            inputs=[judge_a_dropdown, judge_b_dropdown],
-            outputs=[
-                loading_spinner,
-                evaluation_result_df,
-                analyze_results_button,
-                run_evaluation_button,
-                back_to_criteria_button,
-            ],
+            inputs=evaluation_inputs,
+            outputs=evaluation_outputs,
+        )
+        resume_evaluation_button.click(
+            fn=resume_evaluation,
+            inputs=evaluation_inputs,
+            outputs=evaluation_outputs,
         )
 
     return model_selection_group, df_state, analyze_results_button
\ No newline at end of file
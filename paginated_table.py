@@ -0,0 +1,143 @@
+# paginated_table.py
+
+import os
+
+import gradio as gr
+import numpy as np
+
+# Rows sent to the browser per page, and characters kept per cell in the table
+PAGE_SIZE = int(os.getenv("TABLE_PAGE_SIZE", "50"))
+MAX_CELL_CHARS = int(os.getenv("TABLE_MAX_CELL_CHARS", "200"))
+
+
+def truncate_cell(value, max_chars=MAX_CELL_CHARS):
+    if isinstance(value, str) and len(value) > max_chars:
+        return value[:max_chars] + "…"
+    return value
+
+
+def truncate_cells(df, max_chars=MAX_CELL_CHARS):
+    """Shorten long text cells so a page stays small; numeric columns are left as they are"""
+    df = df.copy()
+    for column in df.select_dtypes(include=["object", "string"]).columns:
+        df[column] = df[column].map(lambda value: truncate_cell(value, max_chars))
+    return df
+
+
+class TableSource:
+    """Rows of a DataFrame, optionally restricted to `positions`, built one page at a time.
+
+    `rows_for(positions)` returns the DataFrame rows to show for an array of row
+    positions; by default it's a plain `iloc` lookup, but a running evaluation
+    passes a function that attaches the results collected so far.
+    """
+
+    def __init__(self, df, positions=None, rows_for=None):
+        self.df = df
+        self.positions = positions
+        self.rows_for = rows_for or (lambda positions: df.iloc[positions])
+
+    def __len__(self):
+        if self.df is None:
+            return 0
+        return len(self.df) if self.positions is None else len(self.positions)
+
+    def rows(self, start, stop):
+        stop = min(stop, len(self))
+        if self.positions is None:
+            positions = np.arange(start, stop)
+        else:
+            positions = self.positions[start:stop]
+        return self.rows_for(positions)
+
+
+class TableView:
+    """What one browser session sees in a PaginatedTable: its data source and current page"""
+
+    def __init__(self):
+        self.source = TableSource(None)
+        self.page = 0
+
+
+class PaginatedTable:
+    """A Dataframe that only ever holds one page of truncated cells.
+
+    The full data stays on the server: Previous/Next fetch another page, and
+    selecting a cell loads its full text into a box below the table. The
+    component is shared by every session, so each session's source and page
+    live in its own `view` state, which handlers pass to show().
+    """
+
+    def __init__(self, label):
+        with gr.Column(visible=False) as self.container:
+            self.table = gr.Dataframe(label=label, elem_classes=["truncate_cells"], interactive=False)
+            with gr.Row():
+                self.previous_button = gr.Button("‹ Previous page", size="sm")
+                self.page_info = gr.Markdown()
+                self.next_button = gr.Button("Next page ›", size="sm")
+            self.cell_text = gr.Textbox(label="Selected cell", lines=6, interactive=False, visible=False)
+        # Copied for every session when it starts
+        self.view = gr.State(TableView())
+
+        self.previous_button.click(
+            fn=self.previous_page, inputs=[self.view], outputs=[self.table, self.page_info, self.view]
+        )
+        self.next_button.click(fn=self.next_page, inputs=[self.view], outputs=[self.table, self.page_info, self.view])
+        self.table.select(fn=self.show_cell, inputs=[self.view], outputs=[self.cell_text])
+
+    @property
+    def outputs(self):
+        """Components to list as outputs of handlers that return show()/hide() updates"""
+        return [self.container, self.table, self.page_info, self.cell_text, self.view]
+
+    @staticmethod
+    def page_count(view):
+        return max(1, -(-len(view.source) // PAGE_SIZE))
+
+    def _page_updates(self, view, page):
+        view.page = min(max(page, 0), self.page_count(view) - 1)
+        start = view.page * PAGE_SIZE
+        rows = view.source.rows(start, start + PAGE_SIZE)
+        total = len(view.source)
+        info = (
+            f"Page {view.page + 1} of {self.page_count(view)} · "
+            f"rows {start + 1 if total else 0}–{start + len(rows)} of {total} "
+            "· select a cell to see its full text"
+        )
+        return {
+            self.table: gr.update(value=truncate_cells(rows)),
+            self.page_info: gr.update(value=info),
+            self.view: view,
+        }
+
+    def show(self, view, source, keep_page=False, label=None):
+        """Updates that display `source` (a DataFrame or TableSource) in a session's `view`,
+        on page 1 unless `keep_page`"""
+        if not isinstance(source, TableSource):
+            source = TableSource(source)
+        view.source = source
+        updates = self._page_updates(view, view.page if keep_page else 0)
+        if label is not None:
+            updates[self.table] = gr.update(value=updates[self.table]["value"], label=label)
+        updates[self.container] = gr.update(visible=True)
+        if not keep_page:
+            updates[self.cell_text] = gr.update(value="", visible=False)
+        return updates
+
+    def previous_page(self, view):
+        return self._page_updates(view, view.page - 1)
+
+    def next_page(self, view):
+        return self._page_updates(view, view.page + 1)
+
+    def hide(self):
+        return {self.container: gr.update(visible=False)}
+
+    def show_cell(self, view, evt: gr.SelectData):
+        row, column = evt.index
+        position = view.page * PAGE_SIZE + row
+        rows = view.source.rows(position, position + 1)
+        if len(rows) == 0:
+            return gr.update(visible=False)
+        value = rows.iloc[0, column]
+        return gr.update(value=str(value), label=f"Selected cell · {rows.columns[column]}", visible=True)
@@ -0,0 +1,119 @@
+# prompt_templates.py
+
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+import jinja2
+from jinja2 import meta
+
+# Compiled templates kept in memory, keyed by the hash of their source
+TEMPLATE_CACHE_SIZE = int(os.getenv("TEMPLATE_CACHE_SIZE", "128"))
+
+# `{{ name }}` placeholders, as written in the arena's plain prompts
+VARIABLE_PATTERN = re.compile(r"{{(.*?)}}")
+
+# One environment for every tab; its own parse cache is off because compiled
+# templates are cached below by source hash
+environment = jinja2.Environment(cache_size=0, auto_reload=False)
+
+_templates = OrderedDict()
+_lock = threading.Lock()
+
+
+def template_hash(source):
+    return hashlib.sha256(source.encode("utf-8")).hexdigest()
+
+
+class PromptTemplate:
+    """A compiled Jinja template with its variables worked out once.
+
+    `variables` are the names the template reads from its context, so
+    callers can build contexts with only those keys.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.hash = template_hash(source)
+        self.variables = frozenset(meta.find_undeclared_variables(environment.parse(source)))
+        self.template = environment.from_string(source)
+
+    def render(self, context):
+        return self.template.render(context)
+
+    def render_many(self, contexts):
+        """Render a prompt per context, in order"""
+        render = self.template.render
+        return [render(context) for context in contexts]
+
+
+def get_template(source):
+    """The compiled template for `source`, compiling it on first use"""
+    key = template_hash(source)
+    with _lock:
+        template = _templates.get(key)
+        if template is not None:
+            _templates.move_to_end(key)
+            return template
+    template = PromptTemplate(source)
+    with _lock:
+        _templates[key] = template
+        while len(_templates) > TEMPLATE_CACHE_SIZE:
+            _templates.popitem(last=False)
+    return template
+
+
+def render_prompt(source, context):
+    return get_template(source).render(context)
+
+
+def build_contexts(df, mappings, constants=None):
+    """Per-row template contexts for a DataFrame, built column by column.
+
+    `mappings` maps a template variable to a column ("None" or empty for
+    unmapped) and `constants` adds values shared by every row. Cells are
+    converted with str(), as the per-row loop this replaces did.
+    """
+    constants = constants or {}
+    columns = {
+        key: [str(value) for value in df[column].tolist()]
+        for key, column in mappings.items()
+        if key not in constants and column and column != 'None'
+    }
+    keys = list(columns)
+    return [
+        {**dict(zip(keys, values)), **constants}
+        for values in zip(*columns.values())
+    ] if keys else [dict(constants) for _ in range(len(df))]
+
+
+def render_dataframe(source, df, mappings, constants=None):
+    """Render `source` once per row of `df`, reading only the mapped columns the template uses"""
+    template = get_template(source)
+    used = {key: column for key, column in mappings.items() if key in template.variables}
+    return template.render_many(build_contexts(df, used, constants))
+
+
+@lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def _parse_variables(prompt):
+    seen = set()
+    variables = []
+    for variable in VARIABLE_PATTERN.findall(prompt):
+        variable = variable.strip()
+        if variable not in seen:
+            seen.add(variable)
+            variables.append(variable)
+    return tuple(variables)
+
+
+def parse_variables(prompt):
+    """Names of the `{{ name }}` placeholders in a prompt, in order of first use"""
+    return list(_parse_variables(prompt))
+
+
+def substitute_variables(prompt, values):
+    """Fill `{{name}}` placeholders in one pass; unknown placeholders are left as they are"""
+    return VARIABLE_PATTERN.sub(lambda match: values.get(match.group(1), match.group(0)), prompt)
@@ -1,12 +1,11 @@
 import json
-import re
 import gradio as gr
 
 from dotenv import load_dotenv
 load_dotenv()
 
 from .gen_api_answer import (
-    get_atla_response
+    get_atla_response_async
 )
 
 from .prompts import (
@@ -16,37 +15,37 @@ from .prompts import (
 )
 
 from .random_sample_generation import (
-    get_random_human_ai_pair,
-    get_random_human_ai_ground_truth_pair,
-    generate_ai_response
-)   
+    get_random_human_ai_pair_async,
+    get_random_human_ai_ground_truth_pair_async,
+    generate_ai_response_async
+)
+
+from .sample_pool import get_sample_pool
 
 from common import CSS_STYLES, MAIN_TITLE, HOW_IT_WORKS
+from prompt_templates import parse_variables, substitute_variables
 
-def parse_variables(prompt):
-    # Extract variables enclosed in double curly braces
-    variables = re.findall(r"{{(.*?)}}", prompt)
-    # Remove duplicates while preserving order
-    seen = set()
-    variables = [
-        x.strip() for x in variables if not (x.strip() in seen or seen.add(x.strip()))
-    ]
-    return variables
+def get_final_prompt(eval_prompt, variable_values):
+    # Replace variables in the eval prompt with their values, in a single pass
+    return substitute_variables(eval_prompt, variable_values)
 
 
-def get_final_prompt(eval_prompt, variable_values):
-    # Replace variables in the eval prompt with their values
-    for var, val in variable_values.items():
-        eval_prompt = eval_prompt.replace("{{" + var + "}}", val)
-    return eval_prompt
+async def get_random_example(with_ground_truth):
+    """Take a pre-generated example from the pool, generating one live if the pool is empty."""
+    sample = get_sample_pool().take(with_ground_truth)
+    if sample is not None:
+        return sample
+    if with_ground_truth:
+        return await get_random_human_ai_ground_truth_pair_async()
+    return await get_random_human_ai_pair_async()
 
 
-def populate_random_example(request: gr.Request, compatible_mode: bool):
+async def populate_random_example(request: gr.Request, compatible_mode: bool):
     """Generate a random human-AI conversation example and reset judge outputs."""
     if compatible_mode:
-        human_msg, ai_msg, ground_truth_msg = get_random_human_ai_ground_truth_pair()
+        human_msg, ai_msg, ground_truth_msg = await get_random_example(True)
     else:
-        human_msg, ai_msg = get_random_human_ai_pair()
+        human_msg, ai_msg = await get_random_example(False)
         ground_truth_msg = ""
     
     return [
@@ -60,6 +59,9 @@ def populate_random_example(request: gr.Request, compatible_mode: bool):
 
 
 def create_arena_interface():
+    # Start pre-generating random samples so page loads and 🎲 clicks don't wait on an LLM
+    get_sample_pool()
+
     with gr.Blocks(theme="default", css=CSS_STYLES) as interface:
         # Hidden eval prompt that will always contain DEFAULT_EVAL_PROMPT
         eval_prompt = gr.Textbox(
@@ -209,9 +211,9 @@ def create_arena_interface():
         )
 
         # Function to toggle visibility based on compatible mode
-        def toggle_use_reference(checked):
+        async def toggle_use_reference(checked):
             if checked:
-                human_msg, ai_msg, ground_truth_msg = get_random_human_ai_ground_truth_pair()
+                human_msg, ai_msg, ground_truth_msg = await get_random_example(True)
                 return {
                     ground_truth: gr.update(visible=True, value=ground_truth_msg),
                     human_input: gr.update(value=human_msg),
@@ -243,7 +245,7 @@ def create_arena_interface():
         first_game_state = gr.State(True)  # Initialize as True
 
         # Update the submit function to handle both models
-        def submit_and_store(
+        async def submit_and_store(
             model_choice,
             use_reference,
             eval_criteria_text,
@@ -266,7 +268,7 @@ def create_arena_interface():
             # Use appropriate model ID based on selection
             model_id = "atla-selene-mini" if model_choice == "Selene Mini" else "atla-selene"
             
-            response = get_atla_response(
+            response = await get_atla_response_async(
                 model_name=model_id,
                 prompt=prompt_data,
                 max_tokens=500,
@@ -335,14 +337,18 @@ def create_arena_interface():
             outputs=[send_btn, random_btn]
         )
 
-        generate_btn.click(
-            fn=lambda msg: (
-                generate_ai_response(msg)[0],  # Only take the response text
+        async def generate_and_disable(msg):
+            response, _ = await generate_ai_response_async(msg)
+            return (
+                response,  # Only take the response text
                 gr.update(
                     value="Generate AI Response",  # Keep the label
                     interactive=False  # Disable the button
                 )
-            ),
+            )
+
+        generate_btn.click(
+            fn=generate_and_disable,
             inputs=[human_input],
             outputs=[ai_response, generate_btn]
         )
@@ -354,8 +360,11 @@ def create_arena_interface():
         )
 
         # Update the demo.load to include the random example population
+        async def populate_initial_example():
+            return await populate_random_example(None, False)  # Pass False for initial compatible_mode
+
         interface.load(
-            fn=lambda: populate_random_example(None, False),  # Pass False for initial compatible_mode
+            fn=populate_initial_example,
             inputs=[],
             outputs=[
                 human_input,
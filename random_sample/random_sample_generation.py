@@ -1,14 +1,13 @@
-from openai import OpenAI
-import anthropic
 import json
 import re
 import random
 import os
-from .gen_api_answer import get_openai_response, get_anthropic_response
-
-# Initialize clients
-anthropic_client = anthropic.Anthropic()
-openai_client = OpenAI()
+from .gen_api_answer import (
+    get_openai_response,
+    get_anthropic_response,
+    get_openai_response_async,
+    get_anthropic_response_async,
+)
 
 GOOD_SYSTEM_PROMPT = """You are an assistant that generates random conversations between a human and an AI assistant for testing purposes. The AI response generated should be a few sentences long. Format your output as JSON: {"human": "<human message>", "ai": <AI assistant response>}. Ensure the output is valid JSON, without additional formatting or explanations."""
 BAD_SYSTEM_PROMPT = """You are an assistant that generates random conversations between a human and an AI assistant for testing purposes. The response should contain incorrect information, logical fallacies, or misleading explanations. It should sound plausible but be fundamentally wrong. The AI response generated should be a few sentences long. Format your output as JSON: {"human": "<human message>", "ai": <AI assistant response>}. Ensure the output is valid JSON, without additional formatting or explanations."""
@@ -28,135 +27,186 @@ Format as JSON with "human", "ai", and "ground_truth" fields."""
 
 RESPONSE_GENERATION_SYSTEM_PROMPT = "You are an assistant that generates random responses to human messages for testing purposes. Generate bad responses (with a mix of correct and incorrect information) 60% of the time and good responses 40% of the time. Do not say which type of response you are generating, just generate the response."
 
-def get_random_human_ai_pair():
+# Models used to generate samples, as (model name, sync function, async function)
+GENERATION_MODELS = [
+    ("gpt-3.5-turbo", get_openai_response, get_openai_response_async),
+    ("claude-3-5-haiku-latest", get_anthropic_response, get_anthropic_response_async),
+]
+
+# Define default messages
+DEFAULT_HUMAN = "How do muscles grow?"
+DEFAULT_AI = """Muscles grow through a process called skeletal muscle hypertrophy, which adds more myosin filaments to each muscle fiber, making the engine of the cell bigger and stronger over time. This is achieved through increased muscle tension and physical stress, breaking down muscle fiber. Muscle growth is also a direct consequence of resistance training and nutrition. People build muscle at different rates depending on their age, sex, and genetics, but muscle development significantly increases if exercise is done correctly and the body stores more protein through a process called protein synthesis."""
+DEFAULT_GROUND_TRUTH = """Muscle growth (hypertrophy) occurs through a complex biological process involving several key mechanisms:
+
+1. Mechanical Tension: Resistance training creates mechanical tension in muscle fibers, triggering molecular and cellular responses that promote growth.
+
+2. Metabolic Stress: The depletion of energy resources and accumulation of metabolic byproducts during exercise contributes to muscle growth signaling.
+
+3. Muscle Damage: Exercise-induced micro-damage to muscle fibers activates satellite cells, which help repair and build new muscle tissue.
+
+4. Protein Synthesis: After exercise, increased protein synthesis rates exceed protein breakdown, leading to net muscle protein accretion.
+
+5. Hormonal Response: Exercise triggers the release of growth-promoting hormones like testosterone, growth hormone, and IGF-1.
+
+6. Recovery: Adequate rest between training sessions allows for repair and growth, supported by proper nutrition, particularly protein intake (1.6-2.2g/kg/day).
+
+This process is influenced by factors including genetics, age, sex, nutrition, sleep quality, and training variables. Optimal muscle growth requires a structured resistance training program, adequate protein intake, sufficient calories, and proper recovery."""
+
+
+def _choose_pair_system_prompt():
     # Select system prompt with specified probabilities
     system_prompt = random.choices(
         [GOOD_SYSTEM_PROMPT, BAD_SYSTEM_PROMPT, AMBIGUOUS_SYSTEM_PROMPT],
         weights=[0.2, 0.2, 0.6]  # 20% good, 20% bad, 60% ambiguous
     )[0]
-    
+
     # Log which type of response is being generated
     prompt_type = {
         GOOD_SYSTEM_PROMPT: "good",
-        BAD_SYSTEM_PROMPT: "bad", 
+        BAD_SYSTEM_PROMPT: "bad",
         AMBIGUOUS_SYSTEM_PROMPT: "ambiguous"
     }[system_prompt]
     print(f"Generating {prompt_type} response")
-    
-    # Randomly choose between GPT-3.5 and Claude with 65%/35% weights
-    model_choice = random.choices([
-        ("gpt-3.5-turbo", get_openai_response),
-        ("claude-3-5-haiku-latest", get_anthropic_response)
-    ], weights=[0.5, 0.5])[0]
-    model_name, api_func = model_choice
-    
-    # Generate response using selected model
-    response = api_func(
-        model_name=model_name,
-        prompt=GENERATION_PROMPT,
-        system_prompt=system_prompt,
-        max_tokens=500,
-        temperature=1
-    )
-    
-    # Define default messages
-    default_human = "How do muscles grow?"
-    default_ai = """Muscles grow through a process called skeletal muscle hypertrophy, which adds more myosin filaments to each muscle fiber, making the engine of the cell bigger and stronger over time. This is achieved through increased muscle tension and physical stress, breaking down muscle fiber. Muscle growth is also a direct consequence of resistance training and nutrition. People build muscle at different rates depending on their age, sex, and genetics, but muscle development significantly increases if exercise is done correctly and the body stores more protein through a process called protein synthesis."""
-    
-    try:
-        # Clean the response by replacing newlines with spaces
-        cleaned_response = response.replace('\n', ' ').replace('\r', '')
-        data = json.loads(cleaned_response)
-        
-        # Extract messages with fallbacks
-        human_message = data.get("human", default_human)
-        ai_message = data.get("ai", default_ai)
-        
-        # Debug logging
-        print(f"Parsed response: human='{human_message}', ai='{ai_message[:50]}...'")
-        
-    except Exception as e:
-        print(f"Failed to parse response: {str(e)}\n {response}")
-        human_message = default_human
-        ai_message = default_ai
-    
-    return human_message, ai_message
+    return system_prompt
 
-def get_random_human_ai_ground_truth_pair():
+
+def _choose_ground_truth_system_prompt():
     # Select system prompt with specified probabilities
     system_prompts = {
         "good": GOOD_SYSTEM_PROMPT_WITH_GROUND_TRUTH,
         "bad": BAD_SYSTEM_PROMPT_WITH_GROUND_TRUTH,
         "ambiguous": AMBIGUOUS_SYSTEM_PROMPT_WITH_GROUND_TRUTH
     }
-    
+
     prompt_type = random.choices(
         ["good", "bad", "ambiguous"],
         weights=[0.2, 0.2, 0.6]  # 20% good, 20% bad, 60% ambiguous
     )[0]
-    
-    system_prompt = system_prompts[prompt_type]
+
     print(f"Generating {prompt_type} response with ground truth")
-    
+    return system_prompts[prompt_type]
+
+
+def _choose_generation_model():
     # Randomly choose between GPT-3.5 and Claude with 50/50 weights
-    model_choice = random.choices([
-        ("gpt-3.5-turbo", get_openai_response),
-        ("claude-3-5-haiku-latest", get_anthropic_response)
-    ], weights=[0.5, 0.5])[0]
-    model_name, api_func = model_choice
-    
-    # Define default messages
-    defaults = {
-        "human": "How do muscles grow?",
-        "ai": """Muscles grow through a process called skeletal muscle hypertrophy, which adds more myosin filaments to each muscle fiber, making the engine of the cell bigger and stronger over time. This is achieved through increased muscle tension and physical stress, breaking down muscle fiber. Muscle growth is also a direct consequence of resistance training and nutrition. People build muscle at different rates depending on their age, sex, and genetics, but muscle development significantly increases if exercise is done correctly and the body stores more protein through a process called protein synthesis.""",
-        "ground_truth": """Muscle growth (hypertrophy) occurs through a complex biological process involving several key mechanisms:
+    return random.choices(GENERATION_MODELS, weights=[0.5, 0.5])[0]
 
-1. Mechanical Tension: Resistance training creates mechanical tension in muscle fibers, triggering molecular and cellular responses that promote growth.
 
-2. Metabolic Stress: The depletion of energy resources and accumulation of metabolic byproducts during exercise contributes to muscle growth signaling.
+def _parse_human_ai_pair(response):
+    try:
+        # Clean the response by replacing newlines with spaces
+        cleaned_response = response.replace('\n', ' ').replace('\r', '')
+        data = json.loads(cleaned_response)
 
-3. Muscle Damage: Exercise-induced micro-damage to muscle fibers activates satellite cells, which help repair and build new muscle tissue.
+        # Extract messages with fallbacks
+        human_message = data.get("human", DEFAULT_HUMAN)
+        ai_message = data.get("ai", DEFAULT_AI)
 
-4. Protein Synthesis: After exercise, increased protein synthesis rates exceed protein breakdown, leading to net muscle protein accretion.
+        # Debug logging
+        print(f"Parsed response: human='{human_message}', ai='{ai_message[:50]}...'")
 
-5. Hormonal Response: Exercise triggers the release of growth-promoting hormones like testosterone, growth hormone, and IGF-1.
+    except Exception as e:
+        print(f"Failed to parse response: {str(e)}\n {response}")
+        human_message = DEFAULT_HUMAN
+        ai_message = DEFAULT_AI
 
-6. Recovery: Adequate rest between training sessions allows for repair and growth, supported by proper nutrition, particularly protein intake (1.6-2.2g/kg/day).
+    return human_message, ai_message
 
-This process is influenced by factors including genetics, age, sex, nutrition, sleep quality, and training variables. Optimal muscle growth requires a structured resistance training program, adequate protein intake, sufficient calories, and proper recovery."""
-    }
-    
-    # Generate response using selected model
-    response = api_func(
-        model_name=model_name,
-        prompt=GENERATION_PROMPT_WITH_GROUND_TRUTH,
-        system_prompt=system_prompt,
-        max_tokens=1000,  # Increased token limit to accommodate ground truth
-        temperature=1
-    )
-    
+
+def _parse_human_ai_ground_truth_pair(response):
     # Parse the response to get all three components
     try:
         # Clean the response by replacing newlines with spaces
         cleaned_response = response.replace('\n', ' ').replace('\r', '')
         data = json.loads(cleaned_response)
-        
+
         # Extract messages with fallbacks
-        human_message = data.get("human", defaults["human"])
-        ai_message = data.get("ai", defaults["ai"])
-        ground_truth = data.get("ground_truth", defaults["ground_truth"])
-        
+        human_message = data.get("human", DEFAULT_HUMAN)
+        ai_message = data.get("ai", DEFAULT_AI)
+        ground_truth = data.get("ground_truth", DEFAULT_GROUND_TRUTH)
+
         # Debug logging
         print(f"Parsed response: human='{human_message}', ai='{ai_message[:50]}...', ground_truth='{ground_truth[:50]}...'")
-        
+
     except Exception as e:
         print(f"Failed to parse response: {str(e)}\n {response}")
-        human_message = defaults["human"]
-        ai_message = defaults["ai"]
-        ground_truth = defaults["ground_truth"]
-    
+        human_message = DEFAULT_HUMAN
+        ai_message = DEFAULT_AI
+        ground_truth = DEFAULT_GROUND_TRUTH
+
     return human_message, ai_message, ground_truth
 
+
+def get_random_human_ai_pair():
+    system_prompt = _choose_pair_system_prompt()
+    model_name, api_func, _ = _choose_generation_model()
+
+    # Generate response using selected model
+    response = api_func(
+        model_name=model_name,
+        prompt=GENERATION_PROMPT,
+        system_prompt=system_prompt,
+        max_tokens=500,
+        temperature=1
+    )
+    return _parse_human_ai_pair(response)
+
+
+async def get_random_human_ai_pair_async():
+    system_prompt = _choose_pair_system_prompt()
+    model_name, _, api_func = _choose_generation_model()
+
+    response = await api_func(
+        model_name=model_name,
+        prompt=GENERATION_PROMPT,
+        system_prompt=system_prompt,
+        max_tokens=500,
+        temperature=1
+    )
+    return _parse_human_ai_pair(response)
+
+
+def get_random_human_ai_ground_truth_pair():
+    system_prompt = _choose_ground_truth_system_prompt()
+    model_name, api_func, _ = _choose_generation_model()
+
+    # Generate response using selected model
+    response = api_func(
+        model_name=model_name,
+        prompt=GENERATION_PROMPT_WITH_GROUND_TRUTH,
+        system_prompt=system_prompt,
+        max_tokens=1000,  # Increased token limit to accommodate ground truth
+        temperature=1
+    )
+    return _parse_human_ai_ground_truth_pair(response)
+
+
+async def get_random_human_ai_ground_truth_pair_async():
+    system_prompt = _choose_ground_truth_system_prompt()
+    model_name, _, api_func = _choose_generation_model()
+
+    response = await api_func(
+        model_name=model_name,
+        prompt=GENERATION_PROMPT_WITH_GROUND_TRUTH,
+        system_prompt=system_prompt,
+        max_tokens=1000,  # Increased token limit to accommodate ground truth
+        temperature=1
+    )
+    return _parse_human_ai_ground_truth_pair(response)
+
+
+def _clean_generated_response(response):
+    # Extract just the response content since we don't need JSON format here
+    if isinstance(response, str):
+        # Clean up any JSON formatting if present
+        try:
+            data = json.loads(response)
+            response = data.get("content", response)
+        except json.JSONDecodeError:
+            pass
+    return response
+
+
 def generate_ai_response(human_msg):
     """Generate AI response using GPT-3.5-turbo"""
     if not human_msg.strip():
@@ -170,14 +220,24 @@ def generate_ai_response(human_msg):
             max_tokens=1000,
             temperature=1
         )
-        # Extract just the response content since we don't need JSON format here
-        if isinstance(response, str):
-            # Clean up any JSON formatting if present
-            try:
-                data = json.loads(response)
-                response = data.get("content", response)
-            except json.JSONDecodeError:
-                pass
-        return response, False  # Return response and button interactive state
+        return _clean_generated_response(response), False  # Return response and button interactive state
+    except Exception as e:
+        return f"Error generating response: {str(e)}", False
+
+
+async def generate_ai_response_async(human_msg):
+    """Generate AI response using GPT-3.5-turbo without blocking the event loop"""
+    if not human_msg.strip():
+        return "", False
+
+    try:
+        response = await get_openai_response_async(
+            "gpt-3.5-turbo",
+            human_msg,
+            system_prompt=RESPONSE_GENERATION_SYSTEM_PROMPT,
+            max_tokens=1000,
+            temperature=1
+        )
+        return _clean_generated_response(response), False  # Return response and button interactive state
     except Exception as e:
-        return f"Error generating response: {str(e)}", False
\ No newline at end of file
+        return f"Error generating response: {str(e)}", False
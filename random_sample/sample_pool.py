@@ -0,0 +1,126 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+
+from .random_sample_generation import (
+    DEFAULT_HUMAN,
+    get_random_human_ai_pair,
+    get_random_human_ai_ground_truth_pair,
+)
+
+POOL_SIZE = int(os.getenv("RANDOM_SAMPLE_POOL_SIZE", "8"))
+POOL_PATH = os.getenv(
+    "RANDOM_SAMPLE_POOL_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "eval-sandbox", "random_samples.json"),
+)
+
+REFILL_RETRY_SECONDS = 30
+
+# Pool modes: plain human/AI pairs and pairs with a ground truth reference
+PAIR = "pair"
+GROUND_TRUTH = "ground_truth"
+
+
+class SamplePool:
+    """Bounded pools of pre-generated random samples, refilled by a background thread.
+
+    Only the refill thread writes the pool file, so taking a sample stays in memory.
+    """
+
+    def __init__(self, size=POOL_SIZE, path=POOL_PATH):
+        self.size = size
+        self.path = path
+        self.samples = {PAIR: deque(), GROUND_TRUTH: deque()}
+        self._lock = threading.Lock()
+        # Samples were taken since the pool file was last written
+        self._dirty = False
+        self._wanted = threading.Event()
+        self._thread = None
+        self._load()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._refill_forever, name="sample-pool", daemon=True)
+            self._thread.start()
+        self._wanted.set()
+
+    def take(self, with_ground_truth):
+        """Pop a pre-generated sample, or return None if the pool for that mode is empty"""
+        mode = GROUND_TRUTH if with_ground_truth else PAIR
+        with self._lock:
+            sample = self.samples[mode].popleft() if self.samples[mode] else None
+            self._dirty = self._dirty or sample is not None
+        self._wanted.set()
+        return sample
+
+    def _most_needed_mode(self):
+        with self._lock:
+            missing = {mode: self.size - len(samples) for mode, samples in self.samples.items()}
+        mode = max(missing, key=missing.get)
+        return mode if missing[mode] > 0 else None
+
+    def _refill_forever(self):
+        while True:
+            self._wanted.wait()
+            if self._dirty:
+                self._save()
+            mode = self._most_needed_mode()
+            if mode is None:
+                self._wanted.clear()
+                continue
+            try:
+                if mode == GROUND_TRUTH:
+                    sample = list(get_random_human_ai_ground_truth_pair())
+                else:
+                    sample = list(get_random_human_ai_pair())
+            except Exception as e:
+                print(f"Failed to prefetch random sample: {str(e)}")
+                sample = None
+            # The generators fall back to a canned example when the provider call fails,
+            # so don't pool it and back off before trying again
+            if sample is None or sample[0] == DEFAULT_HUMAN:
+                time.sleep(REFILL_RETRY_SECONDS)
+                continue
+            with self._lock:
+                self.samples[mode].append(sample)
+            self._save()
+
+    def _load(self):
+        try:
+            with open(self.path, "r") as f:
+                stored = json.load(f)
+            for mode in self.samples:
+                self.samples[mode].extend(stored.get(mode, [])[: self.size])
+        except FileNotFoundError:
+            pass
+        except (json.JSONDecodeError, OSError) as e:
+            print(f"Warning: ignoring unreadable random sample pool at {self.path}: {str(e)}")
+
+    def _save(self):
+        # Refill thread only: the file is written outside the lock, from a snapshot, and to a temp
+        # file first so a crash can't truncate the pool
+        with self._lock:
+            stored = {mode: list(samples) for mode, samples in self.samples.items()}
+            self._dirty = False
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(stored, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Warning: could not persist random sample pool: {str(e)}")
+
+
+_pool = None
+
+
+def get_sample_pool():
+    """Return the process-wide sample pool, starting its producer on first use"""
+    global _pool
+    if _pool is None:
+        _pool = SamplePool()
+        _pool.start()
+    return _pool
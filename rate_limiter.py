@@ -0,0 +1,178 @@
+# rate_limiter.py
+
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+# Organizations without their own entry in rate_limits.jsonl are served through
+# the Together API (see get_llm_answer.get_model_response), so they share its budget
+FALLBACK_ORGANIZATION = "Together"
+DEFAULT_COMPLETION_TOKENS = 1000
+
+
+def is_rate_limit_error(error):
+    """Return True for provider SDK errors that signal HTTP 429 / overload"""
+    status_code = getattr(error, "status_code", None)
+    if status_code is None:
+        status_code = getattr(getattr(error, "response", None), "status_code", None)
+    return status_code in (429, 529)
+
+
+def estimate_tokens(*texts, completion_tokens=DEFAULT_COMPLETION_TOKENS):
+    """Rough token estimate (~4 characters per token) plus the completion budget"""
+    return sum(len(text) for text in texts if text) // 4 + completion_tokens
+
+
+class TokenBucket:
+    """Continuously refilling budget of `per_minute` units"""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self.refill_per_second = per_minute / 60.0
+        self.updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_per_second)
+        self.updated_at = now
+
+    async def acquire(self, amount=1):
+        # Requests bigger than the whole bucket would otherwise never be admitted
+        amount = min(float(amount), self.capacity)
+        while True:
+            self._refill()
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return
+            await asyncio.sleep((amount - self.tokens) / self.refill_per_second)
+
+
+class AdaptiveConcurrency:
+    """Concurrency limit adjusted with AIMD: +1 per window of successes, halved on 429.
+
+    A burst of 429s from requests that were all in flight together is one
+    congestion signal, so it halves the limit once: only requests started
+    after the last decrease can trigger the next one.
+    """
+
+    def __init__(self, initial, maximum, minimum=1, decrease_factor=0.5):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = float(max(minimum, min(initial, maximum)))
+        self.decrease_factor = decrease_factor
+        self.in_flight = 0
+        # Bumped on every decrease; each request remembers the epoch it started in
+        self.epoch = 0
+        self._waiters = deque()
+
+    async def acquire(self):
+        """Wait for a slot; returns the epoch to pass to on_rate_limited"""
+        while self.in_flight >= int(self.limit):
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+        self.in_flight += 1
+        return self.epoch
+
+    def release(self):
+        self.in_flight -= 1
+        self._wake_waiters()
+
+    def on_success(self):
+        self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+        self._wake_waiters()
+
+    def on_rate_limited(self, epoch):
+        """Decrease the limit for a request started in `epoch`, unless it already was since then"""
+        if epoch != self.epoch:
+            return
+        self.epoch += 1
+        self.limit = max(self.minimum, self.limit * self.decrease_factor)
+
+    def _wake_waiters(self):
+        available = int(self.limit) - self.in_flight
+        while available > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                available -= 1
+
+
+class RateLimiter:
+    """Requests/min and tokens/min budgets plus adaptive concurrency for one provider"""
+
+    def __init__(self, organization, requests_per_minute=None, tokens_per_minute=None,
+                 initial_concurrency=8, max_concurrency=32):
+        self.organization = organization
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.concurrency = AdaptiveConcurrency(initial_concurrency, max_concurrency)
+        self.rate_limited_count = 0
+
+    @asynccontextmanager
+    async def slot(self, estimated_tokens=DEFAULT_COMPLETION_TOKENS):
+        """Wait for budget, then hold one concurrency slot for the duration of a request"""
+        epoch = await self.concurrency.acquire()
+        try:
+            if self.requests:
+                await self.requests.acquire(1)
+            if self.tokens:
+                await self.tokens.acquire(estimated_tokens)
+            try:
+                yield
+            except Exception as e:
+                if is_rate_limit_error(e):
+                    self.rate_limited_count += 1
+                    self.concurrency.on_rate_limited(epoch)
+                raise
+            self.concurrency.on_success()
+        finally:
+            self.concurrency.release()
+
+    def status(self):
+        return {
+            "organization": self.organization,
+            "concurrency_limit": int(self.concurrency.limit),
+            "in_flight": self.concurrency.in_flight,
+            "rate_limited": self.rate_limited_count,
+        }
+
+
+def load_rate_limits():
+    """Load per-organization limits from rate_limits.jsonl next to models.jsonl"""
+    limits = {}
+    try:
+        script_dir = os.path.dirname(__file__)
+        file_path = os.getenv("RATE_LIMITS_FILE", os.path.join(script_dir, "rate_limits.jsonl"))
+        with open(file_path, "r") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    limits[entry.pop("organization")] = entry
+    except FileNotFoundError:
+        print("Warning: rate_limits.jsonl not found, judge calls will not be rate limited")
+    return limits
+
+
+RATE_LIMITS = load_rate_limits()
+_limiters = {}
+
+
+def get_rate_limiter(organization):
+    """Return the shared limiter for an organization from models.jsonl"""
+    key = organization if organization in RATE_LIMITS else FALLBACK_ORGANIZATION
+    if key not in _limiters:
+        _limiters[key] = RateLimiter(key, **RATE_LIMITS.get(key, {}))
+    return _limiters[key]
+
+
+def get_rate_limiter_status():
+    return [limiter.status() for limiter in _limiters.values()]
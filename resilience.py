@@ -0,0 +1,212 @@
+# resilience.py
+
+import asyncio
+import os
+import random
+import time
+from email.utils import parsedate_to_datetime
+
+# Status codes worth retrying: timeouts, conflicts, rate limits, server errors and overload
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504, 529}
+RETRYABLE_ERROR_NAMES = {"APIConnectionError", "APITimeoutError"}
+
+MAX_RETRIES = int(os.getenv("JUDGE_MAX_RETRIES", "4"))
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 60.0
+
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("JUDGE_BREAKER_THRESHOLD", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("JUDGE_BREAKER_RESET_SECONDS", "30"))
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose circuit breaker is open"""
+
+
+def get_status_code(error):
+    status_code = getattr(error, "status_code", None)
+    if status_code is None:
+        status_code = getattr(getattr(error, "response", None), "status_code", None)
+    return status_code
+
+
+def is_retryable_error(error):
+    if get_status_code(error) in RETRYABLE_STATUS_CODES:
+        return True
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    return any(cls.__name__ in RETRYABLE_ERROR_NAMES for cls in type(error).__mro__)
+
+
+def get_retry_after(error):
+    """Seconds to wait according to the Retry-After / retry-after-ms headers, if any"""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000.0
+        retry_after = headers.get("retry-after")
+        if not retry_after:
+            return None
+        try:
+            return float(retry_after)
+        except ValueError:
+            # HTTP-date form
+            return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def get_backoff_delay(attempt, error=None):
+    """Full-jitter exponential backoff, never shorter than the server's Retry-After"""
+    delay = random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+    retry_after = get_retry_after(error) if error is not None else None
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, BACKOFF_MAX_SECONDS))
+    return delay
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures, lets one trial call through after a cool-down"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, organization, failure_threshold=BREAKER_FAILURE_THRESHOLD,
+                 reset_seconds=BREAKER_RESET_SECONDS):
+        self.organization = organization
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.retries = 0
+        self.failures = 0
+        self.rejected = 0
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go through.
+
+        Returns True for the one trial call let through after the cool-down;
+        its retries must not call this again, and it must end with end_trial.
+        """
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_seconds:
+            # Let exactly one trial call through; everyone else keeps failing fast
+            self.state = self.HALF_OPEN
+            return True
+        if self.state != self.CLOSED:
+            self.rejected += 1
+            raise CircuitOpenError(
+                f"{self.organization} circuit breaker is {self.state} after "
+                f"{self.consecutive_failures} consecutive failures"
+            )
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        self.consecutive_failures += 1
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def end_trial(self):
+        """Reopen for another cool-down if the trial call proved nothing (throttled to the end, cancelled)"""
+        if self.state == self.HALF_OPEN:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def status(self):
+        return {
+            "organization": self.organization,
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "retries": self.retries,
+            "failures": self.failures,
+            "rejected": self.rejected,
+        }
+
+
+_breakers = {}
+
+
+def get_circuit_breaker(organization):
+    if organization not in _breakers:
+        _breakers[organization] = CircuitBreaker(organization)
+    return _breakers[organization]
+
+
+def get_provider_health():
+    """Retry counts and breaker state for every provider used so far"""
+    return [breaker.status() for breaker in _breakers.values()]
+
+
+def call_with_retries(organization, request, max_retries=MAX_RETRIES):
+    """Call `request()` with jittered exponential backoff behind the provider's breaker"""
+    breaker = get_circuit_breaker(organization)
+    attempt = 0
+    trial = False
+    try:
+        while True:
+            # Retries of the half-open trial call are part of that trial, not new calls
+            if not trial:
+                trial = bool(breaker.before_call())
+            try:
+                result = request()
+            except Exception as e:
+                if not is_retryable_error(e):
+                    # The provider answered, so it is up even though this request failed
+                    breaker.record_success()
+                    raise
+                # Throttling means the provider is up, so only other errors count towards the breaker
+                if get_status_code(e) != 429:
+                    breaker.record_failure()
+                if attempt >= max_retries or breaker.state == CircuitBreaker.OPEN:
+                    raise
+                breaker.retries += 1
+                time.sleep(get_backoff_delay(attempt, e))
+                attempt += 1
+                continue
+            breaker.record_success()
+            return result
+    finally:
+        # A trial left unresolved (throttled to the end, cancelled) must not leave the breaker half-open
+        if trial:
+            breaker.end_trial()
+
+
+async def call_with_retries_async(organization, request, max_retries=MAX_RETRIES):
+    """Async counterpart of call_with_retries; `request` returns an awaitable"""
+    breaker = get_circuit_breaker(organization)
+    attempt = 0
+    trial = False
+    try:
+        while True:
+            # Retries of the half-open trial call are part of that trial, not new calls
+            if not trial:
+                trial = bool(breaker.before_call())
+            try:
+                result = await request()
+            except Exception as e:
+                if not is_retryable_error(e):
+                    # The provider answered, so it is up even though this request failed
+                    breaker.record_success()
+                    raise
+                # Throttling means the provider is up, so only other errors count towards the breaker
+                if get_status_code(e) != 429:
+                    breaker.record_failure()
+                if attempt >= max_retries or breaker.state == CircuitBreaker.OPEN:
+                    raise
+                breaker.retries += 1
+                await asyncio.sleep(get_backoff_delay(attempt, e))
+                attempt += 1
+                continue
+            breaker.record_success()
+            return result
+    finally:
+        # A trial left unresolved (throttled to the end, cancelled) must not leave the breaker half-open
+        if trial:
+            breaker.end_trial()
@@ -0,0 +1,124 @@
+# result_export.py
+
+import gzip
+import os
+import tempfile
+import time
+import uuid
+
+# Rows serialized per write; memory use of an export is bounded by this, not the run size
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "10000"))
+EXPORT_DIR = os.getenv("EXPORT_DIR", os.path.join(tempfile.gettempdir(), "eval-sandbox-exports"))
+# Exports older than this are deleted, including a finished session's last one
+EXPORT_MAX_AGE_SECONDS = float(os.getenv("EXPORT_MAX_AGE_SECONDS", "3600"))
+
+# Format label shown in the UI -> file extension
+EXPORT_FORMATS = {
+    "JSON Lines": ".jsonl",
+    "Compressed JSON Lines": ".jsonl.gz",
+    "Parquet": ".parquet",
+    "CSV": ".csv",
+    "JSON": ".json",
+}
+DEFAULT_EXPORT_FORMAT = "JSON Lines"
+
+# Last export per session, removed when that session exports again or once it is too old
+_session_exports = {}
+
+
+def _chunks(df, chunk_rows):
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+
+def _write_json_lines(df, f, chunk_rows):
+    for chunk in _chunks(df, chunk_rows):
+        text = chunk.to_json(orient="records", lines=True, force_ascii=False)
+        f.write(text if text.endswith("\n") else text + "\n")
+
+
+def _write_json(df, f, chunk_rows):
+    # A single JSON array, written chunk by chunk and without pretty-printing
+    f.write("[")
+    first = True
+    for chunk in _chunks(df, chunk_rows):
+        records = chunk.to_json(orient="records", force_ascii=False)[1:-1]
+        if records:
+            f.write(records if first else "," + records)
+            first = False
+    f.write("]")
+
+
+def _write_csv(df, f, chunk_rows):
+    for number, chunk in enumerate(_chunks(df, chunk_rows)):
+        chunk.to_csv(f, header=number == 0, index=False)
+
+
+def _write_parquet(df, path, chunk_rows):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("Parquet export requires the pyarrow package (pip install pyarrow)")
+
+    # from_pandas would store df.attrs (run metadata, arrays included) in the file's metadata
+    df = df.copy(deep=False)
+    df.attrs = {}
+    schema = pa.Schema.from_pandas(df.iloc[:chunk_rows], preserve_index=False)
+    # Text columns that are empty in the first chunk (e.g. failed critiques) infer as null
+    for index, field in enumerate(schema):
+        if pa.types.is_null(field.type):
+            schema = schema.set(index, field.with_type(pa.string()))
+    with pq.ParquetWriter(path, schema) as writer:
+        for chunk in _chunks(df, chunk_rows):
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+
+
+def _remove_old_exports(now):
+    for entry in os.scandir(EXPORT_DIR):
+        try:
+            if entry.is_file() and now - entry.stat().st_mtime > EXPORT_MAX_AGE_SECONDS:
+                os.remove(entry.path)
+        except OSError:
+            pass
+    for session_id, path in list(_session_exports.items()):
+        if not os.path.exists(path):
+            del _session_exports[session_id]
+
+
+def export_results(df, export_format=DEFAULT_EXPORT_FORMAT, session_id=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Stream `df` to a new file in the chosen format and return its path.
+
+    Every export gets a unique file name, so concurrent sessions never
+    overwrite each other's downloads; a session's previous export is deleted,
+    as is any export older than EXPORT_MAX_AGE_SECONDS.
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {export_format}")
+    extension = EXPORT_FORMATS[export_format]
+    session_id = session_id or uuid.uuid4().hex
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    _remove_old_exports(time.time())
+    path = os.path.join(
+        EXPORT_DIR,
+        f"atla_custom_eval_results_{session_id[:12]}_{time.strftime('%Y%m%d-%H%M%S')}_{uuid.uuid4().hex[:6]}{extension}",
+    )
+
+    if export_format == "Parquet":
+        _write_parquet(df, path, chunk_rows)
+    elif export_format == "Compressed JSON Lines":
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            _write_json_lines(df, f, chunk_rows)
+    else:
+        writer = {"JSON Lines": _write_json_lines, "CSV": _write_csv, "JSON": _write_json}[export_format]
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            writer(df, f, chunk_rows)
+
+    previous = _session_exports.get(session_id)
+    if previous and previous != path:
+        try:
+            os.remove(previous)
+        except OSError:
+            pass
+    _session_exports[session_id] = path
+    return path
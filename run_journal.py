@@ -0,0 +1,141 @@
+# run_journal.py
+
+import glob
+import hashlib
+import json
+import math
+import os
+import time
+import uuid
+
+import pandas as pd
+
+RUN_JOURNAL_DIR = os.getenv(
+    "RUN_JOURNAL_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "eval-sandbox", "runs"),
+)
+
+
+def make_run_key(df, template, mappings, judge_names):
+    """Deterministic key of a run's data, prompt and judges; a run resumes the newest journal with its key.
+
+    Only the mapped input columns are hashed; result columns added by earlier
+    runs don't change the id.
+    """
+    columns = [column for key, column in mappings.items()
+               if key != 'evaluation_criteria' and column and column != 'None']
+    digest = hashlib.sha256()
+    digest.update(pd.util.hash_pandas_object(df[columns].astype(str), index=True).values.tobytes())
+    digest.update(json.dumps(
+        {"template": template, "mappings": mappings, "judges": sorted(judge_names)},
+        sort_keys=True,
+    ).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+class RunJournal:
+    """Append-only JSONL record of completed judge calls for one run.
+
+    Every fresh run gets a journal of its own (see `new`), so concurrent
+    sessions on the same data never share a file and starting over never
+    deletes an earlier run's journal; resuming picks the newest journal
+    with the run's key (see `latest`).
+
+    Provider batches are journaled too: when submitted, with the rows they
+    cover, and again once their results are journaled, so a resumed run
+    polls batches still in progress instead of submitting their rows again.
+    """
+
+    def __init__(self, run_id, directory=RUN_JOURNAL_DIR):
+        self.run_id = run_id
+        self.path = os.path.join(directory, f"{run_id}.jsonl")
+        self._file = None
+
+    @classmethod
+    def new(cls, run_key, directory=RUN_JOURNAL_DIR):
+        """A journal for a fresh run with `run_key`, under an id no other run has"""
+        return cls(f"{run_key}-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}", directory)
+
+    @classmethod
+    def latest(cls, run_key, directory=RUN_JOURNAL_DIR):
+        """The most recently written journal of a run with `run_key`, or None"""
+        paths = glob.glob(os.path.join(glob.escape(directory), f"{run_key}-*.jsonl"))
+        if not paths:
+            return None
+        newest = max(paths, key=os.path.getmtime)
+        return cls(os.path.basename(newest)[:-len(".jsonl")], directory)
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def load(self):
+        """Return the journaled `(judge, row, score, critique)` entries, skipping a torn last line"""
+        entries = []
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if "row" not in entry:
+                        continue
+                    entries.append((entry["judge"], entry["row"], entry["score"], entry["critique"]))
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def load_batches(self):
+        """Return `{judge: [(batch id, rows)]}` for journaled batches whose results were never journaled"""
+        batches = {}
+        finished = set()
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if "batch_id" not in entry:
+                        continue
+                    if entry.get("finished"):
+                        finished.add(entry["batch_id"])
+                    else:
+                        batches.setdefault(entry["judge"], []).append((entry["batch_id"], entry["rows"]))
+        except FileNotFoundError:
+            pass
+        return {
+            judge: [(batch_id, rows) for batch_id, rows in entries if batch_id not in finished]
+            for judge, entries in batches.items()
+        }
+
+    def open(self):
+        """Open for appending; a resumed run adds to what its journal already holds"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def append(self, judge, row, score, critique):
+        # Failed calls are not journaled so that resuming retries them
+        if score is None or math.isnan(score):
+            return
+        self._write({"judge": judge, "row": int(row), "score": float(score), "critique": critique})
+
+    def append_batch(self, judge, batch_id, rows):
+        """Record a provider batch as soon as it is submitted"""
+        self._write({"judge": judge, "batch_id": batch_id, "rows": [int(row) for row in rows]})
+
+    def finish_batch(self, judge, batch_id):
+        """Record that a batch's results are journaled, so resuming doesn't poll it again"""
+        self._write({"judge": judge, "batch_id": batch_id, "finished": True})
+
+    def _write(self, record):
+        if self._file is None:
+            return
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        # Flush every record so a crash or restart loses at most the call in flight
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
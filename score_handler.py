@@ -1,8 +1,12 @@
 import gradio as gr
 import pandas as pd
 import numpy as np
-import tempfile
-import os
+
+from result_export import EXPORT_FORMATS, DEFAULT_EXPORT_FORMAT, export_results
+from metrics import METRICS, compute_metrics, format_metric, prepare_columns
+from bootstrap import CONFIDENCE_LEVEL, DEFAULT_BOOTSTRAP_SAMPLES, bootstrap_metrics
+from evaluation_engine import MAX_JUDGES
+from tracing import set_span_attributes, span, traced
 
 def handle_analysis(df_state, model_selection_group, analyze_results_button):
     with gr.Group(visible=False) as analysis_group:
@@ -10,7 +14,7 @@ def handle_analysis(df_state, model_selection_group, analyze_results_button):
 
         # Dropdown to select the accuracy measurement
         accuracy_measurement_dropdown = gr.Dropdown(
-            choices=['Accuracy', 'Pearson Correlation'],
+            choices=list(METRICS.keys()),
             label='Select Evaluation Metric'
         )
 
@@ -20,43 +24,67 @@ def handle_analysis(df_state, model_selection_group, analyze_results_button):
                 choices=[],
                 label='Select True Label Column'
             )
-
-        # Define two side-by-side boxes for results
-        with gr.Row():
-            judge_a_result = gr.Textbox(
-                label="Judge A Results",
-                lines=10,
-                interactive=False,
-                visible=False
-            )
-            judge_b_result = gr.Textbox(
-                label="Judge B Results",
-                lines=10,
-                interactive=False,
-                visible=False
+            bootstrap_samples_slider = gr.Slider(
+                minimum=0,
+                maximum=10000,
+                step=100,
+                value=DEFAULT_BOOTSTRAP_SAMPLES,
+                label=f"Bootstrap samples for {CONFIDENCE_LEVEL:.0%} confidence intervals (0 = off)"
             )
 
-        # Move the JSON output below those textboxes and buttons
-        json_output = gr.File(label="Results .json", interactive=False, visible=False)
+        # One results box per judge, two side by side; unused boxes stay hidden
+        judge_results = []
+        for start in range(0, MAX_JUDGES, 2):
+            with gr.Row():
+                for index in range(start, min(start + 2, MAX_JUDGES)):
+                    judge_results.append(gr.Textbox(
+                        label=f"Judge {chr(ord('A') + index)} Results",
+                        lines=10,
+                        interactive=False,
+                        visible=False
+                    ))
+
+        # Every metric for every judge, and how far the judges agree with each other
+        metrics_table = gr.Dataframe(label="All metrics vs. true label", interactive=False, visible=False)
+        agreement_table = gr.Dataframe(label="Judge vs. judge agreement", interactive=False, visible=False)
+        # Paired bootstrap intervals for each judge's metric minus the other judge's
+        difference_table = gr.Dataframe(
+            label="Judge differences vs. true label (paired bootstrap, * = interval excludes 0)",
+            interactive=False,
+            visible=False
+        )
+        # Calls, tokens, estimated cost and latency percentiles of the run, per judge
+        usage_table = gr.Dataframe(label="Judge call usage", interactive=False, visible=False)
+
+        # Move the results file below those textboxes and buttons
+        json_output = gr.File(label="Results file", interactive=False, visible=False)
 
         # Now place the row of buttons AFTER the json_output
         with gr.Row():
             back_to_results_button = gr.Button("← Back to Results")
             calculate_button = gr.Button("Calculate")
-            download_button = gr.Button("Download Results as JSON")
+            export_format_dropdown = gr.Dropdown(
+                choices=list(EXPORT_FORMATS.keys()),
+                value=DEFAULT_EXPORT_FORMAT,
+                label="Export format",
+            )
+            download_button = gr.Button("Download Results")
 
     # Show analysis group
     def show_analysis_group():
         df = df_state.value
         if df is not None:
             columns = df.columns.tolist()
+            # Preselect the label column mapped in the criteria step, if any
+            label_column = df.attrs.get("label_column")
         else:
             columns = []
+            label_column = None
         # Now we only update ground_truth_dropdown
         return (
             gr.update(visible=True),         # analysis_group
             gr.update(visible=False),        # model_selection_group
-            gr.update(choices=columns),      # ground_truth_dropdown
+            gr.update(choices=columns, value=label_column),  # ground_truth_dropdown
         )
 
     analyze_results_button.click(
@@ -81,164 +109,173 @@ def handle_analysis(df_state, model_selection_group, analyze_results_button):
         outputs=[analysis_group, model_selection_group]
     )
 
-    def calculate_multiple_accuracies(measurement, ground_truth_col, df_state):
-        # Update column names to match new format
-        col2_name = "score_selene"
-        # Get the non-selene score column (should be the other score_* column)
+    @traced()
+    def calculate_multiple_accuracies(measurement, ground_truth_col, bootstrap_samples, df_state):
+        def error_updates(msg):
+            return (
+                gr.update(value=msg, visible=True),
+                *[gr.update(visible=False) for _ in judge_results[1:]],
+                gr.update(visible=False),
+                gr.update(visible=False),
+                gr.update(visible=False),
+                gr.update(visible=False),
+            )
+
         df = df_state.value
-        score_columns = [col for col in df.columns if col.startswith('score_') and col != 'score_selene']
-        col3_name = score_columns[0] if score_columns else None
-        
         if df is None:
-            return (
-                gr.update(value="No DataFrame available.", visible=True),
-                gr.update(value="No DataFrame available.", visible=True)
+            return error_updates("No DataFrame available.")
+        # An estimate-mode run only judged a sample of the rows
+        if "sampled_positions" in df.attrs:
+            df = df.iloc[df.attrs["sampled_positions"]]
+
+        # The judges of the last run, Selene first; older results fall back to every score_* column
+        if "judges" in df.attrs:
+            score_columns = [f'score_{name}' for name in df.attrs["judges"] if f'score_{name}' in df.columns]
+        else:
+            score_columns = sorted(
+                (col for col in df.columns if col.startswith('score_')),
+                key=lambda col: col != 'score_selene'
             )
+        display_names = df.attrs.get("judge_display_names", {})
 
         # Check if user-supplied ground_truth_col is valid
-        missing_columns = [col for col in [ground_truth_col, col2_name, col3_name] if col not in df.columns]
+        missing_columns = [col for col in [ground_truth_col, 'score_selene'] if col not in df.columns]
         if missing_columns:
-            msg = f"Selected columns not found in DataFrame: {', '.join(missing_columns)}."
-            return (
-                gr.update(value=msg, visible=True),
-                gr.update(value=msg, visible=True)
-            )
-
-        # Compare ground_truth_col with score_selene
-        result1 = calculate_accuracy(
-            measurement, ground_truth_col, col2_name,
-            df_state, compare_to_ground_truth=True
-        )
-        text_a = f"Comparison: '{ground_truth_col}' vs. 'Selene'\n{result1}"
+            return error_updates(f"Selected columns not found in DataFrame: {', '.join(map(str, missing_columns))}.")
+        score_columns = score_columns[:len(judge_results)]
+
+        # One vectorized pass over the label and all score columns; the
+        # bootstrap resamples the same converted columns
+        set_span_attributes(rows=len(df), judges=len(score_columns), bootstrap_samples=int(bootstrap_samples or 0))
+        with span("compute_metrics"):
+            prepared = prepare_columns(df, ground_truth_col, score_columns)
+            report = compute_metrics(df, ground_truth_col, score_columns, prepared=prepared)
+        with span("bootstrap_metrics"):
+            intervals = bootstrap_metrics(prepared, score_columns, int(bootstrap_samples)) if bootstrap_samples else None
+        texts = [
+            format_judge_result(measurement, ground_truth_col, col, report, intervals, display_names)
+            for col in score_columns
+        ]
 
-        # Compare ground_truth_col with the other model's score
-        result2 = calculate_accuracy(
-            measurement, ground_truth_col, col3_name,
-            df_state, compare_to_ground_truth=True
-        )
-        # Extract model name from column name for display
-        model_name = col3_name.replace('score_', '').replace('_', ' ').title()
-        text_b = f"Comparison: '{ground_truth_col}' vs. '{model_name}'\n{result2}"
+        if intervals:
+            metrics_df = pd.DataFrame([
+                {"Judge": judge_display_name(col, display_names),
+                 **{name: format_estimate(report["judges"][col][key], intervals["judges"][col][key])
+                    for name, key in METRICS.items()},
+                 "Rows compared": report["judges"][col]["pairs"], "NaNs": report["judges"][col]["num_nan"]}
+                for col in score_columns
+            ])
+        else:
+            metrics_df = pd.DataFrame([
+                {"Judge": judge_display_name(col, display_names), **{name: report["judges"][col][key] for name, key in METRICS.items()},
+                 "Rows compared": report["judges"][col]["pairs"], "NaNs": report["judges"][col]["num_nan"]}
+                for col in score_columns
+            ]).round(4)
+        agreement_df = pd.DataFrame([
+            {"Judges": f"{judge_display_name(col_a, display_names)} vs. {judge_display_name(col_b, display_names)}",
+             "Agreement": metrics["accuracy"], "Cohen's Kappa": metrics["cohen_kappa"],
+             "Weighted Kappa": metrics["weighted_kappa"], "Pearson Correlation": metrics["pearson"],
+             "Spearman Correlation": metrics["spearman"], "Kendall's Tau": metrics["kendall_tau"]}
+            for col_a, col_b, metrics in report["agreement"]
+        ]).round(4)
+
+        difference_df = None
+        if intervals:
+            difference_df = pd.DataFrame([
+                {"Judges": f"{judge_display_name(col_a, display_names)} − {judge_display_name(col_b, display_names)}",
+                 **{name: format_difference(
+                     report["judges"][col_a][key] - report["judges"][col_b][key], differences[key]
+                 ) for name, key in METRICS.items()}}
+                for col_a, col_b, differences in intervals["differences"]
+            ])
+
+        usage_summary = df.attrs.get("usage_summary")
+        usage_df = pd.DataFrame(usage_summary) if usage_summary else None
 
         return (
-            gr.update(value=text_a, visible=True),
-            gr.update(value=text_b, visible=True)
+            *[gr.update(value=text, label=f"{judge_display_name(col, display_names)} Results", visible=True)
+              for col, text in zip(score_columns, texts)],
+            *[gr.update(visible=False) for _ in judge_results[len(texts):]],
+            gr.update(value=metrics_df, visible=True),
+            gr.update(value=agreement_df, visible=len(agreement_df) > 0),
+            gr.update(value=difference_df, visible=difference_df is not None and len(difference_df) > 0),
+            gr.update(value=usage_df, visible=usage_df is not None),
         )
 
-    # Now the calculate_button only expects measurement, ground_truth_col, df_state
+    # Now the calculate_button only expects measurement, ground_truth_col, bootstrap samples, df_state
     calculate_button.click(
         fn=calculate_multiple_accuracies,
         inputs=[
             accuracy_measurement_dropdown,
             ground_truth_dropdown,
+            bootstrap_samples_slider,
             df_state
         ],
-        outputs=[judge_a_result, judge_b_result]
+        outputs=[*judge_results, metrics_table, agreement_table, difference_table, usage_table]
     )
 
-    def create_json_download(df_state):
+    def create_results_download(export_format, df_state, request: gr.Request):
         if df_state.value is None:
             return gr.update(value=None, visible=True)
-        
-        json_str = df_state.value.to_json(orient='records', indent=2)
-        temp_dir = tempfile.gettempdir()
-        file_path = os.path.join(temp_dir, 'atla_custom_eval_results.json')
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(json_str)
+
+        # Streamed in chunks to a file unique to this export, named after the session
+        file_path = export_results(
+            df_state.value,
+            export_format,
+            session_id=getattr(request, "session_hash", None),
+        )
         return gr.update(value=file_path, visible=True)
 
     download_button.click(
-        fn=create_json_download,
-        inputs=[df_state],
+        fn=create_results_download,
+        inputs=[export_format_dropdown, df_state],
         outputs=[json_output]
     )
 
 # Helper functions
 
-def calculate_accuracy(measurement, col1, col2, df_state, compare_to_ground_truth=False):
-    df = df_state.value
-    # No changes here (function remains sacred as per your request)
-    if df is None:
-        return "No DataFrame available."
-    if col1 not in df.columns or col2 not in df.columns:
-        return "Selected columns not found in DataFrame."
-
-    results_df = pd.DataFrame()
-    if compare_to_ground_truth:
-        results_df['ground_truth'] = df[col1]
-        results_df['predicted'] = df[col2]
-    else:
-        results_df['extracted_winner'] = df[col1]
-        results_df['truth_result'] = df[col2]
-
-    if measurement == 'Accuracy':
-        result = process_pairwise_accuracy(results_df, compare_to_ground_truth)
-        output_text = (
-            f"Overall Accuracy: {result['overall_accuracy']}\n"
-            f"Number of NaNs: {result['num_extracted_nan']}"
-        )
-    elif measurement == 'Pearson Correlation':
-        result = process_single_rating_pearson_correlation(results_df, compare_to_ground_truth)
-        output_text = (
-            f"Pearson Correlation: {result['overall_pearson_correlation']}\n"
-            f"Number of NaNs: {result['num_extracted_nan']}"
-        )
-    else:
-        output_text = "Unknown measurement selected."
+def judge_display_name(score_column, display_names=None):
+    name = score_column.replace('score_', '', 1)
+    if display_names and name in display_names:
+        return display_names[name]
+    if score_column == 'score_selene':
+        return 'Selene'
+    # Extract model name from column name for display
+    return score_column.replace('score_', '').replace('_', ' ').title()
 
-    return output_text
 
-def process_pairwise_accuracy(results_df: pd.DataFrame, compare_to_ground_truth=False) -> dict:
-    # Compute 'results' column based on whether comparing to ground truth
-    if compare_to_ground_truth:
-        # NEW: convert both columns to float
-        results_df['ground_truth'] = results_df['ground_truth'].apply(convert_to_float_or_nan)
-        results_df['predicted'] = results_df['predicted'].apply(convert_to_float_or_nan)
+def format_estimate(value, interval):
+    """A metric with its bootstrap interval, e.g. 0.7500 [0.6900, 0.8100]"""
+    if interval is None or np.isnan(interval[0]):
+        return format_metric(value)
+    return f"{format_metric(value)} [{interval[0]:.4f}, {interval[1]:.4f}]"
 
-        results_df['results'] = results_df['ground_truth'] == results_df['predicted']
-        num_extracted_nan = int(results_df['predicted'].isna().sum())
-    else:
-        results_df['results'] = results_df['extracted_winner'] == results_df['truth_result']
-        num_extracted_nan = int(results_df['extracted_winner'].isna().sum())
-
-    overall_accuracy = results_df['results'].mean()
-
-    return {
-        "overall_accuracy": overall_accuracy,
-        "num_extracted_nan": num_extracted_nan,
-    }
-
-def process_single_rating_pearson_correlation(
-    results_df: pd.DataFrame, compare_to_ground_truth=False
-) -> dict:
-    if compare_to_ground_truth:
-        pred_col = 'predicted'
-        truth_col = 'ground_truth'
-    else:
-        pred_col = 'extracted_winner'
-        truth_col = 'truth_result'
 
-    results_df[pred_col] = results_df[pred_col].apply(convert_to_float_or_nan)
-    results_df[truth_col] = results_df[truth_col].apply(convert_to_float_or_nan)
+def format_difference(value, interval):
+    """Like format_estimate, starred when the interval excludes 0"""
+    text = format_estimate(value, interval)
+    if not np.isnan(interval[0]) and (interval[0] > 0 or interval[1] < 0):
+        text += " *"
+    return text
 
-    numerical_results = results_df.dropna(subset=[pred_col, truth_col])
 
-    if len(numerical_results) == 0:
-        pearson_corr = np.nan
+def format_judge_result(measurement, ground_truth_col, score_column, report, intervals=None, display_names=None):
+    metrics = report["judges"][score_column]
+    judge_intervals = intervals["judges"][score_column] if intervals else {}
+    lines = [f"Comparison: '{ground_truth_col}' vs. '{judge_display_name(score_column, display_names)}'"]
+    if measurement == 'Accuracy':
+        lines.append(f"Overall Accuracy: {format_estimate(metrics['accuracy'], judge_intervals.get('accuracy'))}")
+    elif measurement in METRICS:
+        key = METRICS[measurement]
+        lines.append(f"{measurement}: {format_estimate(metrics[key], judge_intervals.get(key))}")
     else:
-        pearson_corr = numerical_results[pred_col].corr(numerical_results[truth_col])
-
-    num_extracted_nan = int(results_df[pred_col].isna().sum())
-
-    return {
-        "overall_pearson_correlation": pearson_corr if not pd.isna(pearson_corr) else 0.0,
-        "num_extracted_nan": num_extracted_nan,
-    }
-
-def convert_to_float_or_nan(extracted_input):
-    if extracted_input is None or pd.isna(extracted_input):
-        return np.nan
-    try:
-        return float(extracted_input)
-    except ValueError:
-        return np.nan
\ No newline at end of file
+        lines.append("Unknown measurement selected.")
+    if intervals:
+        lines.append(f"(intervals: {CONFIDENCE_LEVEL:.0%} bootstrap)")
+    lines.append(f"Number of NaNs: {metrics['num_nan']}")
+
+    confusion = report["confusion"][score_column]
+    if confusion is not None:
+        lines.append("\nConfusion matrix (rows: true label, columns: judge score):")
+        lines.append(confusion.to_string())
+    return "\n".join(lines)
@@ -0,0 +1,121 @@
+# sequential_sampling.py
+
+import os
+from statistics import NormalDist
+
+import numpy as np
+
+from bootstrap import CONFIDENCE_LEVEL
+from metrics import factorize
+
+# Rows judged between two updates of the estimate in estimate mode
+ESTIMATE_BATCH_ROWS = int(os.getenv("ESTIMATE_BATCH_ROWS", "200"))
+# Default precision: stop once every judge's accuracy is known to within ± this
+DEFAULT_TARGET_HALF_WIDTH = 0.02
+
+
+def stratified_order(strata, seed=0):
+    """A random order of all rows in which every prefix is proportionally stratified.
+
+    Rows are shuffled within each stratum and the i-th of a stratum's N rows
+    gets the key (i + u) / N, with one random offset u per stratum; sorting
+    by that key interleaves the strata in proportion to their sizes, so
+    taking the next k rows of the order is a stratified sample.
+    """
+    rng = np.random.default_rng(seed)
+    permutation = rng.permutation(len(strata))
+    grouped = permutation[np.argsort(strata[permutation], kind="stable")]
+    codes = strata[grouped]
+    sizes = np.bincount(codes)
+    group_starts = np.cumsum(sizes) - sizes
+    ranks = np.arange(len(codes)) - group_starts[codes]
+    keys = (ranks + rng.random(len(sizes))[codes]) / sizes[codes]
+    return grouped[np.argsort(keys, kind="stable")]
+
+
+class SequentialEstimate:
+    """Stratified accuracy estimates of several judges, refined batch by batch.
+
+    Strata are the true-label values (rows without a label form their own
+    stratum). Each batch continues a stratified random order of the rows, and
+    after it every judge's accuracy and confidence interval are re-estimated
+    from all rows sampled so far. Sampling is done once every interval is at
+    most ± `target_half_width`, the row `budget` is spent, or no rows are left.
+    """
+
+    def __init__(self, labels, judge_names, target_half_width=DEFAULT_TARGET_HALF_WIDTH, budget=None,
+                 batch_rows=ESTIMATE_BATCH_ROWS, confidence=CONFIDENCE_LEVEL, seed=0):
+        self.labels = labels
+        self.judge_names = list(judge_names)
+        self.target_half_width = target_half_width
+        self.budget = min(int(budget), len(labels)) if budget else len(labels)
+        self.batch_rows = max(1, int(batch_rows))
+        self.confidence = confidence
+        self.z = NormalDist().inv_cdf(0.5 + confidence / 2)
+        codes, _ = factorize(labels)
+        self.strata = codes + 1
+        self.stratum_sizes = np.bincount(self.strata)
+        self.order = stratified_order(self.strata, seed)
+        self.sampled = 0
+        self.estimates = {}
+
+    @property
+    def positions(self):
+        """Rows sampled so far, in sampling order"""
+        return self.order[:self.sampled]
+
+    def next_batch(self):
+        stop = min(self.sampled + self.batch_rows, self.budget)
+        batch = self.order[self.sampled:stop]
+        self.sampled = stop
+        return batch
+
+    def update(self, scores):
+        """Re-estimate every judge's accuracy from `scores[judge]` (float arrays over all rows)"""
+        positions = self.positions
+        strata = self.strata[positions]
+        counts = np.bincount(strata, minlength=len(self.stratum_sizes)).astype(float)
+        sampled = counts > 0
+        weights = self.stratum_sizes[sampled] / self.stratum_sizes[sampled].sum()
+        # Finite population correction: a stratum judged in full has no sampling error left
+        correction = 1 - counts[sampled] / self.stratum_sizes[sampled]
+        for name in self.judge_names:
+            correct = scores[name][positions] == self.labels[positions]
+            hits = np.bincount(strata, weights=correct, minlength=len(counts))[sampled]
+            accuracy = hits / counts[sampled]
+            # Smoothed rates keep a stratum that is all right or all wrong so far from claiming zero variance
+            smoothed = (hits + 1) / (counts[sampled] + 2)
+            variance = (weights ** 2 * smoothed * (1 - smoothed) / counts[sampled] * correction).sum()
+            self.estimates[name] = (float((weights * accuracy).sum()), float(self.z * np.sqrt(variance)))
+
+    @property
+    def precise_enough(self):
+        return bool(self.estimates) and all(
+            half_width <= self.target_half_width for _, half_width in self.estimates.values()
+        )
+
+    @property
+    def done(self):
+        return self.precise_enough or self.sampled >= self.budget
+
+    def stop_reason(self):
+        if self.precise_enough:
+            return f"target precision ±{self.target_half_width:g} reached"
+        if self.sampled >= len(self.labels):
+            return "all rows judged"
+        if self.sampled >= self.budget:
+            return f"budget of {self.budget} rows spent"
+        return None
+
+    def summary(self, display_names=None, finished=False):
+        display_names = display_names or {}
+        lines = [
+            f"Estimate from {self.sampled} of {len(self.labels)} rows "
+            f"({self.confidence:.0%} intervals, target ±{self.target_half_width:g}):"
+        ]
+        for name, (accuracy, half_width) in self.estimates.items():
+            lines.append(f"- {display_names.get(name, name)} accuracy {accuracy:.4f} ± {half_width:.4f}")
+        reason = self.stop_reason() if finished else None
+        if reason:
+            lines.append(f"Stopped: {reason}")
+        return "\n".join(lines)
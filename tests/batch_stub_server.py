@@ -0,0 +1,203 @@
+# tests/batch_stub_server.py
+#
+# A local stand-in for the OpenAI Batch and Anthropic Message Batches APIs,
+# enough of them for batch_runner: file upload, batch create/retrieve and
+# result download. Every request gets the reply `reply_for(prompt)`, with the
+# token counts `usage_for(prompt)`, and batches finish after
+# `polls_until_done` status polls.
+#
+#   server = BatchStubServer().start()
+#   ... OPENAI_BATCH_BASE_URL=server.openai_url, ANTHROPIC_BATCH_BASE_URL=server.anthropic_url ...
+#   server.stop()
+
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def reply_for(prompt):
+    return json.dumps({"feedback": f"length {len(prompt)}", "result": len(prompt) % 5 + 1})
+
+
+def usage_for(prompt):
+    """(input tokens, output tokens) reported for a request"""
+    return len(prompt), len(reply_for(prompt))
+
+
+class BatchStubServer:
+    def __init__(self, polls_until_done=1):
+        self.polls_until_done = polls_until_done
+        self.files = {}
+        self.openai_batches = {}
+        self.anthropic_batches = {}
+        self.lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    @property
+    def openai_url(self):
+        return self.url + "/v1"
+
+    @property
+    def anthropic_url(self):
+        return self.url
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _new_id(self, prefix, store):
+        return f"{prefix}_{len(store)}"
+
+    def _create_openai_batch(self, request):
+        lines = [json.loads(line) for line in self.files[request["input_file_id"]].decode().splitlines() if line]
+        output = "".join(json.dumps({
+            "id": "response",
+            "custom_id": line["custom_id"],
+            "response": {"status_code": 200, "request_id": "request", "body": self._openai_body(
+                line["body"]["messages"][-1]["content"]
+            )},
+            "error": None,
+        }) + "\n" for line in lines)
+        output_id = self._new_id("file-output", self.files)
+        self.files[output_id] = output.encode()
+        batch_id = self._new_id("batch", self.openai_batches)
+        batch = {
+            "id": batch_id, "object": "batch", "endpoint": "/v1/chat/completions",
+            "input_file_id": request["input_file_id"], "completion_window": "24h", "status": "in_progress",
+            "created_at": 0, "output_file_id": output_id,
+            "request_counts": {"total": len(lines), "completed": 0, "failed": 0},
+        }
+        self.openai_batches[batch_id] = {"batch": batch, "polls": 0}
+        return batch
+
+    @staticmethod
+    def _openai_body(prompt):
+        input_tokens, output_tokens = usage_for(prompt)
+        return {
+            "choices": [{
+                "index": 0, "finish_reason": "stop",
+                "message": {"role": "assistant", "content": reply_for(prompt)},
+            }],
+            "usage": {
+                "prompt_tokens": input_tokens, "completion_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens,
+            },
+        }
+
+    def _poll_openai_batch(self, batch_id):
+        entry = self.openai_batches[batch_id]
+        entry["polls"] += 1
+        batch = entry["batch"]
+        if entry["polls"] >= self.polls_until_done:
+            batch["status"] = "completed"
+            batch["request_counts"]["completed"] = batch["request_counts"]["total"]
+        return batch
+
+    def _create_anthropic_batch(self, request):
+        batch_id = self._new_id("msgbatch", self.anthropic_batches)
+        results = "".join(json.dumps({
+            "custom_id": item["custom_id"],
+            "result": {"type": "succeeded", "message": self._anthropic_message(
+                item["params"]["model"], item["params"]["messages"][-1]["content"][0]["text"]
+            )},
+        }) + "\n" for item in request["requests"])
+        batch = {
+            "id": batch_id, "type": "message_batch", "processing_status": "in_progress",
+            "request_counts": {
+                "processing": len(request["requests"]), "succeeded": 0, "errored": 0, "canceled": 0, "expired": 0,
+            },
+            "created_at": "2024-01-01T00:00:00Z", "expires_at": "2024-01-02T00:00:00Z", "ended_at": None,
+            "archived_at": None, "cancel_initiated_at": None,
+            "results_url": f"{self.url}/v1/messages/batches/{batch_id}/results",
+        }
+        self.anthropic_batches[batch_id] = {"batch": batch, "results": results, "polls": 0}
+        return batch
+
+    @staticmethod
+    def _anthropic_message(model, prompt):
+        input_tokens, output_tokens = usage_for(prompt)
+        return {
+            "id": "message", "type": "message", "role": "assistant", "model": model,
+            "content": [{"type": "text", "text": reply_for(prompt)}],
+            "stop_reason": "end_turn", "stop_sequence": None,
+            "usage": {"input_tokens": input_tokens, "output_tokens": output_tokens},
+        }
+
+    def _poll_anthropic_batch(self, batch_id):
+        entry = self.anthropic_batches[batch_id]
+        entry["polls"] += 1
+        batch = entry["batch"]
+        if entry["polls"] >= self.polls_until_done and batch["processing_status"] != "ended":
+            counts = batch["request_counts"]
+            batch["processing_status"] = "ended"
+            batch["ended_at"] = "2024-01-01T00:00:00Z"
+            counts["succeeded"], counts["processing"] = counts["processing"], 0
+        return batch
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, body, content_type="application/json"):
+                if not isinstance(body, bytes):
+                    body = json.dumps(body).encode()
+                self.send_response(200)
+                self.send_header("content-type", content_type)
+                self.send_header("content-length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _not_found(self):
+                self.send_response(404)
+                self.send_header("content-length", "0")
+                self.end_headers()
+
+            def do_POST(self):
+                data = self.rfile.read(int(self.headers.get("content-length", 0)))
+                with server.lock:
+                    if self.path == "/v1/files":
+                        boundary = re.search(r"boundary=(\S+)", self.headers["content-type"]).group(1).encode()
+                        part = next(part for part in data.split(b"--" + boundary) if b"filename=" in part)
+                        content = part.split(b"\r\n\r\n", 1)[1].rsplit(b"\r\n", 1)[0]
+                        file_id = server._new_id("file", server.files)
+                        server.files[file_id] = content
+                        return self._send({
+                            "id": file_id, "object": "file", "bytes": len(content), "created_at": 0,
+                            "filename": "input.jsonl", "purpose": "batch", "status": "processed",
+                        })
+                    if self.path == "/v1/batches":
+                        return self._send(server._create_openai_batch(json.loads(data)))
+                    if self.path == "/v1/messages/batches":
+                        return self._send(server._create_anthropic_batch(json.loads(data)))
+                self._not_found()
+
+            def do_GET(self):
+                with server.lock:
+                    match = re.fullmatch(r"/v1/batches/(\w+)", self.path)
+                    if match and match.group(1) in server.openai_batches:
+                        return self._send(server._poll_openai_batch(match.group(1)))
+                    match = re.fullmatch(r"/v1/files/([\w-]+)/content", self.path)
+                    if match and match.group(1) in server.files:
+                        return self._send(server.files[match.group(1)], "application/octet-stream")
+                    match = re.fullmatch(r"/v1/messages/batches/(\w+)/results", self.path)
+                    if match and match.group(1) in server.anthropic_batches:
+                        return self._send(server.anthropic_batches[match.group(1)]["results"].encode(),
+                                          "application/binary")
+                    match = re.fullmatch(r"/v1/messages/batches/(\w+)", self.path)
+                    if match and match.group(1) in server.anthropic_batches:
+                        return self._send(server._poll_anthropic_batch(match.group(1)))
+                self._not_found()
+
+        return Handler
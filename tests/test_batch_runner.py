@@ -0,0 +1,130 @@
+# tests/test_batch_runner.py
+
+import asyncio
+import json
+import os
+
+import pytest
+
+import batch_runner
+import clients
+from batch_stub_server import BatchStubServer, reply_for, usage_for
+from run_journal import RunJournal
+from usage_tracker import RunUsage, estimate_cost, track_run
+
+PROMPTS = [(position, f"Prompt for row {position}" + "." * position) for position in range(7)]
+
+
+@pytest.fixture
+def server(monkeypatch, tmp_path):
+    server = BatchStubServer(polls_until_done=2).start()
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "test")
+    monkeypatch.setattr(batch_runner, "OPENAI_BATCH_BASE_URL", server.openai_url)
+    monkeypatch.setattr(batch_runner, "ANTHROPIC_BATCH_BASE_URL", server.anthropic_url)
+    monkeypatch.setattr(batch_runner, "BATCH_POLL_SECONDS", 0)
+    monkeypatch.setattr(batch_runner, "BATCH_DIR", str(tmp_path))
+    # Async clients are bound to the event loop they were first used on
+    monkeypatch.setattr(clients, "_clients", {})
+    monkeypatch.setattr(clients, "_http_clients", {})
+    yield server
+    server.stop()
+
+
+@pytest.mark.parametrize("organization, api_model", [("OpenAI", "gpt-4o"), ("Anthropic", "claude-3-5-haiku-latest")])
+def test_batch_evaluation_returns_a_reply_per_prompt(server, organization, api_model):
+    statuses = []
+    replies = asyncio.run(batch_runner.run_batch_evaluation(
+        {"organization": organization, "api_model": api_model}, PROMPTS, on_status=statuses.append,
+    ))
+    assert replies == {position: reply_for(prompt) for position, prompt in PROMPTS}
+    assert statuses
+
+
+def test_batches_are_split_by_request_count_and_size(server, monkeypatch):
+    monkeypatch.setitem(batch_runner.MAX_REQUESTS_PER_BATCH, "OpenAI", 3)
+    replies = asyncio.run(batch_runner.run_openai_batch("gpt-4o", PROMPTS))
+    assert len(replies) == len(PROMPTS)
+    assert len(server.openai_batches) == 3
+
+    lines = [json.dumps(line) for line in batch_runner.build_anthropic_batch_requests("model", PROMPTS)]
+    monkeypatch.setitem(batch_runner.MAX_BYTES_PER_BATCH, "Anthropic", 2 * max(map(len, lines)) + 10)
+    replies = asyncio.run(batch_runner.run_anthropic_batch("model", PROMPTS))
+    assert len(replies) == len(PROMPTS)
+    assert len(server.anthropic_batches) == 4
+
+
+def test_input_files_are_unique_and_removed_after_upload(server, tmp_path):
+    first = batch_runner.write_batch_file(["{}\n"], "openai-gpt-4o")
+    second = batch_runner.write_batch_file(["{}\n"], "openai-gpt-4o")
+    assert first != second
+    os.remove(first)
+    os.remove(second)
+
+    asyncio.run(batch_runner.run_openai_batch("gpt-4o", PROMPTS))
+    assert os.listdir(tmp_path) == []
+    # The uploaded input holds exactly this run's requests
+    uploaded = [json.loads(line) for line in server.files["file_0"].decode().splitlines()]
+    assert [line["custom_id"] for line in uploaded] == [f"row-{position}" for position, _ in PROMPTS]
+
+
+def test_chunks_respect_both_limits():
+    items = list(range(10))
+    sizes = [5] * 10
+    assert [len(chunk) for chunk in batch_runner._chunks(items, sizes, 4, 1000)] == [4, 4, 2]
+    assert [len(chunk) for chunk in batch_runner._chunks(items, sizes, 100, 12)] == [2] * 5
+    # An item larger than the byte limit still goes out, on its own
+    assert list(batch_runner._chunks([1, 2], [50, 5], 100, 10)) == [[1], [2]]
+
+
+@pytest.mark.parametrize("organization, api_model", [("OpenAI", "gpt-4o"), ("Anthropic", "claude-3-5-haiku-latest")])
+def test_resumed_batches_are_polled_not_resubmitted(server, organization, api_model):
+    model_info = {"organization": organization, "api_model": api_model}
+    journaled = []
+    asyncio.run(batch_runner.run_batch_evaluation(
+        model_info, PROMPTS[:4], on_submit=lambda batch_id, rows: journaled.append((batch_id, rows)),
+    ))
+    assert [rows for _, rows in journaled] == [[0, 1, 2, 3]]
+
+    submitted = []
+    replies = asyncio.run(batch_runner.run_batch_evaluation(
+        model_info, PROMPTS, submitted=journaled,
+        on_submit=lambda batch_id, rows: submitted.append((batch_id, rows)),
+    ))
+    assert replies == {position: reply_for(prompt) for position, prompt in PROMPTS}
+    # Only the rows the earlier batch didn't cover went into a new one
+    assert [rows for _, rows in submitted] == [[4, 5, 6]]
+    batches = server.openai_batches if organization == "OpenAI" else server.anthropic_batches
+    assert len(batches) == 2
+
+
+def test_journal_keeps_only_unfinished_batches(tmp_path):
+    journal = RunJournal("run", directory=str(tmp_path))
+    journal.open()
+    journal.append_batch("judge", "batch-1", [0, 1])
+    journal.append_batch("judge", "batch-2", [2])
+    journal.append("judge", 0, 4.0, "ok")
+    journal.finish_batch("judge", "batch-1")
+    journal.close()
+
+    assert journal.load_batches() == {"judge": [("batch-2", [2])]}
+    assert journal.load() == [("judge", 0, 4.0, "ok")]
+
+
+@pytest.mark.parametrize("organization, api_model", [("OpenAI", "gpt-4o"), ("Anthropic", "claude-3-5-haiku-latest")])
+def test_batch_rows_record_usage_at_the_batch_price(server, organization, api_model):
+    usage = RunUsage(len(PROMPTS), ["judge"])
+    asyncio.run(track_run(usage, batch_runner.run_batch_evaluation(
+        {"organization": organization, "api_model": api_model}, PROMPTS, judge="judge",
+    )))
+
+    row = usage.rows["judge"]
+    for position, prompt in PROMPTS:
+        input_tokens, output_tokens = usage_for(prompt)
+        assert row["input_tokens"][position] == input_tokens
+        assert row["output_tokens"][position] == output_tokens
+        assert row["cost"][position] == pytest.approx(
+            estimate_cost(api_model, input_tokens, output_tokens, batch=True)
+        )
+        assert row["cost"][position] < estimate_cost(api_model, input_tokens, output_tokens)
+    assert usage.summary()[0]["Calls"] == len(PROMPTS)
@@ -0,0 +1,81 @@
+# tests/test_bootstrap.py
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import bootstrap
+from metrics import compute_metrics, prepare_columns
+
+
+def judged(rng, rows, accuracy):
+    """True labels 1..5 and a judge that is right with probability `accuracy`, else off by one"""
+    truth = rng.integers(1, 6, rows)
+    wrong = rng.random(rows) >= accuracy
+    judge = np.where(wrong, np.where(truth == 5, 4, truth + 1), truth)
+    return pd.DataFrame({"label": truth, "judge": judge.astype(float)})
+
+
+def test_accuracy_intervals_cover_the_true_accuracy_at_their_level():
+    rng = np.random.default_rng(2024)
+    covered = 0
+    datasets = 200
+    for seed in range(datasets):
+        df = judged(rng, 150, accuracy=0.7)
+        low, high = bootstrap.bootstrap_metrics(
+            prepare_columns(df, "label", ["judge"]), ["judge"], samples=400, seed=seed,
+        )["judges"]["judge"]["accuracy"]
+        covered += low <= 0.7 <= high
+    # Nominal 95%; the bounds leave room for the Monte Carlo error of 200 datasets
+    assert 0.88 <= covered / datasets <= 0.99
+
+
+def test_intervals_are_reproducible_with_a_seed_and_contain_the_estimate():
+    df = judged(np.random.default_rng(1), 300, accuracy=0.6)
+    prepared = prepare_columns(df, "label", ["judge"])
+    first = bootstrap.bootstrap_metrics(prepared, ["judge"], samples=300, seed=5)
+    assert first == bootstrap.bootstrap_metrics(prepared, ["judge"], samples=300, seed=5)
+    assert first != bootstrap.bootstrap_metrics(prepared, ["judge"], samples=300, seed=6)
+
+    point = compute_metrics(df, "label", ["judge"], prepared)["judges"]["judge"]
+    for key in ("accuracy", "pearson", "spearman", "kendall_tau", "mae", "cohen_kappa"):
+        low, high = first["judges"]["judge"][key]
+        assert low <= point[key] <= high, key
+
+
+def test_table_counts_match_resampling_rows():
+    # A continuous judge forces per-row index resampling for every comparison
+    rng = np.random.default_rng(3)
+    df = judged(rng, 400, accuracy=0.65)
+    df["continuous"] = df["label"] + rng.normal(0, 1, len(df))
+    tables_only = bootstrap.bootstrap_metrics(prepare_columns(df, "label", ["judge"]), ["judge"], samples=2000)
+    with_rows = bootstrap.bootstrap_metrics(
+        prepare_columns(df, "label", ["judge", "continuous"]), ["judge", "continuous"], samples=2000,
+    )
+    for multinomial, resampled in zip(tables_only["judges"]["judge"]["accuracy"], with_rows["judges"]["judge"]["accuracy"]):
+        assert multinomial == pytest.approx(resampled, abs=0.015)
+
+
+def test_differences_are_paired():
+    df = judged(np.random.default_rng(4), 200, accuracy=0.7)
+    df["same_judge"] = df["judge"]
+    report = bootstrap.bootstrap_metrics(prepare_columns(df, "label", ["judge", "same_judge"]), ["judge", "same_judge"])
+    column_a, column_b, differences = report["differences"][0]
+    assert (column_a, column_b) == ("judge", "same_judge")
+    assert differences["accuracy"] == (0.0, 0.0)
+
+
+def test_worker_processes_give_the_requested_replicates(monkeypatch):
+    df = judged(np.random.default_rng(5), 200, accuracy=0.7)
+    prepared = prepare_columns(df, "label", ["judge"])
+    comparisons = [bootstrap._comparison(prepared[0][:, 0], prepared[0][:, 1], *prepared[1])]
+    monkeypatch.setattr(bootstrap, "BOOTSTRAP_PROCESSES", 2)
+    monkeypatch.setattr(bootstrap, "PROCESS_POOL_MIN_CELLS", 1)
+    replicates = bootstrap._run_replicates(comparisons, len(df), 301, seed=0)
+    assert len(replicates[0]["accuracy"]) == 301
+
+
+def test_empty_data_has_no_interval():
+    df = pd.DataFrame({"label": [], "judge": []})
+    report = bootstrap.bootstrap_metrics(prepare_columns(df, "label", ["judge"]), ["judge"], samples=10)
+    assert all(np.isnan(low) and np.isnan(high) for low, high in report["judges"]["judge"].values())
@@ -0,0 +1,124 @@
+# tests/test_data_loader.py
+
+import gzip
+import json
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather
+import pyarrow.parquet
+import pytest
+
+import data_loader
+
+RECORDS = [
+    {"question": f"q{i}", "answer": {"text": f"a{i}", "score": i}, "label": i % 5 + 1}
+    for i in range(7)
+]
+FLAT = pd.json_normalize(RECORDS, sep=".")
+
+
+def write_text(path, text):
+    if str(path).endswith(".gz"):
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            f.write(text)
+    elif str(path).endswith(".zst"):
+        zstandard = pytest.importorskip("zstandard")
+        path.write_bytes(zstandard.ZstdCompressor().compress(text.encode("utf-8")))
+    else:
+        path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+JSON_LINES = "".join(json.dumps(record) + "\n" for record in RECORDS)
+
+
+@pytest.mark.parametrize("name, text", [
+    ("data.json", json.dumps(RECORDS, indent=2)),
+    ("data.json", json.dumps({"data": RECORDS})),
+    ("data.json", JSON_LINES),
+    ("data.jsonl", JSON_LINES),
+    ("data.ndjson", "\n" + JSON_LINES.replace("\n", "\n\n")),
+    ("data.json.gz", json.dumps(RECORDS)),
+    ("data.jsonl.gz", JSON_LINES),
+    ("data.jsonl.zst", JSON_LINES),
+])
+def test_json_files_load_flattened(tmp_path, name, text):
+    df = data_loader.load_dataframe(write_text(tmp_path / name, text), chunk_rows=3)
+    pd.testing.assert_frame_equal(df, FLAT)
+
+
+def test_a_single_json_object_is_one_row(tmp_path):
+    df = data_loader.load_dataframe(write_text(tmp_path / "data.json", json.dumps(RECORDS[0])))
+    pd.testing.assert_frame_equal(df, FLAT.iloc[:1])
+
+
+def test_json_arrays_stream_across_read_blocks(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_loader, "READ_BLOCK_CHARS", 16)
+    numbers = [{"value": 12345.5 * i} for i in range(50)]
+    df = data_loader.load_dataframe(write_text(tmp_path / "data.json", json.dumps(numbers)))
+    assert df["value"].tolist() == [number["value"] for number in numbers]
+
+
+def write_columnar(tmp_path, name):
+    table = pa.Table.from_pandas(FLAT, preserve_index=False)
+    path = str(tmp_path / name)
+    if name.endswith(".parquet"):
+        pa.parquet.write_table(table, path, row_group_size=3)
+    elif name.endswith(".arrow"):
+        pa.feather.write_feather(table, path, chunksize=3, compression="lz4")
+    elif name.endswith(".ipc"):
+        with pa.ipc.new_stream(path, table.schema) as writer:
+            writer.write_table(table, max_chunksize=3)
+    elif name.endswith(".csv.gz"):
+        FLAT.to_csv(path, index=False, compression="gzip")
+    else:
+        FLAT.to_csv(path, index=False)
+    return path
+
+
+@pytest.mark.parametrize("name, total_rows", [
+    ("data.parquet", 7), ("data.arrow", 7), ("data.ipc", None), ("data.csv", None), ("data.csv.gz", None),
+])
+def test_columnar_preview_reads_the_first_rows(tmp_path, name, total_rows):
+    path = write_columnar(tmp_path, name)
+    assert data_loader.is_columnar(path)
+
+    preview, columns, rows = data_loader.preview_columnar(path, rows=4)
+
+    pd.testing.assert_frame_equal(preview, FLAT.iloc[:4], check_dtype=False)
+    assert columns == FLAT.columns.tolist()
+    assert rows == total_rows
+
+
+@pytest.mark.parametrize("name", ["data.parquet", "data.arrow", "data.ipc", "data.csv", "data.csv.gz"])
+def test_load_columns_reads_only_the_mapped_columns(tmp_path, name):
+    path = write_columnar(tmp_path, name)
+    columns = ["label", "question", "label"]
+
+    df = data_loader.load_columns(path, columns)
+
+    pd.testing.assert_frame_equal(df, FLAT[["label", "question"]], check_dtype=False)
+
+
+def test_stream_files_report_missing_columns(tmp_path):
+    path = write_columnar(tmp_path, "data.ipc")
+    with pytest.raises(ValueError, match="missing"):
+        data_loader.load_columns(path, ["question", "missing"])
+
+
+@pytest.mark.parametrize("name", ["data.parquet.gz", "data.arrow.zst"])
+def test_compressed_parquet_and_arrow_are_rejected_before_reading(tmp_path, name):
+    path = tmp_path / name
+    path.write_bytes(b"never read")
+    path = str(path)
+    assert not any(name.endswith(file_type) for file_type in data_loader.UPLOAD_FILE_TYPES)
+    with pytest.raises(ValueError, match="compressed"):
+        data_loader.preview_columnar(path)
+    with pytest.raises(ValueError, match="compressed"):
+        data_loader.load_columns(path, ["question"])
+
+
+def test_compressed_json_and_csv_uploads_are_accepted():
+    for name in ["data.json.gz", "data.jsonl.zst", "data.ndjson.gz", "data.csv.zst"]:
+        assert any(name.endswith(file_type) for file_type in data_loader.UPLOAD_FILE_TYPES)
@@ -0,0 +1,97 @@
+# tests/test_evaluation_engine.py
+
+import asyncio
+
+import numpy as np
+
+from evaluation_engine import EvaluationProgress, evaluate_rows, find_duplicates
+from run_journal import RunJournal
+
+ROWS = [{"text": text} for text in ["a", "b", "a", "c", "b", "a", "error"]]
+
+
+def make_judges(calls):
+    async def judge(context, offset):
+        calls.append((offset, context["text"]))
+        await asyncio.sleep(0)
+        if context["text"] == "error":
+            raise RuntimeError("provider down")
+        return str(ord(context["text"]) - ord("a") + offset), f"critique of {context['text']}"
+
+    return {
+        "first": lambda context: judge(context, 1),
+        "second": lambda context: judge(context, 2),
+    }
+
+
+def duplicates_of(rows):
+    return find_duplicates(row["text"] for row in rows)
+
+
+def test_find_duplicates_maps_first_rows_to_their_repeats():
+    assert duplicates_of(ROWS) == {0: [2, 5], 1: [4]}
+    assert find_duplicates([]) == {}
+
+
+def test_each_distinct_row_is_judged_once_and_fanned_out():
+    calls = []
+    reported = []
+    progress = asyncio.run(evaluate_rows(
+        ROWS, make_judges(calls), max_workers=3, duplicates=duplicates_of(ROWS),
+        on_result=lambda *result: reported.append(result),
+    ))
+
+    assert sorted(calls) == sorted((offset, text) for offset in (1, 2) for text in ["a", "b", "c", "error"])
+    np.testing.assert_array_equal(progress.scores["first"], [1, 2, 1, 3, 2, 1, np.nan])
+    np.testing.assert_array_equal(progress.scores["second"], [2, 3, 2, 4, 3, 2, np.nan])
+    assert progress.critiques["second"][5] == "critique of a"
+    assert progress.critiques["first"][6] == "Error evaluating row: provider down"
+    assert progress.completed_rows == len(ROWS) and progress.completed_mask.all()
+    assert progress.saved_calls == 6
+    assert progress.errors == 2
+    # Every row's result is reported, the fanned-out copies included
+    assert sorted((name, position) for name, position, _, _ in reported) == sorted(
+        (name, position) for name in ("first", "second") for position in range(len(ROWS))
+    )
+
+
+def test_positions_restrict_the_run():
+    calls = []
+    progress = asyncio.run(evaluate_rows(ROWS, make_judges(calls), positions=[3, 1]))
+    assert sorted(text for _, text in calls) == ["b", "b", "c", "c"]
+    assert progress.completed_mask.tolist() == [False, True, False, True, False, False, False]
+
+
+def test_a_resumed_run_only_makes_the_missing_calls(tmp_path):
+    journal = RunJournal("run", directory=str(tmp_path))
+    journal.open()
+    duplicates = duplicates_of(ROWS)
+
+    # An interrupted run: the first judge finished row "a" (fanned out to its repeats) and row "c"
+    interrupted = EvaluationProgress(len(ROWS), ["first", "second"])
+    for position, result in [(0, ("1", "critique of a")), (3, ("3", "critique of c"))]:
+        interrupted.record("first", position, result)
+        for filled in [position, *interrupted.fan_out("first", position, duplicates.get(position, ()))]:
+            journal.append("first", filled, interrupted.scores["first"][filled], interrupted.critiques["first"][filled])
+    # Only the first of the repeats made it to the journal before the crash
+    journal.close()
+    entries = [entry for entry in journal.load() if entry[1] != 5]
+
+    # Restored the way model_handler restores a journal
+    progress = EvaluationProgress(len(ROWS), ["first", "second"])
+    for name, position, score, critique in entries:
+        progress.record(name, position, (score, critique))
+    for position, positions in duplicates.items():
+        if progress.recorded["first"][position]:
+            progress.fan_out("first", position, positions, count_saved=False)
+    progress.mark_restored()
+    assert progress.recorded["first"][[0, 2, 3, 5]].all()
+
+    calls = []
+    asyncio.run(evaluate_rows(ROWS, make_judges(calls), progress=progress, duplicates=duplicates))
+
+    assert sorted(calls) == sorted([(1, "b"), (1, "error")] + [(2, text) for text in ["a", "b", "c", "error"]])
+    np.testing.assert_array_equal(progress.scores["first"], [1, 2, 1, 3, 2, 1, np.nan])
+    assert progress.completed_rows == len(ROWS)
+    # No row had both judges' results before the restart, so none counts as resumed
+    assert progress.restored_rows == 0
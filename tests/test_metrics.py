@@ -0,0 +1,102 @@
+# tests/test_metrics.py
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import metrics
+
+stats = pytest.importorskip("scipy.stats")
+sklearn_metrics = pytest.importorskip("sklearn.metrics")
+
+
+@pytest.fixture
+def scores():
+    rng = np.random.default_rng(7)
+    truth = rng.integers(1, 6, 300).astype(float)
+    judge = np.clip(truth + rng.integers(-2, 3, 300), 1, 5)
+    judge[rng.choice(300, 15, replace=False)] = np.nan
+    return truth, judge
+
+
+def reference_metrics(x, y, categorical=True):
+    both = ~np.isnan(x) & ~np.isnan(y)
+    x_both, y_both = x[both], y[both]
+    reference = {
+        "accuracy": (x == y).mean(),
+        "pearson": stats.pearsonr(x_both, y_both)[0],
+        "spearman": stats.spearmanr(x_both, y_both)[0],
+        "kendall_tau": stats.kendalltau(x_both, y_both)[0],
+        "mae": sklearn_metrics.mean_absolute_error(x_both, y_both),
+        "rmse": np.sqrt(sklearn_metrics.mean_squared_error(x_both, y_both)),
+    }
+    if categorical:
+        # Categories 1..5 are evenly spaced, so weights on values equal sklearn's weights on label indices
+        reference["cohen_kappa"] = sklearn_metrics.cohen_kappa_score(x_both, y_both)
+        reference["weighted_kappa"] = sklearn_metrics.cohen_kappa_score(x_both, y_both, weights="quadratic")
+    return reference
+
+
+def test_categorical_metrics_match_scipy_and_sklearn(scores):
+    truth, judge = scores
+    result, confusion = metrics.pair_metrics(truth, judge)
+
+    for key, expected in reference_metrics(truth, judge).items():
+        assert result[key] == pytest.approx(expected), key
+    assert (result["rows"], result["pairs"], result["num_nan"]) == (300, 285, 15)
+
+    both = ~np.isnan(judge)
+    expected_confusion = sklearn_metrics.confusion_matrix(truth[both], judge[both], labels=[1, 2, 3, 4, 5])
+    assert confusion.to_numpy().tolist() == expected_confusion.tolist()
+    assert confusion.index.tolist() == ["1", "2", "3", "4", "5"]
+
+
+def test_continuous_metrics_match_scipy_and_sklearn(scores):
+    truth, _ = scores
+    rng = np.random.default_rng(8)
+    judge = truth + rng.normal(0, 0.7, len(truth))
+    judge[:5] = np.nan
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(metrics, "MAX_CONTINGENCY_CELLS", 0)
+        result, confusion = metrics.pair_metrics(truth, judge)
+
+    expected = reference_metrics(truth, judge, categorical=False)
+    for key in ("accuracy", "pearson", "spearman", "mae", "rmse"):
+        assert result[key] == pytest.approx(expected[key]), key
+    assert np.isnan(result["kendall_tau"]) and np.isnan(result["cohen_kappa"])
+    assert confusion is None
+
+
+def test_contingency_and_row_paths_agree(scores, monkeypatch):
+    truth, judge = scores
+    categorical, _ = metrics.pair_metrics(truth, judge)
+    monkeypatch.setattr(metrics, "MAX_CONTINGENCY_CELLS", 0)
+    continuous, _ = metrics.pair_metrics(truth, judge)
+    for key in ("accuracy", "pearson", "spearman", "mae", "rmse"):
+        assert categorical[key] == pytest.approx(continuous[key]), key
+
+
+def test_constant_scores_have_no_correlation():
+    truth = np.array([1.0, 2.0, 3.0, 4.0])
+    result, _ = metrics.pair_metrics(truth, np.full(4, 3.0))
+    assert np.isnan(result["pearson"]) and np.isnan(result["spearman"])
+    assert result["accuracy"] == 0.25
+
+
+def test_to_numeric_turns_error_scores_into_nan():
+    series = pd.Series(["4", 3, "Error", None, "2.5", "4"], dtype=object)
+    np.testing.assert_array_equal(metrics.to_numeric(series), [4.0, 3.0, np.nan, np.nan, 2.5, 4.0])
+
+
+def test_compute_metrics_scores_judges_and_every_pair(scores):
+    truth, judge = scores
+    df = pd.DataFrame({"label": truth, "score_a": judge, "score_b": truth, "score_c": np.where(judge > 2, "Error", judge)})
+    report = metrics.compute_metrics(df, "label", ["score_a", "score_b", "score_c"])
+
+    assert report["judges"]["score_b"]["accuracy"] == 1.0
+    assert report["judges"]["score_a"]["cohen_kappa"] == pytest.approx(reference_metrics(truth, judge)["cohen_kappa"])
+    assert [(a, b) for a, b, _ in report["agreement"]] == [
+        ("score_a", "score_b"), ("score_a", "score_c"), ("score_b", "score_c"),
+    ]
+    a_vs_b = report["agreement"][0][2]
+    assert a_vs_b["pearson"] == pytest.approx(reference_metrics(judge, truth)["pearson"])
@@ -0,0 +1,33 @@
+# tests/test_parse.py
+
+import json
+import logging
+import os
+
+import pytest
+
+from get_llm_answer import extract_judgment, parse_model_response
+
+CORPUS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks", "messy_replies.jsonl")
+
+with open(CORPUS, encoding="utf-8") as f:
+    REPLIES = [json.loads(line) for line in f if line.strip()]
+
+
+@pytest.mark.parametrize("entry", REPLIES, ids=lambda entry: entry["reply"][:40])
+def test_messy_replies_parse_to_their_score(entry):
+    score, _ = parse_model_response(entry["reply"])
+    assert score == (entry["result"] if entry["result"] is not None else "Error")
+
+
+def test_the_judgment_holding_the_last_result_key_wins():
+    nested = '{"feedback": "x", "details": {"result": 2}, "result": 4}'
+    assert extract_judgment(nested)["result"] == 4
+    quoted_later = 'Here is {"feedback": "x", "result": 4}, where "result" is the score'
+    assert extract_judgment(quoted_later)["result"] == 4
+
+
+def test_unparseable_replies_are_logged(caplog):
+    with caplog.at_level(logging.WARNING, logger="get_llm_answer"):
+        assert parse_model_response("I cannot evaluate this request.")[0] == "Error"
+    assert "Failed to parse response" in caplog.text
@@ -0,0 +1,119 @@
+# tests/test_prompt_templates.py
+
+import re
+
+import numpy as np
+import pandas as pd
+import pytest
+from jinja2 import Template
+
+import prompt_templates
+from criteria_handler import EVALUATION_TEMPLATE
+from prompt_templates import (
+    build_contexts, get_template, parse_variables, render_dataframe, substitute_variables,
+)
+from random_sample.prompts import DEFAULT_EVAL_PROMPT
+
+MAPPINGS = {
+    "model_input": "question",
+    "model_output": "answer",
+    "model_context": "context",
+    "expected_model_output": "None",
+    "evaluation_criteria": "Rate the answer from 1 to 5.",
+}
+
+TEMPLATES = [
+    EVALUATION_TEMPLATE,
+    "{{ model_input }} -> {{ model_output }}{% if model_context %} ({{ model_context }}){% endif %}",
+    "{% for word in model_output.split() %}[{{ word | upper }}]{% endfor %} {{ missing }}|{{ evaluation_criteria }}",
+    "  {{ model_input }}\n\n{{- model_output -}}\n  ",
+]
+
+
+@pytest.fixture
+def df():
+    return pd.DataFrame({
+        "question": ["What is 2 + 2?", "Explain ünïcode ✓", "", "Why?"],
+        "answer": ["4", "Bytes & {{ braces }} <b>", None, 12.5],
+        "context": [np.nan, "ctx", "more ctx", 7],
+        "label": [1, 2, 3, 4],
+    })
+
+
+def render_previous(source, df):
+    """The per-row path prompt_templates replaced: iterrows, str() cells and a fresh jinja2.Template"""
+    template = Template(source)
+    prompts = []
+    for _, row in df.iterrows():
+        context = {}
+        for key, column in MAPPINGS.items():
+            if key == "evaluation_criteria":
+                continue
+            elif column and column != "None":
+                context[key] = str(row[column])
+        context["evaluation_criteria"] = MAPPINGS["evaluation_criteria"]
+        prompts.append(template.render(**context))
+    return prompts
+
+
+@pytest.mark.parametrize("source", TEMPLATES)
+def test_compiled_rendering_matches_the_previous_jinja_path(df, source):
+    constants = {"evaluation_criteria": MAPPINGS["evaluation_criteria"]}
+    contexts = build_contexts(df, MAPPINGS, constants)
+
+    assert get_template(source).render_many(contexts) == render_previous(source, df)
+    assert [get_template(source).render(context) for context in contexts] == render_previous(source, df)
+    assert render_dataframe(source, df, MAPPINGS, constants) == render_previous(source, df)
+
+
+def test_contexts_hold_only_mapped_columns_and_constants(df):
+    contexts = build_contexts(df, MAPPINGS, {"evaluation_criteria": "criteria"})
+    assert contexts[0] == {
+        "model_input": "What is 2 + 2?", "model_output": "4", "model_context": "nan", "evaluation_criteria": "criteria",
+    }
+    assert build_contexts(df, {"model_input": "None"}, {"x": 1}) == [{"x": 1}] * len(df)
+
+
+def test_templates_are_compiled_once_and_evicted_least_recently_used(monkeypatch):
+    monkeypatch.setattr(prompt_templates, "_templates", type(prompt_templates._templates)())
+    monkeypatch.setattr(prompt_templates, "TEMPLATE_CACHE_SIZE", 2)
+    first = get_template("{{ a }}")
+    assert get_template("{{ a }}") is first
+    assert first.variables == {"a"}
+
+    get_template("{{ b }}")
+    get_template("{{ a }}")
+    get_template("{{ c }}")
+    assert get_template("{{ a }}") is first
+    assert set(prompt_templates._templates) == {
+        prompt_templates.template_hash("{{ a }}"), prompt_templates.template_hash("{{ c }}"),
+    }
+
+
+def parse_variables_previous(prompt):
+    variables = re.findall(r"{{(.*?)}}", prompt)
+    seen = set()
+    return [x.strip() for x in variables if not (x.strip() in seen or seen.add(x.strip()))]
+
+
+def substitute_previous(prompt, values):
+    for variable, value in values.items():
+        prompt = prompt.replace("{{" + variable + "}}", value)
+    return prompt
+
+
+@pytest.mark.parametrize("prompt", [
+    DEFAULT_EVAL_PROMPT,
+    "{{input}} and {{output}} then {{input}} again, {{unknown}}",
+    "no placeholders",
+])
+def test_arena_placeholders_match_the_previous_helpers(prompt):
+    assert parse_variables(prompt) == parse_variables_previous(prompt)
+    values = {variable: f"<{variable} value>" for variable in parse_variables(prompt) if variable != "unknown"}
+    assert substitute_variables(prompt, values) == substitute_previous(prompt, values)
+
+
+def test_substituted_values_are_not_substituted_again():
+    # Chained str.replace calls re-filled placeholders that appeared inside earlier values
+    values = {"input": "says {{output}}", "output": "42"}
+    assert substitute_variables("{{input}} / {{output}}", values) == "says {{output}} / 42"
@@ -0,0 +1,57 @@
+# tests/test_rate_limiter.py
+
+import asyncio
+
+import pytest
+
+from rate_limiter import AdaptiveConcurrency, RateLimiter
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+
+def test_burst_of_429s_halves_the_limit_once():
+    limiter = RateLimiter("Test", initial_concurrency=16, max_concurrency=32)
+
+    async def throttled_request(started):
+        async with limiter.slot():
+            started.append(None)
+            # Wait until the whole burst is in flight before any of it fails
+            while len(started) < 16:
+                await asyncio.sleep(0)
+            raise RateLimitError()
+
+    async def main():
+        started = []
+        results = await asyncio.gather(*(throttled_request(started) for _ in range(16)), return_exceptions=True)
+        assert all(isinstance(result, RateLimitError) for result in results)
+
+    asyncio.run(main())
+    assert limiter.concurrency.limit == 8
+    assert limiter.rate_limited_count == 16
+
+
+def test_requests_started_after_a_decrease_can_decrease_again():
+    concurrency = AdaptiveConcurrency(initial=16, maximum=32)
+
+    async def main():
+        first = await concurrency.acquire()
+        second = await concurrency.acquire()
+        concurrency.on_rate_limited(first)
+        concurrency.on_rate_limited(second)
+        assert concurrency.limit == 8
+        concurrency.release()
+        concurrency.release()
+        later = await concurrency.acquire()
+        concurrency.on_rate_limited(later)
+        assert concurrency.limit == 4
+
+    asyncio.run(main())
+
+
+def test_limit_never_drops_below_the_minimum():
+    concurrency = AdaptiveConcurrency(initial=2, maximum=4, minimum=1)
+    for _ in range(5):
+        concurrency.on_rate_limited(concurrency.epoch)
+    assert concurrency.limit == pytest.approx(1)
@@ -0,0 +1,113 @@
+# tests/test_resilience.py
+
+import asyncio
+
+import pytest
+
+import resilience
+from resilience import CircuitBreaker, CircuitOpenError, call_with_retries, call_with_retries_async
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+
+@pytest.fixture
+def breaker(monkeypatch):
+    monkeypatch.setattr(resilience, "_breakers", {})
+    monkeypatch.setattr(resilience, "get_backoff_delay", lambda attempt, error=None: 0)
+    breaker = resilience.get_circuit_breaker("Test")
+    breaker.failure_threshold = 2
+    breaker.reset_seconds = 0
+    return breaker
+
+
+def fail_with(status_code):
+    def request():
+        raise StatusError(status_code)
+    return request
+
+
+def open_breaker(breaker):
+    with pytest.raises(StatusError):
+        call_with_retries("Test", fail_with(500))
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_consecutive_failures_open_the_breaker(breaker):
+    open_breaker(breaker)
+    breaker.reset_seconds = 60
+    with pytest.raises(CircuitOpenError):
+        call_with_retries("Test", lambda: "ok")
+
+
+def test_successful_trial_closes_the_breaker(breaker):
+    open_breaker(breaker)
+    assert call_with_retries("Test", lambda: "ok") == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_failed_trial_reopens_the_breaker(breaker):
+    open_breaker(breaker)
+    opened_at = breaker.opened_at
+    with pytest.raises(StatusError):
+        call_with_retries("Test", fail_with(503))
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.opened_at > opened_at
+
+
+def test_trial_retries_are_not_rejected(breaker):
+    open_breaker(breaker)
+    replies = iter([StatusError(429), StatusError(429), "ok"])
+
+    def request():
+        reply = next(replies)
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+    assert call_with_retries("Test", request) == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_throttled_trial_reopens_instead_of_sticking_half_open(breaker):
+    open_breaker(breaker)
+    opened_at = breaker.opened_at
+    with pytest.raises(StatusError):
+        call_with_retries("Test", fail_with(429), max_retries=2)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.opened_at > opened_at
+    # After the next cool-down another trial goes through
+    assert call_with_retries("Test", lambda: "ok") == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_cancelled_trial_reopens_the_breaker(breaker):
+    open_breaker(breaker)
+
+    async def main():
+        started = asyncio.Event()
+
+        async def request():
+            started.set()
+            await asyncio.sleep(60)
+
+        task = asyncio.create_task(call_with_retries_async("Test", request))
+        await started.wait()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    assert breaker.state == CircuitBreaker.OPEN
+    assert asyncio.run(call_with_retries_async("Test", lambda: asyncio.sleep(0, "ok"))) == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_only_one_trial_call_at_a_time(breaker):
+    open_breaker(breaker)
+    assert breaker.before_call() is True
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
@@ -0,0 +1,46 @@
+# tests/test_result_export.py
+
+import json
+import os
+import warnings
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+import result_export
+
+
+@pytest.fixture
+def export_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(result_export, "EXPORT_DIR", str(tmp_path))
+    monkeypatch.setattr(result_export, "_session_exports", {})
+    return tmp_path
+
+
+def test_parquet_export_leaves_out_the_run_metadata(export_dir):
+    df = pd.DataFrame({"score_selene": [1.0, 2.0, 3.0], "critique_selene": ["a", "b", "c"]})
+    df.attrs["sampled_positions"] = np.array([0, 2])
+    df.attrs["usage_summary"] = [{"Judge": "All judges", "Calls": 3}]
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        path = result_export.export_results(df, "Parquet", session_id="session", chunk_rows=2)
+
+    table = pq.read_table(path)
+    assert table.to_pandas().equals(df)
+    assert json.loads(table.schema.metadata[b"pandas"]).get("attributes", {}) == {}
+    assert df.attrs["sampled_positions"].tolist() == [0, 2]
+
+
+def test_old_exports_are_removed_with_their_sessions(export_dir):
+    df = pd.DataFrame({"score_selene": [1.0]})
+    finished = result_export.export_results(df, "CSV", session_id="finished")
+    os.utime(finished, (0, 0))
+
+    current = result_export.export_results(df, "CSV", session_id="current")
+
+    assert not os.path.exists(finished)
+    assert os.path.exists(current)
+    assert list(result_export._session_exports) == ["current"]
@@ -0,0 +1,36 @@
+# tests/test_run_journal.py
+
+import os
+
+from run_journal import RunJournal
+
+
+def test_fresh_runs_never_share_or_truncate_a_journal(tmp_path):
+    first = RunJournal.new("key", directory=str(tmp_path))
+    first.open()
+    first.append("judge", 0, 4.0, "ok")
+
+    second = RunJournal.new("key", directory=str(tmp_path))
+    second.open()
+    second.append("judge", 1, 2.0, "meh")
+    first.close()
+    second.close()
+
+    assert first.path != second.path
+    assert first.load() == [("judge", 0, 4.0, "ok")]
+    assert second.load() == [("judge", 1, 2.0, "meh")]
+
+
+def test_latest_finds_the_newest_journal_with_the_key(tmp_path):
+    assert RunJournal.latest("key", directory=str(tmp_path)) is None
+
+    older = RunJournal.new("key", directory=str(tmp_path))
+    newer = RunJournal.new("key", directory=str(tmp_path))
+    other = RunJournal.new("other", directory=str(tmp_path))
+    for age, journal in enumerate([other, newer, older]):
+        journal.open()
+        journal.append("judge", 0, 1.0, "")
+        journal.close()
+        os.utime(journal.path, (1000 - age * 100, 1000 - age * 100))
+
+    assert RunJournal.latest("key", directory=str(tmp_path)).run_id == newer.run_id
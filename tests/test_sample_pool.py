@@ -0,0 +1,33 @@
+# tests/test_sample_pool.py
+
+import json
+import time
+
+from random_sample import sample_pool
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_take_stays_in_memory_and_the_refill_thread_persists(monkeypatch, tmp_path):
+    path = tmp_path / "pool.json"
+    path.write_text(json.dumps({sample_pool.PAIR: [["human", "ai"]], sample_pool.GROUND_TRUTH: []}))
+    monkeypatch.setattr(sample_pool, "get_random_human_ai_pair", lambda: ("new human", "new ai"))
+    monkeypatch.setattr(sample_pool, "get_random_human_ai_ground_truth_pair", lambda: ("gt human", "gt ai", "gt"))
+    pool = sample_pool.SamplePool(size=2, path=str(path))
+
+    saves = []
+    save = pool._save
+    monkeypatch.setattr(pool, "_save", lambda: (saves.append(None), save()))
+    assert pool.take(with_ground_truth=False) == ["human", "ai"]
+    assert saves == []
+
+    pool.start()
+    wait_for(lambda: all(len(samples) == 2 for samples in pool.samples.values()) and not pool._wanted.is_set())
+    stored = json.loads(path.read_text())
+    assert stored[sample_pool.PAIR] == [["new human", "new ai"]] * 2
+    assert stored[sample_pool.GROUND_TRUTH] == [["gt human", "gt ai", "gt"]] * 2
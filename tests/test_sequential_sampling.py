@@ -0,0 +1,86 @@
+# tests/test_sequential_sampling.py
+
+import numpy as np
+import pytest
+
+from sequential_sampling import SequentialEstimate, stratified_order
+
+
+def population(seed, rows=3000):
+    """Labels 1..4 with unequal stratum sizes, and a judge that is right more often on some labels"""
+    rng = np.random.default_rng(seed)
+    labels = rng.choice([1.0, 2.0, 3.0, 4.0], size=rows, p=[0.5, 0.3, 0.15, 0.05])
+    right = rng.random(rows) < np.select([labels == 1, labels == 2, labels == 3], [0.9, 0.7, 0.5], 0.3)
+    scores = np.where(right, labels, labels % 4 + 1)
+    return labels, scores
+
+
+def test_every_prefix_of_the_order_is_proportionally_stratified():
+    strata = np.repeat([0, 1, 2, 3], [500, 300, 150, 50])
+    np.random.default_rng(0).shuffle(strata)
+    order = stratified_order(strata, seed=3)
+
+    assert sorted(order.tolist()) == list(range(len(strata)))
+    sizes = np.bincount(strata)
+    # Each stratum's sampled fraction is within one of its rows of a common
+    # threshold, so any two strata's fractions differ by less than 1/N_s + 1/N_r
+    slack = 1 / sizes[:, None] + 1 / sizes[None, :]
+    seen = np.zeros(len(sizes))
+    for taken, position in enumerate(order, start=1):
+        seen[strata[position]] += 1
+        fractions = seen / sizes
+        assert np.all(np.abs(fractions[:, None] - fractions[None, :]) < slack), taken
+        assert np.all(np.abs(seen - taken * sizes / len(strata)) < 2), taken
+
+
+def test_orders_are_random_within_strata_and_reproducible():
+    strata = np.repeat([0, 1], [100, 100])
+    assert stratified_order(strata, seed=1).tolist() == stratified_order(strata, seed=1).tolist()
+    assert stratified_order(strata, seed=1).tolist() != stratified_order(strata, seed=2).tolist()
+    assert stratified_order(strata, seed=1)[:10].tolist() != list(range(10))
+
+
+def test_intervals_cover_the_population_accuracy_at_their_level():
+    labels, scores = population(0)
+    true_accuracy = (scores == labels).mean()
+    covered = 0
+    runs = 200
+    for seed in range(runs):
+        estimate = SequentialEstimate(labels, ["judge"], target_half_width=0.04, batch_rows=100, seed=seed)
+        while not estimate.done:
+            estimate.next_batch()
+            estimate.update({"judge": scores})
+        accuracy, half_width = estimate.estimates["judge"]
+        covered += abs(accuracy - true_accuracy) <= half_width
+    # Nominal 95%; the bounds leave room for the Monte Carlo error of 200 runs
+    assert 0.90 <= covered / runs <= 0.99
+
+
+def test_stratified_estimate_and_its_stopping_points():
+    labels, scores = population(1, rows=1000)
+    estimate = SequentialEstimate(labels, ["judge"], target_half_width=0.001, budget=450, batch_rows=200, seed=4)
+    assert estimate.stop_reason() is None
+
+    estimate.next_batch()
+    estimate.update({"judge": scores})
+    positions = estimate.positions
+    expected = sum(
+        (labels == label).mean() * (scores[positions][labels[positions] == label] == label).mean()
+        for label in np.unique(labels)
+    )
+    assert estimate.estimates["judge"][0] == pytest.approx(expected)
+
+    while not estimate.done:
+        estimate.next_batch()
+        estimate.update({"judge": scores})
+    assert estimate.sampled == 450
+    assert estimate.stop_reason() == "budget of 450 rows spent"
+
+
+def test_judging_every_row_gives_the_exact_accuracy():
+    labels, scores = population(2, rows=500)
+    estimate = SequentialEstimate(labels, ["judge"], target_half_width=0.0, batch_rows=500)
+    estimate.next_batch()
+    estimate.update({"judge": scores})
+    assert estimate.estimates["judge"] == pytest.approx(((scores == labels).mean(), 0.0))
+    assert estimate.done
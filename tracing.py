@@ -0,0 +1,259 @@
+# tracing.py
+
+import atexit
+import functools
+import inspect
+import json
+import os
+import queue
+import random
+import tempfile
+import threading
+import time
+import urllib.request
+from contextvars import ContextVar
+
+from usage_tracker import current_job
+
+# "file" appends spans to TRACE_FILE, "otlp" posts them to an OTLP/HTTP collector;
+# anything else (the default) turns tracing off, and the traced functions are left unwrapped
+TRACE_EXPORTER = os.getenv("EVAL_TRACE_EXPORTER", "off").lower()
+TRACE_FILE = os.getenv("EVAL_TRACE_FILE", os.path.join(tempfile.gettempdir(), "eval-sandbox-traces.jsonl"))
+# Standard OpenTelemetry variable; spans are posted to <endpoint>/v1/traces
+OTLP_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://localhost:4318")
+SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "eval-sandbox")
+# Finished spans are exported in batches of this size, and whenever a trace's root span ends
+TRACE_BATCH_SPANS = int(os.getenv("EVAL_TRACE_BATCH_SPANS", "512"))
+
+TRACING_ENABLED = TRACE_EXPORTER in ("file", "otlp")
+
+# Span attributes copied from a parent span to its children, so every span of a run carries its id
+INHERITED_ATTRIBUTES = ("run_id",)
+
+# OTLP span kind and status codes
+SPAN_KIND_INTERNAL = 1
+STATUS_CODE_ERROR = 2
+
+_current_span = ContextVar("current_span", default=None)
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        # OTLP/JSON encodes 64-bit integers as strings
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes):
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items() if value is not None]
+
+
+class Span:
+    """One timed step of the pipeline, exported in the OTLP/JSON span format.
+
+    A span started while another is current (in the same task or a task it
+    started) becomes its child; spans started inside a judge job are tagged
+    with the judge and row they were made for.
+    """
+
+    def __init__(self, name, attributes=None, parent=None):
+        parent = parent if parent is not None else _current_span.get()
+        self.name = name
+        self.parent = parent
+        self.trace_id = parent.trace_id if parent else f"{random.getrandbits(128):032x}"
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.attributes = {}
+        if parent:
+            for key in INHERITED_ATTRIBUTES:
+                if key in parent.attributes:
+                    self.attributes[key] = parent.attributes[key]
+        job = current_job.get()
+        if job is not None:
+            self.attributes["judge"], self.attributes["row"] = job
+        self.attributes.update(attributes or {})
+        self.error = None
+        self.start_time = time.time_ns()
+        self.end_time = None
+        self._token = None
+
+    def set_attributes(self, **attributes):
+        self.attributes.update(attributes)
+
+    def end(self, error=None):
+        if self.end_time is not None:
+            return
+        self.end_time = time.time_ns()
+        self.error = error
+        _exporter.add(self, root=self.parent is None)
+
+    def __enter__(self):
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current_span.reset(self._token)
+        self.end(error=f"{exc_type.__name__}: {exc}" if exc_type is not None else None)
+        return False
+
+    def to_otlp(self):
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": SPAN_KIND_INTERNAL,
+            "startTimeUnixNano": str(self.start_time),
+            "endTimeUnixNano": str(self.end_time),
+            "attributes": _otlp_attributes(self.attributes),
+        }
+        if self.parent is not None:
+            span["parentSpanId"] = self.parent.span_id
+        if self.error:
+            span["status"] = {"code": STATUS_CODE_ERROR, "message": self.error}
+        return span
+
+
+class _NoSpan:
+    """Stands in for a span while tracing is off"""
+
+    def set_attributes(self, **attributes):
+        pass
+
+    def end(self, error=None):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NO_SPAN = _NoSpan()
+
+
+class _Exporter:
+    """Collects finished spans and writes them from a background thread, so exporting never blocks a run"""
+
+    def __init__(self):
+        self._spans = []
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._thread = None
+
+    def add(self, span, root=False):
+        with self._lock:
+            self._spans.append(span)
+            if not root and len(self._spans) < TRACE_BATCH_SPANS:
+                return
+            batch, self._spans = self._spans, []
+        self._submit(batch)
+
+    def flush(self):
+        with self._lock:
+            batch, self._spans = self._spans, []
+        if batch:
+            self._submit(batch)
+        if self._thread is not None:
+            self._queue.join()
+
+    def _submit(self, batch):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+            self._thread.start()
+        self._queue.put(batch)
+
+    def _run(self):
+        while True:
+            batch = self._queue.get()
+            try:
+                self._export(batch)
+            except Exception as e:
+                print(f"Warning: could not export {len(batch)} trace spans: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _export(self, batch):
+        payload = json.dumps({
+            "resourceSpans": [{
+                "resource": {"attributes": _otlp_attributes({"service.name": SERVICE_NAME})},
+                "scopeSpans": [{
+                    "scope": {"name": "eval-sandbox"},
+                    "spans": [span.to_otlp() for span in batch],
+                }],
+            }],
+        })
+        if TRACE_EXPORTER == "file":
+            # One OTLP/JSON export request per line, the format of the collector's file exporter
+            with open(TRACE_FILE, "a", encoding="utf-8") as f:
+                f.write(payload + "\n")
+        else:
+            request = urllib.request.Request(
+                OTLP_ENDPOINT.rstrip("/") + "/v1/traces",
+                data=payload.encode("utf-8"),
+                headers={"Content-Type": "application/json"},
+            )
+            with urllib.request.urlopen(request, timeout=10) as response:
+                response.read()
+
+
+_exporter = _Exporter()
+if TRACING_ENABLED:
+    atexit.register(_exporter.flush)
+
+
+def span(name, parent=None, **attributes):
+    """A span for a step of the pipeline, a child of `parent` or else of the current span.
+
+    Use it as `with span("render_prompts", rows=n): ...`, or call .end() on
+    it for steps that can't sit in one `with` block, such as the body of an
+    async generator; such a span is not made current, so pass it as `parent`
+    or to run_in_span for the work that should nest under it.
+    """
+    if not TRACING_ENABLED:
+        return NO_SPAN
+    return Span(name, attributes, parent)
+
+
+async def run_in_span(parent, awaitable):
+    """Await `awaitable` in its own task with `parent` as the current span"""
+    if isinstance(parent, Span):
+        _current_span.set(parent)
+    return await awaitable
+
+
+def set_span_attributes(**attributes):
+    """Add attributes to the current span, if tracing"""
+    if TRACING_ENABLED:
+        current = _current_span.get()
+        if current is not None:
+            current.set_attributes(**attributes)
+
+
+def traced(name=None):
+    """Run every call of the decorated function (sync or async) in a span named after it.
+
+    With tracing off the function is returned as it is, so it costs nothing.
+    """
+    def decorate(fn):
+        if not TRACING_ENABLED:
+            return fn
+        span_name = name or fn.__name__
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with Span(span_name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with Span(span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+
+    return decorate
@@ -0,0 +1,279 @@
+# usage_tracker.py
+
+import json
+import math
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Latency percentiles reported per judge
+LATENCY_PERCENTILES = (50, 95, 99)
+# Per-row measurements attached to the results as <field>_<judge> columns
+ROW_FIELDS = ("input_tokens", "output_tokens", "latency", "cost")
+
+# The (judge name, row position) a judge call is made for; set by whoever issues the call
+current_job = ContextVar("current_job", default=None)
+_current_call = ContextVar("current_call", default=None)
+_current_run = ContextVar("current_run", default=None)
+
+
+def load_prices():
+    """Load per-model token prices (USD per million tokens) from prices.jsonl next to models.jsonl"""
+    prices = {}
+    try:
+        script_dir = os.path.dirname(__file__)
+        file_path = os.getenv("PRICES_FILE", os.path.join(script_dir, "prices.jsonl"))
+        with open(file_path, "r") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    prices[entry.pop("api_model")] = entry
+    except FileNotFoundError:
+        print("Warning: prices.jsonl not found, judge call costs will not be estimated")
+    return prices
+
+
+PRICES = load_prices()
+
+
+def estimate_cost(api_model, input_tokens, output_tokens, batch=False):
+    """Estimated USD cost of a call, or None without a price or token counts.
+
+    Batch API calls are priced at the model's batch rate where prices.jsonl has one.
+    """
+    price = PRICES.get(api_model)
+    if price is None or input_tokens is None or output_tokens is None:
+        return None
+    prefix = "batch_" if batch and "batch_input_per_million" in price else ""
+    return (
+        input_tokens * price[f"{prefix}input_per_million"] + output_tokens * price[f"{prefix}output_per_million"]
+    ) / 1_000_000
+
+
+def percentile(values, q):
+    """q-th percentile of a non-empty sequence, interpolated linearly as numpy does by default"""
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q / 100
+    low = math.floor(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+class CallUsage:
+    """Tokens, timings and retries of one judge call.
+
+    `latency` and `ttfb` cover the attempt that finished the call, from the
+    moment it got its rate-limiter slot; `elapsed` is the whole call,
+    queueing and retries included. A `batch` call is one row of a provider
+    batch, timed from when the run started waiting on the batch.
+    """
+
+    def __init__(self, organization, api_model, batch=False, started_at=None):
+        self.organization = organization
+        self.api_model = api_model
+        self.batch = batch
+        self.started_at = started_at if started_at is not None else time.perf_counter()
+        self.attempt_started_at = self.started_at
+        self.first_byte_at = None
+        self.finished_at = None
+        self.attempts = 0
+        self.input_tokens = None
+        self.output_tokens = None
+        self.error = False
+
+    def start_attempt(self):
+        self.attempts += 1
+        self.attempt_started_at = time.perf_counter()
+        self.first_byte_at = None
+
+    @property
+    def retries(self):
+        return max(self.attempts - 1, 0)
+
+    @property
+    def latency(self):
+        return self.finished_at - self.attempt_started_at
+
+    @property
+    def ttfb(self):
+        return self.first_byte_at - self.attempt_started_at if self.first_byte_at is not None else None
+
+    @property
+    def elapsed(self):
+        return self.finished_at - self.started_at
+
+    @property
+    def cost(self):
+        return estimate_cost(self.api_model, self.input_tokens, self.output_tokens, batch=self.batch)
+
+
+class RunUsage:
+    """Judge call usage of one evaluation run.
+
+    Every call made while the run is being tracked (see track_run) is kept
+    for the percentiles, and its tokens, elapsed time and cost are added to
+    per-row totals of the judge it was made for. Rows that needed no call
+    (cache hits, duplicates) stay at 0; unknown token counts or prices make
+    a row's value NaN.
+    """
+
+    def __init__(self, total_rows, judge_names):
+        self.rows = {
+            name: {field: [0.0] * total_rows for field in ROW_FIELDS}
+            for name in judge_names
+        }
+        self.calls = {name: [] for name in judge_names}
+        self.cache_hits = dict.fromkeys(judge_names, 0)
+
+    def add(self, job, call):
+        name, position = job if job is not None else (None, None)
+        self.calls.setdefault(name, []).append(call)
+        if name in self.rows and position is not None:
+            row = self.rows[name]
+            cost = call.cost
+            row["input_tokens"][position] += call.input_tokens if call.input_tokens is not None else math.nan
+            row["output_tokens"][position] += call.output_tokens if call.output_tokens is not None else math.nan
+            row["latency"][position] += call.elapsed
+            row["cost"][position] += cost if cost is not None else math.nan
+
+    def add_cache_hit(self, job):
+        if job is not None:
+            self.cache_hits[job[0]] = self.cache_hits.get(job[0], 0) + 1
+
+    def columns(self):
+        """{column name: per-row values} for every judge, e.g. cost_selene"""
+        return {
+            f"{field}_{name}": values
+            for name, fields in self.rows.items()
+            for field, values in fields.items()
+        }
+
+    @property
+    def total_cost(self):
+        return sum(call.cost or 0.0 for calls in self.calls.values() for call in calls)
+
+    @property
+    def total_tokens(self):
+        return sum(
+            (call.input_tokens or 0) + (call.output_tokens or 0)
+            for calls in self.calls.values() for call in calls
+        )
+
+    def summary(self, display_names=None):
+        """One record per judge plus a run total, ready for a table or df.attrs"""
+        display_names = display_names or {}
+        records = [
+            self._summarize(display_names.get(name, name), calls, self.cache_hits.get(name, 0))
+            for name, calls in self.calls.items()
+            if name is not None and (calls or self.cache_hits.get(name))
+        ]
+        every_call = [call for calls in self.calls.values() for call in calls]
+        if every_call:
+            records.append(self._summarize("All judges", every_call, sum(self.cache_hits.values())))
+        return records
+
+    @staticmethod
+    def _summarize(label, calls, cache_hits):
+        costs = [call.cost for call in calls if call.cost is not None]
+        latencies = [call.latency for call in calls]
+        ttfbs = [call.ttfb for call in calls if call.ttfb is not None]
+        record = {
+            "Judge": label,
+            "Calls": len(calls),
+            "Cache hits": cache_hits,
+            "Retries": sum(call.retries for call in calls),
+            "Errors": sum(call.error for call in calls),
+            "Input tokens": sum(call.input_tokens or 0 for call in calls),
+            "Output tokens": sum(call.output_tokens or 0 for call in calls),
+            # Judges without a price show no cost rather than $0
+            "Est. cost (USD)": round(sum(costs), 4) if costs else None,
+        }
+        for q in LATENCY_PERCENTILES:
+            record[f"Latency p{q} (s)"] = round(percentile(latencies, q), 3) if latencies else None
+        for q in LATENCY_PERCENTILES:
+            record[f"TTFB p{q} (s)"] = round(percentile(ttfbs, q), 3) if ttfbs else None
+        return record
+
+    def progress_line(self):
+        calls = sum(len(calls) for calls in self.calls.values())
+        return f"{calls} calls · {self.total_tokens:,} tokens · est. ${self.total_cost:.4f}"
+
+
+async def track_run(usage, awaitable):
+    """Await `awaitable` with every judge call it makes recorded in `usage`"""
+    _current_run.set(usage)
+    return await awaitable
+
+
+@contextmanager
+def track_call(organization, api_model, batch=False, started_at=None):
+    """Measure the provider call made inside the block and add it to the tracked run, if any"""
+    call = CallUsage(organization, api_model, batch=batch, started_at=started_at)
+    token = _current_call.set(call)
+    try:
+        yield call
+    except BaseException:
+        call.error = True
+        raise
+    finally:
+        call.finished_at = time.perf_counter()
+        _current_call.reset(token)
+        run = _current_run.get()
+        if run is not None:
+            run.add(current_job.get(), call)
+
+
+def start_attempt():
+    call = _current_call.get()
+    if call is not None:
+        call.start_attempt()
+
+
+def record_first_byte():
+    call = _current_call.get()
+    if call is not None and call.first_byte_at is None:
+        call.first_byte_at = time.perf_counter()
+
+
+async def record_first_byte_async(response):
+    """httpx response hook: runs once the response headers are in, before the body is read"""
+    record_first_byte()
+
+
+def record_first_byte_sync(response):
+    record_first_byte()
+
+
+def _field(record, name):
+    if isinstance(record, dict):
+        return record.get(name)
+    return getattr(record, name, None)
+
+
+def record_usage(response):
+    """Take token counts from a provider response (OpenAI/Together or Anthropic usage fields).
+
+    Also accepts the usage block on its own, as an object or a dict, for
+    results that arrive without a response object (batch result lines).
+    """
+    call = _current_call.get()
+    if call is None or response is None:
+        return
+    usage = _field(response, "usage")
+    if usage is None:
+        usage = response
+    input_tokens = _field(usage, "prompt_tokens")
+    if input_tokens is None:
+        input_tokens = _field(usage, "input_tokens")
+    output_tokens = _field(usage, "completion_tokens")
+    if output_tokens is None:
+        output_tokens = _field(usage, "output_tokens")
+    call.input_tokens = input_tokens
+    call.output_tokens = output_tokens
+
+
+def record_cache_hit():
+    run = _current_run.get()
+    if run is not None:
+        run.add_cache_hit(current_job.get())
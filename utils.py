@@ -2,16 +2,7 @@ from dataclasses import dataclass
 from datetime import datetime
 import logging
 
-def parse_variables(prompt):
-    import re
-    # Extract variables enclosed in double curly braces
-    variables = re.findall(r"{{(.*?)}}", prompt)
-    # Remove duplicates while preserving order
-    seen = set()
-    variables = [
-        x.strip() for x in variables if not (x.strip() in seen or seen.add(x.strip()))
-    ]
-    return variables
+from prompt_templates import parse_variables
 
 def get_logger(sink_name: str = "core_utils") -> logging.Logger:
     logging.basicConfig(